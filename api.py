@@ -0,0 +1,363 @@
+import argparse
+import itertools
+import json
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from utils.export import FORMATS, export_blocks, iter_csv, write_parquet
+from utils.flows import flows_for
+from utils.history import get_history
+from utils.partitions import load_catalog
+from utils.positions import COLUMNS, TRADERS
+from utils.snapshot import snapshot_for
+from utils.tracing import PROMETHEUS_TYPE, REGISTRY, span, traced
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+_ENTITY_TAG = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+
+def etag_matches(if_none_match, etag):
+    """Return whether an If-None-Match header matches an ETag
+
+    The header may list several tags separated by commas, or be ``*``.
+    Tags are compared weakly, so ``W/"v1"`` matches ``"v1"`` (RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    tags = _ENTITY_TAG.findall(if_none_match)
+    return '*' in tags or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in tags)
+
+
+def market_payload(engine, i, report_date):
+    """Return the positions, normalized shares, changes, flows and metrics of one market"""
+    name = engine.names[i]
+    flows = flows_for(engine).summary(name)
+    return {
+        'market': name,
+        'report_date': report_date,
+        'positions': engine.positions(name),
+        'normalized': {
+            trader: {col: float(engine.shares[i, t, c]) for c, col in enumerate(COLUMNS)}
+            for t, trader in enumerate(TRADERS)
+        },
+        'open_interest': {
+            'contracts': int(engine.open_interest[i]),
+            'reported': bool(engine.oi_reported[i])
+        },
+        'pct_of_open_interest': {
+            trader: {col: float(engine.pct_oi[i, t, c]) for c, col in enumerate(COLUMNS)}
+            for t, trader in enumerate(TRADERS)
+        },
+        'pct_of_class': {
+            trader: {col: float(engine.pct_class[i, t, c]) for c, col in enumerate(COLUMNS)}
+            for t, trader in enumerate(TRADERS)
+        },
+        'long_short_ratio': {trader: float(engine.ratio[i, t]) for t, trader in enumerate(TRADERS)},
+        'changes': {
+            trader: {
+                'Long': int(engine.long_change[i, t]),
+                'Short': int(engine.short_change[i, t]),
+                'Net': int(engine.net_change[i, t])
+            }
+            for t, trader in enumerate(TRADERS)
+        },
+        'flows': {
+            'open_interest': flows['open_interest'],
+            'open_interest_change': flows['open_interest_change'],
+            'transfers': [
+                {'from': seller, 'to': buyer, 'contracts': contracts}
+                for seller, buyer, contracts in flows['transfers']
+            ]
+        },
+        'metrics': {
+            **engine.metrics(name),
+            'dominant_class': TRADERS[engine.dominant[i]],
+            'dominant_net': int(engine.dominant_net[i])
+        }
+    }
+
+
+def arrow_table(engine):
+    """Return every market's figures as one long-format Arrow table"""
+    import numpy as np
+    import pyarrow as pa
+
+    n, k = engine.net.shape
+    return pa.table({
+        'market': np.repeat(engine.names, k).tolist(),
+        'trader': TRADERS * n,
+        'long': engine.long.ravel(),
+        'short': engine.short.ravel(),
+        'net': engine.net.ravel(),
+        'long_pct': engine.shares[:, :, 0].ravel(),
+        'short_pct': engine.shares[:, :, 1].ravel(),
+        'net_pct': engine.shares[:, :, 2].ravel(),
+        'open_interest': np.repeat(engine.open_interest, k),
+        'long_pct_oi': engine.pct_oi[:, :, 0].ravel(),
+        'short_pct_oi': engine.pct_oi[:, :, 1].ravel(),
+        'net_pct_oi': engine.pct_oi[:, :, 2].ravel(),
+        'long_pct_class': engine.pct_class[:, :, 0].ravel(),
+        'short_pct_class': engine.pct_class[:, :, 1].ravel(),
+        'net_pct_class': engine.pct_class[:, :, 2].ravel(),
+        'long_short_ratio': engine.ratio.ravel(),
+        'long_change': engine.long_change.ravel(),
+        'short_change': engine.short_change.ravel(),
+        'net_change': engine.net_change.ravel()
+    })
+
+
+class ApiState:
+    """Serialized responses for one dataset version, built once and served from memory"""
+
+    @traced('api.state')
+    def __init__(self, dataset):
+        self.version = dataset.version
+        self.etag = f'"{dataset.version}"'
+        engine = snapshot_for(dataset)
+
+        markets = []
+        self.market_json = {}
+        for i, m in enumerate(dataset.markets):
+            report_date = (m.get('latest_report') or {}).get('report_date_as_yyyy_mm_dd')
+            markets.append({
+                'display_name': m['display_name'],
+                'instrument_name': m.get('instrument_name'),
+                'asset_type': m.get('asset_type'),
+                'exchange': m.get('exchange'),
+                'report_date': report_date
+            })
+            payload = market_payload(engine, engine.index[m['display_name']], report_date)
+            self.market_json[m['display_name']] = self._encode(payload)
+
+        self.markets_json = self._encode({'version': self.version, 'markets': markets})
+        self.positions_json = b'{"version": "%s", "markets": [%s]}' % (
+            self.version.encode(), b', '.join(self.market_json.values())
+        )
+        self._engine = engine
+        self._arrow = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(obj):
+        return json.dumps(_nan_to_none(obj)).encode()
+
+    def positions_arrow(self, markets=None):
+        """Return the Arrow IPC stream for all markets, or a filtered one"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if self._arrow is None:
+            with self._lock:
+                if self._arrow is None:
+                    with span('api.arrow_table'):
+                        self._arrow = arrow_table(self._engine)
+        table = self._arrow
+        if markets:
+            table = table.filter(pc.is_in(table['market'], value_set=pa.array(markets)))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def _nan_to_none(obj):
+    """Replace NaN/inf (e.g. shares of an all-zero market) with null"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def current_state():
+    """Return the ApiState for the current dataset version"""
+    global _state
+    catalog = load_catalog()
+    state = _state
+    if state is None or state.version != catalog.version:
+        with _state_lock:
+            if _state is None or _state.version != catalog.version:
+                _state = ApiState(catalog.combined())
+            state = _state
+    return state
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes:
+
+    GET /markets                      market list
+    GET /markets/<display_name>       positions, normalized shares, changes and metrics
+    GET /positions[?market=...]       every market; Arrow IPC with ?format=arrow
+                                      or Accept: application/vnd.apache.arrow.stream
+    GET /export[?format=parquet&market=...&start=...&end=...]
+                                      every report date as CSV or Parquet, streamed
+    GET /metrics                      stage timings (Prometheus text), with COT_TRACING set
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'CoTAnalyticsAPI'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+
+        # Routes that do not serve the current version's prebuilt responses
+        if parts == ['metrics']:
+            return self._send(200, REGISTRY.prometheus().encode(), PROMETHEUS_TYPE)
+        if parts == ['export']:
+            return self._send_export(params)
+        if not (parts == ['markets'] or parts == ['positions'] or (len(parts) == 2 and parts[0] == 'markets')):
+            return self._send(404, self._error("Not found"))
+
+        try:
+            state = current_state()
+        except (OSError, ValueError) as e:
+            return self._send(503, self._error(f"Dataset unavailable: {e}"))
+
+        if parts == ['markets']:
+            return self._send_versioned(state.markets_json, state.etag)
+        if len(parts) == 2 and parts[0] == 'markets':
+            body = state.market_json.get(parts[1])
+            if body is None:
+                return self._send(404, self._error(f"Unknown market: {parts[1]}"))
+            return self._send_versioned(body, state.etag)
+        # /positions picks JSON or Arrow from Accept, so caches must key on it
+        markets = params.get('market')
+        wants_arrow = params.get('format') == ['arrow'] or ARROW_TYPE in self.headers.get('Accept', '')
+        if wants_arrow:
+            try:
+                with span('api.arrow_stream'):
+                    body = state.positions_arrow(markets)
+            except ImportError:
+                return self._send(406, self._error("Arrow output requires pyarrow"), vary='Accept')
+            return self._send_versioned(body, f'"{state.version}-arrow"', ARROW_TYPE, vary='Accept')
+        if markets:
+            body = b'{"version": "%s", "markets": [%s]}' % (
+                state.version.encode(),
+                b', '.join(state.market_json[m] for m in markets if m in state.market_json)
+            )
+            return self._send_versioned(body, state.etag, vary='Accept')
+        return self._send_versioned(state.positions_json, state.etag, vary='Accept')
+
+    def _send_export(self, params):
+        """Stream an export with chunked transfer encoding, one block at a time"""
+        fmt = params.get('format', ['csv'])[0]
+        if fmt not in FORMATS:
+            return self._send(400, self._error(f"Unknown export format: {fmt}"))
+        try:
+            blocks = export_blocks(
+                params.get('market'), params.get('start', [None])[0], params.get('end', [None])[0],
+                catalog=load_catalog(), history=get_history()
+            )
+            # Bad dates fail here, before the headers go out
+            first = next(blocks, None)
+        except ValueError as e:
+            return self._send(400, self._error(str(e)))
+        blocks = itertools.chain([first] if first is not None else [], blocks)
+
+        self.send_response(200)
+        self.send_header('Content-Type', FORMATS[fmt])
+        self.send_header('Content-Disposition', f'attachment; filename="cot_export.{fmt}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        out = _ChunkedWriter(self.wfile)
+        with span('api.export'):
+            if fmt == 'parquet':
+                write_parquet(blocks, out)
+            else:
+                for chunk in iter_csv(blocks):
+                    out.write(chunk.encode())
+        out.close()
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode()
+
+    def _send_versioned(self, body, etag, content_type='application/json', vary=None):
+        """Send a 200, or a bodiless 304 if the client already holds this dataset version"""
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            return self._send(304, b'', etag=etag, vary=vary)
+        return self._send(200, body, content_type, etag, vary)
+
+    def _send(self, status, body, content_type='application/json', etag=None, vary=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if vary:
+            self.send_header('Vary', vary)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ChunkedWriter:
+    """Binary file interface that sends each write as one HTTP/1.1 chunk"""
+
+    closed = False
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.position = 0
+
+    def write(self, data):
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        self.wfile.flush()
+
+    def close(self):
+        if not self.closed:
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+            self.closed = True
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve dashboard metrics as JSON and Arrow IPC")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    # Build the first version before accepting traffic
+    current_state()
+    server = ApiServer((args.host, args.port), ApiHandler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,28 @@
 import streamlit as st
-from streamlit_shadcn_ui import card, tabs, switch, metric_card, alert_dialog, input
 from dotenv import load_dotenv
+import logging
 import os
 from pathlib import Path
-import json
-import pandas as pd
-import time
-import altair as alt
+import math
+import copy
+from utils.assets import KOFI_IMAGE, asset_src
+from utils.cot_index import DEFAULT_WINDOW, cot_index_for
+from utils.executor import AnalyticsExecutor, screener_orders
+from utils.export import FORMATS, export_bytes
+from utils.flows import flows_for
+from utils.history import get_history
+from utils.normalization import VIEWS, normalized_history_for
+from utils.positions import TRADERS, record_engine
+from utils.prices import get_price_store, report_prices
+from utils.render_cache import ChartView, TableView, cached_view, release_version
+from utils.screener import METRICS, screener_for
+from utils.search import search_index_for
+from utils.snapshot import snapshot_for
+from utils.watcher import DatasetWatcher
+from utils import tracing
+from utils.tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 # Get the absolute path to the root directory
 ROOT_DIR = Path(__file__).parent.absolute()
@@ -14,11 +30,8 @@ ROOT_DIR = Path(__file__).parent.absolute()
 # Load environment variables from the root .env file
 load_dotenv(ROOT_DIR / '.env')
 
-# Load mock data
-def load_mock_data():
-    data_path = ROOT_DIR / 'data' / 'mock_algo_upload.json'
-    with open(data_path, 'r') as f:
-        return json.load(f)
+# Seconds between each session's check for a newly published dataset version
+REFRESH_CHECK_SECONDS = 5
 
 # Configure page settings first
 st.set_page_config(
@@ -259,30 +272,53 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def format_positions_data(market_data):
+@st.cache_resource
+def get_executor():
+    """Process pool for heavy analytics, shared by every session of this server"""
+    return AnalyticsExecutor()
+
+@st.cache_resource
+def start_metrics_server(port):
+    """Serve this process's stage timings at /metrics, once per server"""
+    return tracing.serve_metrics(port, os.getenv('COT_METRICS_HOST', '127.0.0.1'))
+
+@st.cache_resource
+def get_watcher():
+    """Dataset version shared by every session, swapped in by one watcher thread"""
+    watcher = DatasetWatcher()
+    executor = get_executor()
+    watcher.on_retire(release_version)
+    watcher.on_retire(lambda version: executor.unpublish((version, 'screener')))
+    return watcher.start()
+
+@st.fragment(run_every=REFRESH_CHECK_SECONDS)
+def watch_version(version):
+    """Rerun the whole app once this session's dataset version has been replaced"""
+    if get_watcher().version != version:
+        st.rerun(scope='app')
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+def _positions_engine(market_data, engine=None):
+    """Return (engine, name) for a market: the caller's engine if it holds it, else one from the record"""
+    name = market_data.get('display_name')
+    if engine is not None and name in engine.index:
+        return engine, name
+    return record_engine(market_data), None
+
+def format_positions_data(market_data, engine=None):
     """Format market data for display in table"""
-    latest = market_data['latest_report']
-    
-    return {
-        'Commercial': {
-            'Long': int(latest['comm_positions_long_all']),
-            'Short': int(latest['comm_positions_short_all']),
-            'Net': int(latest['comm_positions_long_all']) - int(latest['comm_positions_short_all'])
-        },
-        'Non-Commercial': {
-            'Long': int(latest['noncomm_positions_long_all']),
-            'Short': int(latest['noncomm_positions_short_all']),
-            'Net': int(latest['noncomm_positions_long_all']) - int(latest['noncomm_positions_short_all'])
-        },
-        'Retail': {
-            'Long': int(latest['nonrept_positions_long_all']),
-            'Short': int(latest['nonrept_positions_short_all']),
-            'Net': int(latest['nonrept_positions_long_all']) - int(latest['nonrept_positions_short_all'])
-        }
-    }
+    engine, name = _positions_engine(market_data, engine)
+    return engine.positions(name)
 
 def prepare_chart_data(positions, normalize=False):
     """Prepare data for Vega-Lite chart"""
+    import pandas as pd
+
     data = []
     for trader_type in positions:
         data.append({
@@ -298,29 +334,422 @@ def prepare_chart_data(positions, normalize=False):
     
     return pd.DataFrame(data)
 
-def calculate_key_metrics(market_data):
+def calculate_key_metrics(market_data, engine=None):
     """Calculate key metrics from market data"""
-    latest = market_data['latest_report']
-    
-    # Calculate net positions for each trader type
-    net_positions = {
-        'Commercial': float(latest['comm_positions_long_all']) - float(latest['comm_positions_short_all']),
-        'Non-Commercial': float(latest['noncomm_positions_long_all']) - float(latest['noncomm_positions_short_all']),
-        'Retail': float(latest['nonrept_positions_long_all']) - float(latest['nonrept_positions_short_all'])
+    engine, name = _positions_engine(market_data, engine)
+    return engine.metrics(name)
+
+def chart_spec(absolute_view):
+    """Build the Vega-Lite specification for the positions chart"""
+    colors = ['#FFFFFF', '#666666']
+    
+    # Create the base chart specification
+    base = {
+        "mark": "bar",
+        "encoding": {
+            "x": {
+                "field": "Trader",
+                "type": "nominal",
+                "title": None,
+                "axis": {
+                    "labelColor": "#FFFFFF",
+                    "titleColor": "#FFFFFF",
+                    "domainColor": "#333333",
+                    "tickColor": "#333333"
+                }
+            },
+            "color": {
+                "field": "Position",
+                "type": "nominal",
+                "scale": {"range": colors},
+                "legend": {
+                    "orient": "top",
+                    "title": None,
+                    "labelColor": "#FFFFFF"
+                },
+                "sort": ["Long", "Short"]  # Changed order to make Long appear at bottom
+            },
+            "order": {"field": "Position", "sort": "ascending"},  # Changed to ascending
+            "tooltip": [
+                {"field": "Trader", "type": "nominal", "title": "Trader Type"},
+                {"field": "Position", "type": "nominal"},
+                {"field": "Value", "type": "quantitative", 
+                 "format": ".0f" if absolute_view else ".1%"}
+            ]
+        },
+        "config": {
+            "view": {"stroke": "transparent"},
+            "axis": {
+                "grid": "true",
+                "gridColor": "#333333",
+                "gridOpacity": 0.3
+            },
+            "background": "transparent"
+        }
     }
+
+    if not absolute_view:  # Normalized view
+        base["encoding"]["y"] = {
+            "field": "Value",
+            "type": "quantitative",
+            "stack": "normalize",
+            "axis": {
+                "format": ".0%",
+                "title": "Percentage",
+                "labelColor": "#FFFFFF",
+                "titleColor": "#FFFFFF"
+            },
+            "scale": {"domain": [0, 1]}
+        }
+    else:  # Absolute view
+        base["encoding"]["y"] = {
+            "field": "Value",
+            "type": "quantitative",
+            "title": "Contracts",
+            "axis": {
+                "grid": "true",
+                "gridColor": "#333333",
+                "labelColor": "#FFFFFF",
+                "titleColor": "#FFFFFF"
+            }
+        }
     
-    # Find dominant trader (trader with largest absolute net position)
-    dominant_trader = max(net_positions.items(), key=lambda x: abs(x[1]))
-    
-    # Format net position with + sign for positive values
-    net_position = dominant_trader[1]
-    formatted_net = f"+{net_position:,.2f}" if net_position > 0 else f"{net_position:,.2f}"
-    
+    return base
+
+@traced('views.market')
+def build_market_view(engine, market, absolute_view, view='shares'):
+    """Build the table and chart views for one market and view mode"""
+    df = engine.table(market, absolute=absolute_view, view=view)
+    if absolute_view:
+        value_format = '{:,.0f}'
+    elif view == 'ratio':
+        value_format = '{:.2f}'
+    else:
+        value_format = '{:.1f}%'
+    table = TableView(df, {col: value_format for col in df.columns}, gradient_column=df.columns[-1])
+    chart = ChartView(prepare_chart_data(engine.positions(market)), chart_spec(absolute_view))
+    return table, chart
+
+def history_chart_spec(view):
+    """Build the Vega-Lite specification for one normalized view over report dates"""
+    axis = {"labelColor": "#FFFFFF", "titleColor": "#FFFFFF", "domainColor": "#333333", "tickColor": "#333333"}
     return {
-        'dominant_trader': f"{dominant_trader[0]} ({formatted_net})"
+        "mark": "line",
+        "encoding": {
+            "x": {"field": "Date", "type": "temporal", "title": None, "axis": axis},
+            "y": {
+                "field": "Value",
+                "type": "quantitative",
+                "title": VIEWS[view] if view == 'ratio' else f"Net, {VIEWS[view]}",
+                "axis": axis
+            },
+            "color": {
+                "field": "Trader",
+                "type": "nominal",
+                "scale": {"range": ['#FFFFFF', '#AAAAAA', '#666666', '#444444']},
+                "legend": {"orient": "top", "title": None, "labelColor": "#FFFFFF"}
+            },
+            "tooltip": [
+                {"field": "Date", "type": "temporal"},
+                {"field": "Trader", "type": "nominal", "title": "Trader Type"},
+                {"field": "Value", "type": "quantitative", "format": ".2f" if view == 'ratio' else ".1f"}
+            ]
+        },
+        "config": {
+            "view": {"stroke": "transparent"},
+            "axis": {"grid": "true", "gridColor": "#333333", "gridOpacity": 0.3},
+            "background": "transparent"
+        }
     }
 
+@traced('views.history')
+def build_history_view(normalized, market, view):
+    """Build the chart of one normalized view across every stored report date"""
+    import pandas as pd
+
+    dates, values = normalized.query(market, view)
+    if view != 'ratio':
+        values = values[..., 2]  # Net column
+    frame = pd.DataFrame(values, columns=TRADERS)
+    frame.insert(0, 'Date', pd.to_datetime(dates))
+    data = frame.melt(id_vars='Date', var_name='Trader', value_name='Value')
+    return ChartView(data, history_chart_spec(view))
+
+@traced('views.flows')
+def build_flow_view(flows, market):
+    """Build the week-over-week change table and flow caption for one market"""
+    summary = flows.summary(market)
+    table = TableView(flows.table(market), {'Long': '{:+,.0f}', 'Short': '{:+,.0f}', 'Net': '{:+,.0f}'})
+    
+    if not summary['has_previous']:
+        return table, "No previous report to compare against"
+    oi_pct = summary['open_interest_pct']
+    parts = [
+        f"Open interest {summary['open_interest_change']:+,}"
+        + ("" if math.isnan(oi_pct) else f" ({oi_pct:+.1f}%)")
+    ]
+    for seller, buyer, contracts in summary['transfers'][:2]:
+        parts.append(f"{buyer} absorbed {contracts:,.0f} from {seller}")
+    return table, " · ".join(parts)
+
+def render_market(catalog):
+    """Render the single-market metrics, table and chart"""
+    # Deferred so importing this module stays cheap
+    from streamlit_shadcn_ui import metric_card, switch
+
+    # Narrow the selector with the in-process search index
+    query = st.text_input(
+        "Search Markets",
+        key="market_search",
+        placeholder="Search by name or ticker (e.g. BTC, Micro)",
+        label_visibility="collapsed"
+    )
+    options = catalog.options
+    if query:
+        options = search_index_for(catalog).search(query, limit=50) or catalog.options
+    
+    # Compact market selector
+    selected_market = st.selectbox(
+        "Select Market",
+        options=options,
+        key="selected_market",
+        label_visibility="collapsed"  # Hides label to reduce space
+    )
+
+    if 'prev_market' not in st.session_state:
+        st.session_state.prev_market = selected_market
+
+    # Only the partition holding the selected market is loaded
+    if selected_market not in catalog.index:
+        selected_market = catalog.options[0]
+    dataset = catalog.dataset_for(selected_market)
+
+    # Metrics section with minimal spacing
+    with span('positions.snapshot'):
+        engine = snapshot_for(dataset)
+    if selected_market not in engine.index:
+        selected_market = dataset.options[0]
+    metrics = engine.metrics(selected_market)
+
+    # Compact metric layout
+    col1, col2 = st.columns([6, 1])
+    with col1:
+        metric_card(
+            title="Active Trader",
+            content=metrics['dominant_trader'],
+            description=""
+        )
+    with col2:
+        absolute_view = switch(
+            label="Humble View",
+            default_checked=False,
+            key="view_mode_toggle"
+        )
+
+    # Normalization basis, precomputed for every market
+    view = 'absolute'
+    if not absolute_view:
+        view = st.selectbox(
+            "Normalize by",
+            options=list(VIEWS),
+            format_func=VIEWS.get,
+            key="normalize_view",
+            label_visibility="collapsed"
+        )
+
+    # Table and chart are shared across sessions per dataset version; the
+    # catalog's version covers every partition, so switching between
+    # partitions does not drop the cache
+    table_view, chart_view = cached_view(
+        catalog.version,
+        selected_market,
+        view,
+        lambda: build_market_view(engine, selected_market, absolute_view, view)
+    )
+
+    # Compact table
+    with span('render.table'):
+        st.dataframe(
+            table_view.styler(),
+            use_container_width=True,
+            height=120  # Reduced height
+        )
+
+    # Create and configure the chart
+    with span('render.chart'):
+        chart = st.vega_lite_chart(
+            chart_view.data,
+            copy.deepcopy(chart_view.spec),
+            theme=None,
+            use_container_width=True
+        )
+
+    # Update caption styling
+    caption = 'Absolute view (contracts)' if absolute_view else f'Normalized view ({VIEWS[view]})'
+    if view == 'pct_oi' and not engine.oi_reported[engine.index[selected_market]]:
+        caption += ' · open interest estimated from total longs'
+    st.markdown(
+        f"<div style='color: #FFFFFF; font-size: 0.8em; text-align: center;'>{caption}</div>",
+        unsafe_allow_html=True
+    )
+
+    # The same view at every stored report date, precomputed once per history version
+    if not absolute_view:
+        with span('normalized_history'):
+            normalized = normalized_history_for(get_history())
+        if len(normalized.query(selected_market, view)[0]) > 1:
+            history_view = cached_view(
+                normalized.version,
+                selected_market,
+                f'history_{view}',
+                lambda: build_history_view(normalized, selected_market, view)
+            )
+            st.vega_lite_chart(
+                history_view.data,
+                copy.deepcopy(history_view.spec),
+                theme=None,
+                use_container_width=True
+            )
+
+    # Week-over-week changes and who absorbed whose positions
+    flow_table, flow_caption = cached_view(
+        catalog.version,
+        selected_market,
+        'flows',
+        lambda: build_flow_view(flows_for(engine), selected_market)
+    )
+    st.markdown(
+        "<div style='color: #FFFFFF; font-size: 0.9em; margin-top: 1rem;'>Week-over-week change</div>",
+        unsafe_allow_html=True
+    )
+    st.dataframe(
+        flow_table.styler(),
+        use_container_width=True,
+        height=120
+    )
+    st.markdown(
+        f"<div style='color: #666; font-size: 0.8em; text-align: center;'>{flow_caption}</div>",
+        unsafe_allow_html=True
+    )
+
+    # COT Index from the stored weekly history, when there is any
+    with span('cot_index'):
+        cot = cot_index_for(get_history()).stats(selected_market)
+    if cot:
+        readings = " · ".join(
+            f"{trader} –" if math.isnan(stats['index']) else f"{trader} {stats['index']:.0f}"
+            for trader, stats in cot.items()
+        )
+        st.markdown(
+            f"<div style='color: #666; font-size: 0.8em; text-align: center;'>"
+            f"COT Index ({DEFAULT_WINDOW}w): {readings}"
+            "</div>",
+            unsafe_allow_html=True
+        )
+
+    # Spot price on the report dates, read from the local price cache only
+    market_record = dataset.markets[dataset.index[selected_market]]
+    with span('prices'):
+        latest_price, previous_price = report_prices([market_record], get_price_store())[0]
+    if not math.isnan(latest_price):
+        change = "" if math.isnan(previous_price) else f" ({latest_price / previous_price - 1:+.1%} w/w)"
+        st.markdown(
+            f"<div style='color: #666; font-size: 0.8em; text-align: center;'>"
+            f"{market_record['instrument_name']} close on report date: {latest_price:,.2f}{change}"
+            "</div>",
+            unsafe_allow_html=True
+        )
+
+    render_export(catalog, selected_market)
+
+def render_export(catalog, selected_market):
+    """Render the bulk CSV/Parquet export of positions and metrics"""
+    with st.expander("Export data"):
+        markets = st.multiselect(
+            "Markets (all when empty)",
+            options=catalog.options,
+            default=[selected_market],
+            key="export_markets"
+        )
+        dates = st.date_input("Report dates (all when empty)", value=(), key="export_dates")
+        fmt = st.radio("Format", options=list(FORMATS), horizontal=True, key="export_format")
+        start, end = (list(dates) + [None, None])[:2] if dates else (None, None)
+        
+        # Built only when clicked, streamed block by block rather than through a DataFrame
+        st.download_button(
+            "Download",
+            data=lambda: export_bytes(
+                fmt, markets=markets or None, start=start, end=end or start,
+                catalog=catalog, history=get_history()
+            ),
+            file_name=f"cot_export.{fmt}",
+            mime=FORMATS[fmt],
+            on_click='ignore',
+            key="export_download"
+        )
+
+def render_screener(dataset):
+    """Render the cross-market screener, one page at a time"""
+    with span('screener.build'):
+        screener = screener_for(snapshot_for(dataset))
+    if not screener.primed:
+        # Sort every ranking once, off this thread for large datasets
+        executor = get_executor()
+        key = (dataset.version, 'screener')
+        executor.publish(key, screener.columns())
+        try:
+            orders = executor.run('screener_orders', key, owner=_session_id(), rows=len(screener))
+        except Exception:
+            logger.exception("Screener rankings failed in the executor, sorting them here")
+            orders = screener_orders(screener.columns(), lambda: None)
+        screener.prime(orders)
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        metric = st.selectbox("Rank by", options=METRICS, key="screener_metric")
+    with col2:
+        trader = st.selectbox("Trader class", options=TRADERS, index=1, key="screener_trader")
+    with col3:
+        descending = st.toggle("Highest first", value=True, key="screener_descending")
+    
+    page_size = 25
+    page_count = screener.page_count(page_size)
+    page = st.number_input(
+        f"Page (of {page_count})",
+        min_value=1,
+        max_value=page_count,
+        value=1,
+        key="screener_page"
+    )
+    
+    with span('render.screener'):
+        st.dataframe(
+            screener.page(metric, trader, page, page_size, descending).style.format({
+                f'{trader} Net': '{:,.0f}',
+                f'{trader} Net Change': '{:+,.0f}',
+                'Dominant Share': '{:.1f}%'
+            }),
+            use_container_width=True
+        )
+
+def render_debug_panel():
+    """Show the stage timings collected in this server process"""
+    with st.expander("Stage timings"):
+        stats = tracing.REGISTRY.stats()
+        if stats:
+            st.dataframe(stats, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No stages recorded yet")
+
+@traced('main')
 def main():
+    # Deferred so importing this module stays cheap
+    from streamlit_shadcn_ui import tabs
+
+    # Prometheus-style timings for this server, when tracing is on
+    if tracing.ENABLED and os.getenv('COT_METRICS_PORT'):
+        start_metrics_server(int(os.getenv('COT_METRICS_PORT')))
+
     # Create centered layout directly
     _, center_col, _ = st.columns([1, 2, 1])
     
@@ -336,164 +765,35 @@ def main():
         # Thinner separator
         st.markdown("<hr style='margin: 0.5rem 0; border: none; border-top: 1px solid #333;'>", unsafe_allow_html=True)
         
+        # Anything this session's previous run left in the pool is stale now
+        get_executor().cancel(_session_id())
+        
+        watcher = dataset = None
         try:
-            data = load_mock_data()
-            if not isinstance(data, list):
-                st.error("Invalid data format. Expected a list of market data.")
+            try:
+                with span('dataset.acquire'):
+                    # The version stays live until this run ends, even if a newer one lands;
+                    # loading and parsing are timed as dataset.load and dataset.partition
+                    watcher = get_watcher()
+                    dataset = watcher.acquire()
+            except ValueError as e:
+                st.error(str(e))
                 return
             
+            # Rerun once when the watcher publishes a new version
+            watch_version(dataset.version)
+            
             # Market selector with reduced padding
-            market_options = [m.get('display_name') for m in data if isinstance(m, dict) and 'display_name' in m]
-            if not market_options:
+            if not dataset.options:
                 st.error("No valid market options found in data.")
                 return
             
-            # Compact market selector
-            selected_market = st.selectbox(
-                "Select Market",
-                options=market_options,
-                key="selected_market",
-                label_visibility="collapsed"  # Hides label to reduce space
-            )
-            
-            if 'prev_market' not in st.session_state:
-                st.session_state.prev_market = selected_market
-            
-            # Metrics section with minimal spacing
-            selected_market_data = next(
-                (m for m in data if m['display_name'] == selected_market),
-                data[0]
-            )
-            positions = format_positions_data(selected_market_data)
-            metrics = calculate_key_metrics(selected_market_data)
-            
-            # Compact metric layout
-            col1, col2 = st.columns([6, 1])
-            with col1:
-                metric_card(
-                    title="Active Trader",
-                    content=metrics['dominant_trader'],
-                    description=""
-                )
-            with col2:
-                absolute_view = switch(
-                    label="Humble View",
-                    default_checked=False,
-                    key="view_mode_toggle"
-                )
-            
-            # Compact table
-            df = pd.DataFrame(positions).transpose()
-            if not absolute_view:
-                for col in ['Long', 'Short', 'Net']:
-                    total = df[col].abs().sum()
-                    df[col] = df[col] / total * 100
-            
-            st.dataframe(
-                df.style.format({
-                    'Long': '{:.1f}%' if not absolute_view else '{:,.0f}',
-                    'Short': '{:.1f}%' if not absolute_view else '{:,.0f}',
-                    'Net': '{:.1f}%' if not absolute_view else '{:,.0f}'
-                }).background_gradient(
-                    subset=['Net'],
-                    cmap='gist_yarg',
-                    vmin=df['Net'].min(),
-                    vmax=df['Net'].max()
-                ),
-                use_container_width=True,
-                height=120  # Reduced height
-            )
-            
-            # Chart with minimal padding
-            chart_data = prepare_chart_data(positions)
-            colors = ['#FFFFFF', '#666666']
-            
-            # Create the base chart specification
-            base = {
-                "mark": "bar",
-                "encoding": {
-                    "x": {
-                        "field": "Trader",
-                        "type": "nominal",
-                        "title": None,
-                        "axis": {
-                            "labelColor": "#FFFFFF",
-                            "titleColor": "#FFFFFF",
-                            "domainColor": "#333333",
-                            "tickColor": "#333333"
-                        }
-                    },
-                    "color": {
-                        "field": "Position",
-                        "type": "nominal",
-                        "scale": {"range": colors},
-                        "legend": {
-                            "orient": "top",
-                            "title": None,
-                            "labelColor": "#FFFFFF"
-                        },
-                        "sort": ["Long", "Short"]  # Changed order to make Long appear at bottom
-                    },
-                    "order": {"field": "Position", "sort": "ascending"},  # Changed to ascending
-                    "tooltip": [
-                        {"field": "Trader", "type": "nominal", "title": "Trader Type"},
-                        {"field": "Position", "type": "nominal"},
-                        {"field": "Value", "type": "quantitative", 
-                         "format": ".0f" if absolute_view else ".1%"}
-                    ]
-                },
-                "config": {
-                    "view": {"stroke": "transparent"},
-                    "axis": {
-                        "grid": "true",
-                        "gridColor": "#333333",
-                        "gridOpacity": 0.3
-                    },
-                    "background": "transparent"
-                }
-            }
-            
-            if not absolute_view:  # Normalized view
-                base["encoding"]["y"] = {
-                    "field": "Value",
-                    "type": "quantitative",
-                    "stack": "normalize",
-                    "axis": {
-                        "format": ".0%",
-                        "title": "Percentage",
-                        "labelColor": "#FFFFFF",
-                        "titleColor": "#FFFFFF"
-                    },
-                    "scale": {"domain": [0, 1]}
-                }
-            else:  # Absolute view
-                base["encoding"]["y"] = {
-                    "field": "Value",
-                    "type": "quantitative",
-                    "title": "Contracts",
-                    "axis": {
-                        "grid": "true",
-                        "gridColor": "#333333",
-                        "labelColor": "#FFFFFF",
-                        "titleColor": "#FFFFFF"
-                    }
-                }
-            
-            # Create and configure the chart
-            chart = st.vega_lite_chart(
-                chart_data,
-                base,
-                theme=None,
-                use_container_width=True
-            )
-            
-            # Update caption styling
-            st.markdown(
-                f"<div style='color: #FFFFFF; font-size: 0.8em; text-align: center;'>"
-                f"{'Absolute view (contracts)' if absolute_view else 'Normalized view (0-100%)'}"
-                "</div>",
-                unsafe_allow_html=True
-            )
+            # Switch between the single-market view and the cross-market screener
+            mode = tabs(options=['Market', 'Screener'], default_value='Market', key="view_tabs")
+            if mode == 'Screener':
+                render_screener(dataset.combined())
+            else:
+                render_market(dataset)
             
             # Bottom section with feature requests and support
             st.markdown("<hr style='margin: 2rem 0; border: none; border-top: 1px solid #333;'>", unsafe_allow_html=True)
@@ -512,13 +812,13 @@ def main():
             with col2:
                 contact_email = st.text_input("Your Email (optional)", key="contact_email")
             
-            # Support section at the bottom
+            # Support section at the bottom; the Ko-fi image comes from the asset cache, not the CDN
             st.markdown(
-                """
+                f"""
                 <div style='display: flex; flex-direction: column; align-items: center; gap: 1rem; margin: 2rem 0;'>
                     <a href='https://ko-fi.com/X7X47Q0EG' target='_blank'>
                         <img height='36' style='border:0px;height:36px;' 
-                        src='https://storage.ko-fi.com/cdn/kofi2.png?v=3' 
+                        src='{asset_src(KOFI_IMAGE)}' 
                         border='0' alt='Buy Me a Coffee at ko-fi.com' />
                     </a>
                     <p style='color: #666; font-size: 0.9em; text-align: center; margin-top: 0.5rem;'>
@@ -532,6 +832,9 @@ def main():
         except Exception as e:
             st.error(f"Error loading data: {e}")
             return
+        finally:
+            if dataset is not None:
+                watcher.release(dataset)
     
     # Force initial scroll to market section
     if 'initial_load' not in st.session_state:
@@ -545,5 +848,8 @@ def main():
             unsafe_allow_html=True
         )
 
+    if tracing.ENABLED:
+        render_debug_panel()
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.results import add_arguments, report
+from tests.fakes import synthetic_markets
+
+SIZES = [5, 50, 500, 5000]
+
+
+def per_call(fn, args_list, repeat, clear=None):
+    """Return the mean seconds per call of fn over every argument tuple
+
+    ``clear`` runs before each pass, untimed, so no pass is served from a
+    cache the previous one filled.
+    """
+    elapsed = 0.0
+    for _ in range(repeat):
+        if clear is not None:
+            clear()
+        start = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        elapsed += time.perf_counter() - start
+    return elapsed / (repeat * len(args_list))
+
+
+def build_engine(raw):
+    """Parse a dataset file's bytes and derive its positions engine, as a new dataset version does"""
+    from utils.dataset import parse_markets
+    from utils.positions import PositionsEngine
+
+    markets, positions, present = parse_markets(raw)
+    return markets, PositionsEngine(markets, (positions, present))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the app's per-market data functions")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--sample', type=int, default=200, help="Markets called per size")
+    parser.add_argument('--repeat', type=int, default=5)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import app
+    from utils.positions import _report_engine
+
+    # Keep the deferred pandas import out of the first timing
+    app.prepare_chart_data({})
+
+    results = {}
+    print(f"{'markets':>8s} {'dataset build':>14s} {'format_positions':>17s} "
+          f"{'from record':>12s} {'prepare_chart':>14s} {'key_metrics':>12s}")
+    for n in args.sizes:
+        raw = json.dumps(synthetic_markets(n)).encode()
+        build = per_call(build_engine, [(raw,)], args.repeat)
+        markets, engine = build_engine(raw)
+        sample = [(m, engine) for m in random.Random(n).sample(markets, min(n, args.sample))]
+
+        positions = [(app.format_positions_data(m, engine),) for m, _ in sample]
+        timings = {
+            'format_positions_data': per_call(app.format_positions_data, sample, args.repeat),
+            # A record outside any dataset builds a one-market engine per report
+            'format_positions_record': per_call(
+                app.format_positions_data, [(m,) for m, _ in sample], args.repeat, _report_engine.cache_clear
+            ),
+            'prepare_chart_data': per_call(app.prepare_chart_data, positions, args.repeat),
+            'calculate_key_metrics': per_call(app.calculate_key_metrics, sample, args.repeat)
+        }
+        results[f'dataset_build/{n}'] = build
+        for name, seconds in timings.items():
+            results[f'{name}/{n}'] = seconds
+        print(f"{n:8d} {build * 1000:12.2f}ms "
+              f"{timings['format_positions_data'] * 1e6:15.1f}us "
+              f"{timings['format_positions_record'] * 1e6:10.1f}us "
+              f"{timings['prepare_chart_data'] * 1e6:12.1f}us "
+              f"{timings['calculate_key_metrics'] * 1e6:10.1f}us")
+
+    sys.exit(report('app_functions', results, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+
+from benchmarks.results import add_arguments, report
+from benchmarks.synthetic import synthetic_panel
+from utils.backtest import STRATEGIES, backtest, param_grid
+from utils.executor import AnalyticsExecutor
+
+# Parameter sweeps of a few dozen sets per strategy
+GRIDS = {
+    'threshold': param_grid(threshold=range(0, 48, 2)),
+    'cot_index': param_grid(window=[8, 13, 26, 39, 52, 104], band=[5, 10, 15, 20, 25, 30]),
+    'flow_reversal': param_grid(lookback=range(1, 25))
+}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest throughput: strategies x markets x weeks per second")
+    parser.add_argument('--markets', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--weeks', type=int, default=520)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    executor = AnalyticsExecutor(max_workers=args.workers, min_rows=0)
+    results = {}
+    print(f"cpus={os.cpu_count()} workers={executor.max_workers} weeks={args.weeks}")
+    print(f"{'markets':>8s} {'strategy':>14s} {'params':>7s} {'thread':>9s} {'cells/s':>10s} "
+          f"{'pool':>9s} {'cells/s':>10s}")
+    try:
+        for n in args.markets:
+            panel = synthetic_panel(n, args.weeks)
+            for name in STRATEGIES:
+                grid = GRIDS[name]
+                params = len(next(iter(grid.values())))
+                cells = params * n * args.weeks
+                thread = best_of(lambda: backtest(panel, name, grid, curves=False), args.repeat)
+                # Publishing the panel and starting the workers is not timed
+                backtest(panel, name, grid, curves=False, executor=executor)
+                pool = best_of(lambda: backtest(panel, name, grid, curves=False, executor=executor), args.repeat)
+                results[f'{name}/thread/{n}'] = thread
+                results[f'{name}/pool/{n}'] = pool
+                print(f"{n:8d} {name:>14s} {params:7d} {thread * 1000:7.1f}ms {cells / thread:10.3g} "
+                      f"{pool * 1000:7.1f}ms {cells / pool:10.3g}")
+    finally:
+        executor.shutdown()
+
+    sys.exit(report('backtest', results, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.cot_index import CotIndexEngine
+from utils.positions import TRADERS
+
+
+def naive_stats(frame, window):
+    """Baseline: recompute rolling stats over the whole history with pandas"""
+    grouped = frame.groupby('market')['net']
+    low = grouped.rolling(window, min_periods=1).min().reset_index(level=0, drop=True)
+    high = grouped.rolling(window, min_periods=1).max().reset_index(level=0, drop=True)
+    mean = grouped.rolling(window, min_periods=1).mean().reset_index(level=0, drop=True)
+    std = grouped.rolling(window, min_periods=1).std(ddof=0).reset_index(level=0, drop=True)
+    pct = grouped.rolling(window, min_periods=1).rank(method='max', pct=True).reset_index(level=0, drop=True)
+    return pd.DataFrame({
+        'index': (frame['net'] - low) / (high - low) * 100,
+        'percentile': pct * 100,
+        'zscore': (frame['net'] - mean) / std,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental COT index vs pandas rolling recompute")
+    parser.add_argument('--markets', type=int, default=500)
+    parser.add_argument('--weeks', type=int, default=520)
+    parser.add_argument('--window', type=int, default=26)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    nets = rng.integers(-100_000, 100_000, size=(args.markets, args.weeks + 1, len(TRADERS)))
+    dates = np.datetime64('2015-01-06') + np.arange(args.weeks + 1) * 7
+
+    engine = CotIndexEngine(args.window)
+    start = time.perf_counter()
+    for m in range(args.markets):
+        for w in range(args.weeks):
+            engine.update(f'm{m}', dates[w], nets[m, w])
+    seed_time = time.perf_counter() - start
+
+    # One new weekly report for every market
+    start = time.perf_counter()
+    for m in range(args.markets):
+        engine.update(f'm{m}', dates[-1], nets[m, -1])
+    incremental_time = time.perf_counter() - start
+
+    # Baseline recomputes every trader class over the full history
+    frames = [
+        pd.DataFrame({
+            'market': np.repeat([f'm{m}' for m in range(args.markets)], args.weeks + 1),
+            'net': nets[:, :, t].ravel()
+        })
+        for t in range(len(TRADERS))
+    ]
+    start = time.perf_counter()
+    naive = [naive_stats(frame, args.window) for frame in frames]
+    naive_time = time.perf_counter() - start
+
+    # Latest row of each market must agree
+    for t, trader in enumerate(TRADERS):
+        expected = naive[t].groupby(frames[t]['market']).tail(1).reset_index(drop=True)
+        actual = pd.DataFrame([engine.stats(f'm{m}')[trader] for m in range(args.markets)])
+        for col in ('index', 'percentile'):
+            np.testing.assert_allclose(actual[col], expected[col], rtol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(actual['zscore'], expected['zscore'].fillna(0), rtol=1e-6, atol=1e-9)
+
+    print(f"markets={args.markets} weeks={args.weeks} window={args.window}")
+    print(f"seed from history: {seed_time:.2f}s")
+    print(f"new weekly report: incremental {incremental_time * 1000:.1f}ms, "
+          f"pandas rolling recompute {naive_time * 1000:.1f}ms "
+          f"({naive_time / incremental_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from tests.fakes import synthetic_markets
+from utils.executor import TASKS, AnalyticsExecutor
+from utils.positions import TRADERS, PositionsEngine
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else float('nan')
+
+
+def simulate(sessions, requests, heavy, light):
+    """Run sessions concurrently, each alternating a heavy analytics call and a market view"""
+    heavy_times, light_times = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session():
+        barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            heavy()
+            mid = time.perf_counter()
+            light()
+            end = time.perf_counter()
+            with lock:
+                heavy_times.append(mid - start)
+                light_times.append(end - mid)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return heavy_times, light_times, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of heavy analytics on session threads vs the process pool")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=200_000, help="Screener rows to rank")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = {
+        'net': rng.integers(-100_000, 100_000, size=(args.rows, len(TRADERS))),
+        'net_change': rng.integers(-10_000, 10_000, size=(args.rows, len(TRADERS))),
+        'dominant_share': rng.random(args.rows)
+    }
+
+    engine = PositionsEngine(synthetic_markets(500))
+    names = engine.names
+
+    def light():
+        engine.table(names[np.random.randint(len(names))], absolute=False)
+
+    executor = AnalyticsExecutor(max_workers=args.workers, min_rows=0)
+    executor.publish('screener', columns)
+    # Start the workers before timing
+    executor.run('screener_orders', 'screener')
+
+    modes = {
+        'thread': lambda: TASKS['screener_orders'](columns, lambda: None),
+        'pool': lambda: executor.run('screener_orders', 'screener')
+    }
+
+    print(f"rows={args.rows} cpus={os.cpu_count()} workers={executor.max_workers}")
+    print(f"{'sessions':>8s} {'mode':>6s} {'heavy p50':>10s} {'heavy p95':>10s} "
+          f"{'view p50':>9s} {'view p95':>9s} {'req/s':>7s}")
+    try:
+        for sessions in args.sessions:
+            for mode, heavy in modes.items():
+                heavy_times, light_times, elapsed = simulate(sessions, args.requests, heavy, light)
+                print(f"{sessions:8d} {mode:>6s} "
+                      f"{percentile(heavy_times, 50):8.0f}ms {percentile(heavy_times, 95):8.0f}ms "
+                      f"{percentile(light_times, 50):7.1f}ms {percentile(light_times, 95):7.1f}ms "
+                      f"{len(heavy_times) / elapsed:7.1f}")
+    finally:
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.results import add_arguments, report
+from tests.fakes import report_dates
+from utils.history import VALUE_COLUMNS, HistoryStore
+from utils.positions import POSITION_FIELDS
+
+CASES = ['csv', 'parquet', 'dataframe']
+
+
+def build_history(path, n_markets, weeks, seed=0):
+    """Fill a history store with random reports for n_markets over weeks"""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 250_000, size=(n_markets, weeks, len(POSITION_FIELDS)))
+    dates = report_dates(weeks)
+    rows = []
+    for i in range(n_markets):
+        for w, date in enumerate(dates):
+            report = dict(zip(POSITION_FIELDS, values[i, w].tolist()))
+            report[VALUE_COLUMNS[-1]] = int(max(values[i, w, :3].sum(), values[i, w, 3:].sum()))
+            report['report_date_as_yyyy_mm_dd'] = date
+            rows.append((f'Synthetic {i:05d}', report))
+    store = HistoryStore(path)
+    store.append(rows)
+    return store
+
+
+def _status_mb(field):
+    # VmHWM, unlike ru_maxrss, starts over on exec, so a spawned child does
+    # not inherit the parent's peak
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def _run(case, history_path, out_path):
+    """Export once in a fresh process; returns (rows, seconds, peak RSS over the start in MB)"""
+    from utils.export import _concat, export_blocks, write_export
+
+    history = HistoryStore(history_path)
+    history.version
+    # Libraries are imported first so only the export's working memory is measured
+    if case == 'parquet':
+        import pyarrow.parquet  # noqa: F401
+    elif case == 'dataframe':
+        import pandas as pd
+    before = _status_mb('VmRSS')
+    start = time.perf_counter()
+    if case == 'dataframe':
+        # The approach the export replaces: one DataFrame of everything, then to_csv
+        frame = pd.DataFrame(_concat(list(export_blocks(history=history))))
+        frame.to_csv(out_path, index=False)
+        rows = len(frame)
+    else:
+        rows = write_export(out_path, case, history=history)
+    elapsed = time.perf_counter() - start
+    peak = _status_mb('VmHWM')
+    return rows, elapsed, peak - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export throughput (rows/s) and peak RSS, streamed vs one DataFrame")
+    parser.add_argument('--markets', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--weeks', type=int, default=520)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Each export runs in its own process so peak RSS is not shared between cases
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    print(f"{'markets':>8s} {'case':>10s} {'rows':>10s} {'time':>9s} {'rows/s':>10s} {'peak RSS':>10s} {'file':>9s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.markets:
+            history_path = Path(tmp) / f'history-{n}'
+            build_history(history_path, n, args.weeks)
+            for case in CASES:
+                out_path = Path(tmp) / f'export-{n}.{case}'
+                with context.Pool(1) as pool:
+                    rows, elapsed, peak = pool.apply(_run, (case, history_path, out_path))
+                size = out_path.stat().st_size / 2**20
+                results[f'{case}/seconds/{n}'] = elapsed
+                results[f'{case}/peak_mb/{n}'] = peak
+                print(f"{n:8d} {case:>10s} {rows:10d} {elapsed * 1000:7.0f}ms {rows / elapsed:10.3g} "
+                      f"{peak:8.1f}MB {size:7.1f}MB")
+                out_path.unlink()
+
+    sys.exit(report('export', results, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import time
+
+from tests.fakes import FakeSocrata, synthetic_markets, synthetic_rows
+from utils.async_fetch import fetch_markets
+from utils.ingest import REPORT_DATE, REPORT_FIELDS, SOCRATA_RESOURCE, make_session, soql_quote
+
+
+def fetch_serial(markets, base_url):
+    """Baseline: one blocking request per market, one after another"""
+    session = make_session()
+    records = []
+    for market in markets:
+        params = {
+            '$select': ','.join(REPORT_FIELDS),
+            '$where': f"market_and_exchange_names = {soql_quote(market['market_and_exchange_names'])}",
+            '$order': f'{REPORT_DATE} DESC',
+            '$limit': '2'
+        }
+        rows = session.get(base_url + SOCRATA_RESOURCE, params=params, timeout=30).json()
+        records.append({**market, 'latest_report': rows[0], 'previous_report': rows[1]})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs concurrent multi-market fetch")
+    parser.add_argument('--markets', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated server latency (s)")
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    markets = synthetic_markets(args.markets)
+    with FakeSocrata(synthetic_rows(args.markets, weeks=4), latency=args.latency) as server:
+        start = time.perf_counter()
+        serial = fetch_serial(markets, server.url)
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = fetch_markets(markets, base_url=server.url, concurrency=args.concurrency)
+        async_time = time.perf_counter() - start
+
+    assert [r['latest_report'][REPORT_DATE] for r in serial] == \
+        [r['latest_report'][REPORT_DATE] for r in concurrent]
+    print(f"markets={args.markets} latency={args.latency * 1000:.0f}ms concurrency={args.concurrency}")
+    print(f"serial: {serial_time:.2f}s  async: {async_time:.2f}s  speedup: {serial_time / async_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent.absolute()
+
+# Cold-start budget for importing each entry point, in milliseconds
+BUDGETS_MS = {
+    'app': 1000,
+    'utils.feedback': 1000,
+}
+
+# Heavy dependencies that must only load on the code paths that use them
+DEFERRED = ['altair', 'streamlit_shadcn_ui', 'firebase_admin', 'streamlit_lottie', 'requests', 'pandas']
+
+
+def import_profile(module):
+    """Import a module in a fresh interpreter and parse its -X importtime report
+
+    Returns ({package: (self_us, cumulative_us, depth)}, loaded_module_names).
+    """
+    code = f"import sys, {module}; print('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    # Children are reported before their parent, so walk back from the module's line
+    profile = {}
+    end = next(i for i, entry in enumerate(entries) if entry[0] == module and entry[3] == 0)
+    for name, self_us, cumulative_us, depth in reversed(entries[:end + 1]):
+        if depth == 0 and name != module:
+            break
+        profile.setdefault(name, (self_us, cumulative_us, depth))
+    return profile, set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown and cold-start budget check")
+    parser.add_argument('--top', type=int, default=15, help="Number of imports to list per entry point")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters per entry point (best run counts)")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in BUDGETS_MS.items():
+        runs = [import_profile(module) for _ in range(args.runs)]
+        profile, loaded = min(runs, key=lambda run: run[0][module][1])
+        total_ms = profile[module][1] / 1000
+
+        print(f"{module}: {total_ms:.0f}ms (budget {budget}ms)")
+        direct = [(name, stats) for name, stats in profile.items() if stats[2] == 1 and name != module]
+        for name, (_, cumulative_us, _) in sorted(direct, key=lambda x: -x[1][1])[:args.top]:
+            print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+        if total_ms > budget:
+            failures.append(f"{module} took {total_ms:.0f}ms, over its {budget}ms budget")
+        for name in DEFERRED:
+            if name in loaded:
+                failures.append(f"{module} eagerly imports {name}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
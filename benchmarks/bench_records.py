@@ -0,0 +1,41 @@
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from tests.fakes import synthetic_markets
+from utils.dataset import parse_markets
+
+
+def retained(build):
+    """Return (result, bytes still allocated by it, seconds) for one build"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of typed market records vs raw dicts of strings")
+    parser.add_argument('--markets', type=int, nargs='+', default=[500, 5000, 50000])
+    args = parser.parse_args()
+
+    # Times include tracemalloc overhead; compare them with each other only
+    print(f"{'markets':>8s} {'dicts':>10s} {'records':>10s} {'saved':>6s} {'parse dicts':>12s} {'parse+validate':>15s}")
+    for n in args.markets:
+        raw = json.dumps(synthetic_markets(n)).encode()
+        dicts, dict_bytes, dict_time = retained(lambda: json.loads(raw))
+        del dicts
+        records, record_bytes, record_time = retained(lambda: parse_markets(raw))
+        del records
+        print(f"{n:8d} {dict_bytes / 2**20:8.2f}MB {record_bytes / 2**20:8.2f}MB "
+              f"{1 - record_bytes / dict_bytes:6.0%} {dict_time * 1000:10.0f}ms {record_time * 1000:13.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import time
+
+from tests.fakes import synthetic_markets
+from utils.dataset import load_dataset
+from utils.search import SearchIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query time of the market search index")
+    parser.add_argument('--markets', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    markets = load_dataset().markets + synthetic_markets(args.markets)
+    start = time.perf_counter()
+    index = SearchIndex(markets)
+    build_time = time.perf_counter() - start
+    print(f"catalogue={len(index)} markets, build {build_time * 1000:.0f}ms")
+
+    queries = {
+        'ticker': 'BTCUSDT',
+        'prefix': 'micro eth',
+        'short prefix': 's',
+        'three letters': 'syn',
+        'synthetic prefix': 'syn0421',
+        'fuzzy': 'etherium',
+        'miss': 'zzzz'
+    }
+    for kind, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query)
+        per_query = (time.perf_counter() - start) / args.repeat
+        print(f"{kind:17s} {query!r:12s} {per_query * 1e6:8.1f}us  {results[:3]}")
+
+
+if __name__ == '__main__':
+    main()
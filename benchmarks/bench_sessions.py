@@ -0,0 +1,148 @@
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.results import add_arguments, report
+
+APP_PATH = Path(__file__).parent.parent.absolute() / 'app.py'
+
+# Synthetic markets are spread over these exchanges, one partition each
+EXCHANGES = ['binance', 'coinbase', 'kraken', 'okx']
+
+
+def rss_mb():
+    """Resident set size of this process in MB"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def session_step(at, options, rng):
+    """Pick another market or flip the view switch, then rerun; returns the rerun time"""
+    if rng.random() < 0.5:
+        at.selectbox(key='selected_market').select(rng.choice(options))
+    else:
+        at.session_state['view_mode_toggle'] = not at.session_state['view_mode_toggle']
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start
+
+
+def run_session(seed, steps, options, ready, results):
+    """Drive one session in this process: a first run, then reruns once every session is ready"""
+    from streamlit.testing.v1 import AppTest
+
+    # Sessions driven outside a server warn about a missing script context
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+    before = rss_mb()
+    start = time.perf_counter()
+    at = AppTest.from_file(str(APP_PATH), default_timeout=120).run()
+    first_run = time.perf_counter() - start
+    memory = max(rss_mb() - before, 0.0)
+
+    ready.wait()
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    if len(at.selectbox(key='selected_market').options) != len(options):
+        errors.append("The app did not load the synthetic dataset")
+    for _ in range(steps):
+        latencies.append(session_step(at, options, rng))
+        if at.exception:
+            errors.append(at.exception[0].message)
+    results.put((first_run, memory, latencies, errors))
+
+
+def run_sessions(count, steps, options):
+    """Run sessions in parallel processes; returns their results and the seconds their reruns took
+
+    AppTest swaps a process-global runtime on every run, so sessions cannot
+    share a process; each one pays its own imports and caches.
+    """
+    ctx = mp.get_context('spawn')
+    ready = ctx.Barrier(count + 1)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=run_session, args=(i, steps, options, ready, results))
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start = time.perf_counter()
+    sessions = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return sessions, elapsed
+
+
+def write_dataset(markets, layout):
+    """Write the dataset where COT_DATA_PATH and COT_PARTITION_PATH point"""
+    Path(os.environ['COT_DATA_PATH']).write_text(json.dumps(markets))
+    if layout == 'partitioned':
+        from utils.partitions import write_partitions
+
+        write_partitions(markets, os.environ['COT_PARTITION_PATH'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent headless sessions of the dashboard via AppTest")
+    parser.add_argument('--markets', type=int, default=500)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--steps', type=int, default=10, help="Reruns per session")
+    parser.add_argument('--layout', choices=['partitioned', 'file'], default='partitioned',
+                        help="Serve the dataset from per-exchange partitions or from one file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Point the app at a synthetic dataset before anything imports utils,
+    # whose default paths are read once; an empty partition directory makes
+    # the app fall back to the single file. Session processes inherit both.
+    root = Path(tempfile.mkdtemp())
+    os.environ['COT_DATA_PATH'] = str(root / 'markets.json')
+    os.environ['COT_PARTITION_PATH'] = str(root / 'partitions')
+    from tests.fakes import synthetic_markets
+
+    markets = synthetic_markets(args.markets)
+    for i, market in enumerate(markets):
+        market['exchange'] = EXCHANGES[i % len(EXCHANGES)]
+    write_dataset(markets, args.layout)
+    options = [m['display_name'] for m in markets]
+
+    results = {}
+    print(f"markets={args.markets} layout={args.layout} steps={args.steps} cpus={os.cpu_count()}")
+    print(f"{'sessions':>8s} {'first run':>10s} {'p50':>8s} {'p95':>8s} {'p99':>8s} "
+          f"{'reruns/s':>9s} {'MB/process':>11s} {'errors':>7s}")
+    for count in args.sessions:
+        sessions, elapsed = run_sessions(count, args.steps, options)
+        first_run = float(np.mean([first for first, _, _, _ in sessions]))
+        per_process = float(np.mean([memory for _, memory, _, _ in sessions]))
+        latencies = [seconds for _, _, times, _ in sessions for seconds in times]
+        errors = [message for _, _, _, messages in sessions for message in messages]
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        throughput = len(latencies) / elapsed
+        print(f"{count:8d} {first_run * 1000:8.0f}ms {p50 * 1000:6.0f}ms {p95 * 1000:6.0f}ms "
+              f"{p99 * 1000:6.0f}ms {throughput:9.1f} {per_process:11.2f} {len(errors):7d}")
+        for message in sorted(set(errors))[:3]:
+            print(f"    {message}")
+
+        results[f'rerun_p50/{count}'] = p50
+        results[f'rerun_p95/{count}'] = p95
+        results[f'seconds_per_rerun/{count}'] = elapsed / len(latencies)
+        results[f'mb_per_process/{count}'] = per_process
+
+    sys.exit(report(f'sessions_{args.layout}', results, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import json
+import os
+import platform
+from pathlib import Path
+
+# Stored baselines, one JSON file per benchmark
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# Slowdown over the baseline that counts as a regression
+TOLERANCE = 0.25
+
+
+def save_results(name, results):
+    """Store results as the new baseline; every value is lower-is-better"""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f'{name}.json'
+    payload = {
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + '\n')
+    return path
+
+
+def compare_results(name, results, tolerance=TOLERANCE):
+    """Print each result against the stored baseline and return the regressions"""
+    path = RESULTS_DIR / f'{name}.json'
+    if not path.exists():
+        print(f"No baseline at {path}; run with --save first")
+        return []
+    baseline = json.loads(path.read_text())['results']
+    regressions = []
+    for key, value in sorted(results.items()):
+        base = baseline.get(key)
+        if not base:
+            print(f"{key:48s} {value:12.6g}   (new)")
+            continue
+        ratio = value / base
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key:48s} {value:12.6g} vs {base:12.6g}  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument('--save', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--compare', action='store_true',
+                        help="Compare against the stored baseline; exit non-zero on a regression")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+
+
+def report(name, results, args):
+    """Save and/or compare results as requested on the command line; returns an exit status"""
+    status = 0
+    if args.compare and compare_results(name, results, args.tolerance):
+        status = 1
+    if args.save:
+        print(f"Saved baseline to {save_results(name, results)}")
+    return status
@@ -0,0 +1,13 @@
+import numpy as np
+
+
+def synthetic_panel(n_markets, weeks, seed=0):
+    """Return a backtest Panel of random-walk positioning and prices"""
+    from utils.backtest import Panel
+
+    rng = np.random.default_rng(seed)
+    net = np.cumsum(rng.normal(0, 2_000, size=(n_markets, weeks, 3)), axis=1)
+    open_interest = np.abs(net).sum(axis=2) + 100_000
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, size=(n_markets, weeks)), axis=1))
+    dates = np.datetime64('2024-12-24', 'D') - np.arange(weeks)[::-1] * 7
+    return Panel([f'Synthetic {i:05d}' for i in range(n_markets)], dates, net, open_interest, prices)
@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from utils.ingest import make_session
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def wait_until():
+    """Poll a predicate until it holds; returns False after ``timeout`` seconds"""
+    return _wait_until
+
+
+@pytest.fixture
+def session():
+    """A requests session that retries at once, for the local fake servers"""
+    return make_session(retries=3, backoff=0)
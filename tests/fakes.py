@@ -0,0 +1,340 @@
+import json
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from utils.ingest import SOCRATA_RESOURCE
+from utils.positions import OPEN_INTEREST, POSITION_FIELDS
+from utils.prices import DAY_MS, KLINES_RESOURCE
+
+_DATE_FILTER = re.compile(r"report_date_as_yyyy_mm_dd\s*>\s*'([^']*)'")
+_IN_FILTER = re.compile(r"market_and_exchange_names\s+in\s*\(([^)]*)\)", re.IGNORECASE)
+_EQ_FILTER = re.compile(r"market_and_exchange_names\s*=\s*'((?:[^']|'')*)'")
+
+
+def _quoted_values(text):
+    return [v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", text)]
+
+
+def report_dates(weeks, end='2024-12-24'):
+    """Return weekly Socrata-style report dates ending at end, oldest first"""
+    days = np.datetime64(end, 'D') - np.arange(weeks)[::-1] * 7
+    return [f'{d}T00:00:00.000' for d in days]
+
+
+def synthetic_rows(n_markets, weeks=2, seed=0):
+    """Return Socrata report rows for n_markets synthetic contracts"""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 250_000, size=(n_markets, weeks, len(POSITION_FIELDS)))
+    rows = []
+    for w, date in enumerate(report_dates(weeks)):
+        for i in range(n_markets):
+            row = {
+                'market_and_exchange_names': f'SYNTHETIC {i:05d} - TEST EXCHANGE',
+                'report_date_as_yyyy_mm_dd': date
+            }
+            row.update({f: str(v) for f, v in zip(POSITION_FIELDS, values[i, w])})
+            # Legacy reports balance longs and shorts plus spreading
+            row[OPEN_INTEREST] = str(max(values[i, w, :3].sum(), values[i, w, 3:].sum()))
+            rows.append(row)
+    return rows
+
+
+def synthetic_markets(n_markets, seed=0):
+    """Return market records in the dataset schema for n_markets synthetic contracts"""
+    latest, previous = report_dates(2)[::-1]
+    by_date = {}
+    for row in synthetic_rows(n_markets, weeks=2, seed=seed):
+        by_date[(row['market_and_exchange_names'], row['report_date_as_yyyy_mm_dd'])] = {
+            k: v for k, v in row.items() if k != 'market_and_exchange_names'
+        }
+    markets = []
+    for i in range(n_markets):
+        name = f'SYNTHETIC {i:05d} - TEST EXCHANGE'
+        markets.append({
+            'display_name': f'Synthetic {i:05d}',
+            'instrument_name': f'SYN{i:05d}USDT',
+            'market_and_exchange_names': name,
+            'asset_type': 'crypto',
+            'exchange': 'binance',
+            'searchable_terms': [f'SYN{i:05d}', 'Synthetic', f'SYN{i:05d}USDT'],
+            'latest_report': by_date[(name, latest)],
+            'previous_report': by_date[(name, previous)]
+        })
+    return markets
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Deep enough backlog that concurrent clients are not dropped and retried
+    request_queue_size = 128
+
+
+class _StubServer(ABC):
+    """Run a ThreadingHTTPServer on a free local port in a background thread
+
+    Subclasses provide the request handler class with ``_handler``.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @abstractmethod
+    def _handler(self):
+        """Return the BaseHTTPRequestHandler subclass serving this stub"""
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+class FakeSocrata(_StubServer):
+    """Serve CFTC report rows with the subset of SoQL the ingest pipeline uses
+
+    Supports ``$where`` with a ``report_date_as_yyyy_mm_dd > '...'`` bound and
+    a ``market_and_exchange_names`` ``=``/``in (...)`` filter, plus
+    ``$order``, ``$limit`` and ``$offset``. ``latency`` delays every response,
+    ``fail_first`` answers the first N requests with a 503 and
+    ``truncate_first`` cuts the body of the next N off halfway, as a dropped
+    connection would.
+    """
+
+    def __init__(self, rows, latency=0.0, fail_first=0, truncate_first=0):
+        super().__init__()
+        self.rows = list(rows)
+        self.latency = latency
+        self.fail_first = fail_first
+        self.truncate_first = truncate_first
+
+    def select(self, params):
+        """Apply SoQL paging and filters to the stored rows"""
+        rows = self.rows
+        where = params.get('$where', '')
+        date_bound = _DATE_FILTER.search(where)
+        if date_bound:
+            rows = [r for r in rows if r['report_date_as_yyyy_mm_dd'] > date_bound.group(1)]
+        names = _IN_FILTER.search(where)
+        if names:
+            wanted = set(_quoted_values(names.group(1)))
+            rows = [r for r in rows if r['market_and_exchange_names'] in wanted]
+        name = _EQ_FILTER.search(where)
+        if name:
+            wanted = name.group(1).replace("''", "'")
+            rows = [r for r in rows if r['market_and_exchange_names'] == wanted]
+        if params.get('$order'):
+            keys = [k.split()[0] for k in params['$order'].split(',')]
+            descending = params['$order'].split(',')[0].strip().upper().endswith('DESC')
+            rows = sorted(rows, key=lambda r: tuple(r.get(k, '') for k in keys), reverse=descending)
+        offset = int(params.get('$offset', 0))
+        limit = int(params.get('$limit', 1000))
+        return rows[offset:offset + limit]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                count = stub._count()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                if url.path != SOCRATA_RESOURCE:
+                    return self._reply(404, {'error': 'not found'})
+                if count <= stub.fail_first:
+                    return self._reply(503, {'error': 'unavailable'})
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if count <= stub.fail_first + stub.truncate_first:
+                    return self._truncated(stub.select(params))
+                self._reply(200, stub.select(params))
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _truncated(self, body):
+                # Without a length the body runs to the close, so a cut reads as a clean end
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(payload[:len(payload) // 2])
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def daily_klines(start, days, price=100.0, seed=0):
+    """Generate a random-walk daily kline series in the Binance response format
+
+    ``start`` is a date (``'2024-01-01'``); prices and volumes are strings,
+    as Binance returns them.
+    """
+    rng = np.random.default_rng(seed)
+    first = int(np.datetime64(start, 'ms').astype(np.int64))
+    closes = price * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    opens = np.concatenate([[price], closes[:-1]])
+    rows = []
+    for d in range(days):
+        open_time = first + d * DAY_MS
+        high = max(opens[d], closes[d]) * 1.01
+        low = min(opens[d], closes[d]) * 0.99
+        rows.append([
+            open_time, f'{opens[d]:.2f}', f'{high:.2f}', f'{low:.2f}', f'{closes[d]:.2f}',
+            f'{rng.uniform(1000, 5000):.3f}', open_time + DAY_MS - 1, '0', 0, '0', '0', '0'
+        ])
+    return rows
+
+
+class FakeBinance(_StubServer):
+    """Serve daily klines for a few symbols the way the Binance spot API does
+
+    ``klines`` maps a symbol to its rows (see ``daily_klines``). Supports
+    ``symbol``, ``interval=1d``, ``startTime``, ``endTime`` and ``limit``;
+    unknown symbols get Binance's 400 error body.
+    """
+
+    def __init__(self, klines, latency=0.0):
+        super().__init__()
+        self.klines = klines
+        self.latency = latency
+
+    def select(self, params):
+        """Return the klines of one symbol whose open time falls in the requested range"""
+        rows = self.klines[params['symbol']]
+        start = int(params.get('startTime', 0))
+        end = int(params.get('endTime', 2**62))
+        limit = min(int(params.get('limit', 500)), 1000)
+        return [r for r in rows if start <= r[0] <= end][:limit]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub._count()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                if url.path != KLINES_RESOURCE:
+                    return self._reply(404, {'code': -1, 'msg': 'not found'})
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if params.get('symbol') not in stub.klines:
+                    return self._reply(400, {'code': -1121, 'msg': 'Invalid symbol.'})
+                if params.get('interval') != '1d':
+                    return self._reply(400, {'code': -1120, 'msg': 'Invalid interval.'})
+                self._reply(200, stub.select(params))
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class FakeFirestore:
+    """In-memory stand-in for the parts of a Firestore client the feedback writer uses
+
+    ``latency`` delays every commit and ``available`` can be switched off to
+    simulate an unreachable backend.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.available = True
+        self.documents = {}
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def _write(self, writes):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.available:
+            raise ConnectionError("Firestore unavailable")
+        with self._lock:
+            self.commits += 1
+            for path, data in writes:
+                self.documents[path] = data
+
+
+class _FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, doc_id):
+        return f'{self.name}/{doc_id}'
+
+    def add(self, data):
+        self.client._write([(self.document(uuid.uuid4().hex), data)])
+
+
+class _FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        self.client._write(self.writes)
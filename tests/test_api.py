@@ -0,0 +1,164 @@
+import functools
+import io
+import json
+import threading
+from http.client import HTTPConnection
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import api
+from api import ARROW_TYPE, etag_matches
+from tests.fakes import synthetic_markets
+from utils.dataset import load_dataset
+from utils.export import EXPORT_COLUMNS
+from utils.history import HistoryStore
+from utils.snapshot import snapshot_for
+
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize('header', [
+    '"abc123"',
+    'W/"abc123"',
+    '"old", "abc123"',
+    '"old",W/"abc123"',
+    '*',
+])
+def test_matching_if_none_match(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize('header', [None, '', '"old"', '"abc"', 'W/"old", "other"', 'abc123'])
+def test_non_matching_if_none_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+def test_arrow_etag_is_distinct_from_json():
+    assert not etag_matches('"abc123"', '"abc123-arrow"')
+    assert etag_matches('"abc123", "abc123-arrow"', '"abc123-arrow"')
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    path = tmp_path / 'markets.json'
+    path.write_text(json.dumps(synthetic_markets(3)))
+    history = HistoryStore(tmp_path / 'history')
+    monkeypatch.setattr(api, 'load_catalog', lambda: load_dataset(path))
+    monkeypatch.setattr(api, 'get_history', lambda: history)
+    monkeypatch.setattr(api, 'snapshot_for', functools.partial(snapshot_for, path=tmp_path / 'snapshots'))
+    monkeypatch.setattr(api, '_state', None)
+
+    httpd = api.ApiServer(('127.0.0.1', 0), api.ApiHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(address, path, **headers):
+    conn = HTTPConnection(*address, timeout=10)
+    try:
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_markets_and_market_json(server):
+    status, headers, body = _get(server, '/markets')
+    assert status == 200
+    assert headers['Content-Type'] == 'application/json'
+    payload = json.loads(body)
+    assert [m['display_name'] for m in payload['markets']] == ['Synthetic 00000', 'Synthetic 00001', 'Synthetic 00002']
+    assert headers['ETag'] == f'"{payload["version"]}"'
+    assert 'Vary' not in headers
+
+    status, headers, body = _get(server, '/markets/Synthetic%2000001')
+    assert status == 200
+    assert json.loads(body)['market'] == 'Synthetic 00001'
+
+
+@pytest.mark.parametrize('path', ['/markets/Nope', '/nope', '/markets/a/b', '/'])
+def test_unknown_paths_are_404(server, path):
+    status, _, body = _get(server, path)
+    assert status == 404
+    assert b'error' in body
+
+
+def test_unknown_path_does_not_build_state(server, monkeypatch):
+    def fail():
+        raise AssertionError("state built")
+
+    monkeypatch.setattr(api, 'current_state', fail)
+    assert _get(server, '/nope')[0] == 404
+
+
+def test_matching_etag_is_304(server):
+    _, headers, _ = _get(server, '/markets')
+    etag = headers['ETag']
+    for tag in (etag, f'W/{etag}', f'"old", {etag}'):
+        status, headers, body = _get(server, '/markets', **{'If-None-Match': tag})
+        assert status == 304
+        assert body == b''
+        assert headers['ETag'] == etag
+    assert _get(server, '/markets', **{'If-None-Match': '"old"'})[0] == 200
+
+
+def test_positions_negotiates_json_or_arrow(server):
+    status, headers, body = _get(server, '/positions')
+    assert status == 200
+    assert headers['Content-Type'] == 'application/json'
+    assert headers['Vary'] == 'Accept'
+    assert len(json.loads(body)['markets']) == 3
+    json_etag = headers['ETag']
+
+    for path, accept in (('/positions', ARROW_TYPE), ('/positions?format=arrow', 'application/json')):
+        status, headers, body = _get(server, path, Accept=accept)
+        assert status == 200
+        assert headers['Content-Type'] == ARROW_TYPE
+        assert headers['Vary'] == 'Accept'
+        assert headers['ETag'] != json_etag
+        table = pa.ipc.open_stream(body).read_all()
+        assert sorted(set(table['market'].to_pylist())) == ['Synthetic 00000', 'Synthetic 00001', 'Synthetic 00002']
+
+    # The JSON tag does not validate the Arrow body
+    status, headers, _ = _get(server, '/positions', Accept=ARROW_TYPE, **{'If-None-Match': json_etag})
+    assert status == 200
+    status, headers, _ = _get(server, '/positions', Accept=ARROW_TYPE, **{'If-None-Match': headers['ETag']})
+    assert status == 304
+    assert headers['Vary'] == 'Accept'
+
+
+def test_positions_filters_markets(server):
+    _, _, body = _get(server, '/positions?market=Synthetic%2000002&market=Nope')
+    assert [m['market'] for m in json.loads(body)['markets']] == ['Synthetic 00002']
+
+
+def test_export_streams_csv_without_building_state(server, monkeypatch):
+    def fail():
+        raise AssertionError("state built")
+
+    monkeypatch.setattr(api, 'current_state', fail)
+    status, headers, body = _get(server, '/export?market=Synthetic%2000000')
+    assert status == 200
+    assert headers['Transfer-Encoding'] == 'chunked'
+    assert headers['Content-Type'] == 'text/csv'
+    lines = body.decode().splitlines()
+    assert lines[0].split(',') == EXPORT_COLUMNS
+    # Two reports, one row per trader class
+    assert len(lines) == 1 + 2 * 3
+    assert {line.split(',')[0] for line in lines[1:]} == {'Synthetic 00000'}
+
+
+def test_export_parquet_and_bad_requests(server):
+    status, headers, body = _get(server, '/export?format=parquet')
+    assert status == 200
+    assert headers['Content-Type'] == 'application/vnd.apache.parquet'
+    assert pq.read_table(io.BytesIO(body)).num_rows == 3 * 2 * 3
+
+    assert _get(server, '/export?format=xml')[0] == 400
+    assert _get(server, '/export?start=not-a-date')[0] == 400
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+import pytest
+
+from utils.assets import AssetCache
+
+URL = 'https://cdn.example/logo.png'
+
+
+class Fetcher:
+    """Serves fixed bytes per URL and counts calls; blocks while ``gate`` is clear"""
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, url):
+        self.calls.append(url)
+        self.gate.wait(5)
+        if url not in self.assets:
+            raise OSError(f'no such asset {url}')
+        return self.assets[url], 'image/png'
+
+
+@pytest.fixture
+def fetcher():
+    return Fetcher({URL: b'png', 'https://cdn.example/a.png': b'a' * 10, 'https://cdn.example/b.png': b'b' * 10})
+
+
+@pytest.fixture
+def cache(tmp_path, fetcher):
+    return AssetCache(tmp_path / 'cache', bundle_path=tmp_path / 'bundle', fetcher=fetcher)
+
+
+def _index(cache):
+    path = cache.path / 'index.json'
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def test_a_miss_returns_none_without_waiting_for_the_fetch(cache, fetcher, wait_until):
+    fetcher.gate.clear()
+    assert cache.get(URL) is None
+    assert cache.get(URL) is None
+    assert wait_until(lambda: fetcher.calls == [URL])
+
+    fetcher.gate.set()
+    assert wait_until(lambda: cache.get(URL) is not None)
+    assert cache.get(URL).data == b'png'
+    assert fetcher.calls == [URL]
+
+
+def test_failed_fetches_are_not_retried_on_every_render(cache, fetcher, wait_until):
+    url = 'https://cdn.example/missing.png'
+    assert cache.get(url) is None
+    assert wait_until(lambda: url in cache._failed)
+    assert cache.get(url) is None
+    time.sleep(0.05)
+    assert fetcher.calls == [url]
+
+
+def test_disk_hits_update_used_at(cache, fetcher, monkeypatch, wait_until):
+    cache.get(URL)
+    assert wait_until(lambda: cache.get(URL) is not None)
+    stored = _index(cache)[URL]['used_at']
+
+    monkeypatch.setattr('utils.assets.TOUCH_INTERVAL', 0)
+    cache.clear_memory()
+    assert cache.get(URL).data == b'png'
+    assert _index(cache)[URL]['used_at'] > stored
+
+
+def test_eviction_keeps_the_recently_used_asset(tmp_path, fetcher, monkeypatch, wait_until):
+    monkeypatch.setattr('utils.assets.TOUCH_INTERVAL', 0)
+    cache = AssetCache(tmp_path / 'cache', bundle_path=tmp_path / 'bundle', max_bytes=22, fetcher=fetcher)
+    a, b = 'https://cdn.example/a.png', 'https://cdn.example/b.png'
+    for url in (a, b):
+        cache.get(url)
+        assert wait_until(lambda: url in _index(cache))
+
+    # Reading a after b was stored makes b the least recently used
+    assert cache.get(a) is not None
+    cache.get(URL)
+    assert wait_until(lambda: URL in _index(cache))
+    assert set(_index(cache)) == {a, URL}
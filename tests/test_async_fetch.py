@@ -0,0 +1,155 @@
+import functools
+import json
+import sys
+
+import aiohttp
+import pytest
+
+from tests.fakes import FakeSocrata, synthetic_markets, synthetic_rows
+from utils import async_fetch
+from utils.async_fetch import AsyncReportFetcher, JSONArrayStream, fetch_markets
+from utils.ingest import REPORT_DATE, publish
+from utils.partitions import load_partitioned
+from utils.positions import POSITION_FIELDS
+from utils.snapshot import _stem, snapshot_dir
+
+ITEMS = [
+    {'name': 'Brent "crude"', 'note': 'a, b] [c', 'path': 'C:\\\\data\\\\'},
+    {'name': 'Caf\u00e9 \u2615 \U0001f680', 'escaped': '\\u00e9 \\" \\\\'},
+    12345,
+    -0.5,
+    True,
+    None,
+    [1, [2, 3], {'k': ']'}],
+    'tail'
+]
+BODY = json.dumps(ITEMS, ensure_ascii=False).encode()
+
+
+def decode(chunks):
+    stream = JSONArrayStream()
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return items, stream.done
+
+
+@pytest.mark.parametrize('split', range(1, len(BODY)))
+def test_any_chunk_boundary_decodes_the_same(split):
+    items, done = decode([BODY[:split], BODY[split:]])
+    assert items == json.loads(BODY)
+    assert done
+
+
+def test_byte_at_a_time_decodes_escapes_and_multibyte_text():
+    items, done = decode([BODY[i:i + 1] for i in range(len(BODY))])
+    assert items == json.loads(BODY)
+    assert done
+
+
+def test_a_truncated_body_is_not_done():
+    items, done = decode([BODY[:len(BODY) // 2]])
+    assert not done
+    assert items == json.loads(BODY)[:len(items)]
+
+
+def test_a_body_that_is_not_an_array_is_rejected():
+    with pytest.raises(ValueError):
+        JSONArrayStream().feed(b'{"error": "bad query"}')
+
+
+@pytest.fixture
+def markets():
+    return synthetic_markets(12)
+
+
+@pytest.fixture
+def rows():
+    return synthetic_rows(12, weeks=4)
+
+
+def _own(rows, market):
+    return sorted(
+        (r for r in rows if r['market_and_exchange_names'] == market['market_and_exchange_names']),
+        key=lambda r: r[REPORT_DATE]
+    )
+
+
+def _latest_two(rows, market):
+    own = _own(rows, market)
+    return own[-1], own[-2]
+
+
+def _store_first_weeks(markets, rows):
+    """Set each market's stored reports to the first two published weeks"""
+    for market in markets:
+        reports = [{k: v for k, v in r.items() if k != 'market_and_exchange_names'} for r in _own(rows, market)[:2]]
+        market['previous_report'], market['latest_report'] = reports
+    return markets
+
+
+def record_dates(records):
+    return [r['latest_report'][REPORT_DATE] for r in records]
+
+
+def test_fetch_gets_every_markets_latest_two_reports(markets, rows):
+    with FakeSocrata(rows) as fake:
+        records = fetch_markets(markets, base_url=fake.url, concurrency=3)
+        requests = fake.requests
+
+    assert requests == len(markets)
+    for market, record in zip(markets, records):
+        latest, previous = _latest_two(rows, market)
+        assert record['latest_report']['comm_positions_long_all'] == latest['comm_positions_long_all']
+        assert record['previous_report'][REPORT_DATE] == previous[REPORT_DATE]
+    # The caller's records are left as they were
+    assert markets == synthetic_markets(12)
+
+
+def test_a_truncated_page_is_retried(markets, rows):
+    with FakeSocrata(rows, truncate_first=2) as fake:
+        records = fetch_markets(markets[:1], base_url=fake.url, backoff=0)
+        requests = fake.requests
+
+    assert requests == 3
+    assert record_dates(records) == [_latest_two(rows, markets[0])[0][REPORT_DATE]]
+
+
+def test_a_truncated_page_fails_once_retries_run_out(markets, rows):
+    with FakeSocrata(rows, truncate_first=10) as fake:
+        with pytest.raises(aiohttp.ClientPayloadError):
+            fetch_markets(markets[:1], base_url=fake.url, retries=1, backoff=0)
+
+
+def test_rows_missing_a_position_are_skipped(markets, rows):
+    markets = _store_first_weeks(markets[:1], rows)
+    latest, previous = _latest_two(rows, markets[0])
+    del latest[POSITION_FIELDS[-1]]
+    with FakeSocrata(rows) as fake:
+        records = fetch_markets(markets, base_url=fake.url)
+
+    assert record_dates(records) == [previous[REPORT_DATE]]
+
+
+def test_main_updates_partitions_and_snapshots(tmp_path, monkeypatch, rows):
+    markets = _store_first_weeks(synthetic_markets(3), rows)
+    data_path = tmp_path / 'markets.json'
+    data_path.write_text(json.dumps(markets))
+    partition_dir = tmp_path / 'partitions'
+    partition_dir.mkdir()
+    (partition_dir / 'manifest.json').write_text(json.dumps({'version': 'none', 'partitions': {}, 'markets': []}))
+    monkeypatch.setattr(async_fetch, 'partition_dir_in_use', lambda: partition_dir)
+    snapshots = tmp_path / 'snapshots'
+    monkeypatch.setattr(async_fetch, 'publish', functools.partial(publish, snapshot_dir=snapshots))
+
+    with FakeSocrata(rows) as fake:
+        monkeypatch.setattr(sys, 'argv', ['async_fetch', '--base-url', fake.url, '--data', str(data_path),
+                                          '--no-history', '--no-prices'])
+        async_fetch.main()
+
+    newest = max(r[REPORT_DATE] for r in rows)
+    catalog = load_partitioned(partition_dir)
+    assert catalog.get('Synthetic 00001')['latest_report'][REPORT_DATE] == newest
+    assert all(m['latest_report'][REPORT_DATE] == newest for m in json.loads(data_path.read_text()))
+    for dataset in [catalog.partition(name) for name in catalog.partitions] + [catalog.combined()]:
+        assert (snapshot_dir(dataset, snapshots) / f'{_stem(dataset.version)}.json').exists()
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+import utils.backtest
+from utils.backtest import (RELEASE_LAG_DAYS, STATS, build_panel, cot_index_signals, flow_reversal_signals,
+                            param_grid, rolling_index, run_grid, simulate, threshold_signals)
+from utils.history import HistoryStore
+from utils.positions import POSITION_FIELDS, TRADERS
+
+
+class DayPrices:
+    """Price store whose price on each day is that day's number, for checking which day was read"""
+
+    def __init__(self):
+        self.requested = []
+
+    def asof(self, key, dates):
+        self.requested.append(np.asarray(dates))
+        return np.asarray(dates, dtype='datetime64[D]').astype(np.float64)
+
+
+def _market(latest, previous):
+    def report(day):
+        return dict({f: '100' for f in POSITION_FIELDS}, report_date_as_yyyy_mm_dd=f'{day}T00:00:00.000')
+
+    return {
+        'display_name': 'Bitcoin',
+        'exchange': 'binance',
+        'instrument_name': 'BTCUSDT',
+        'latest_report': report(latest),
+        'previous_report': report(previous)
+    }
+
+
+@pytest.mark.parametrize('lag', [RELEASE_LAG_DAYS, 0, 4])
+def test_prices_are_taken_at_publication(tmp_path, lag):
+    prices = DayPrices()
+    panel = build_panel([_market('2024-06-11', '2024-06-04')], HistoryStore(tmp_path), prices, release_lag=lag)
+
+    dates = np.array(['2024-06-04', '2024-06-11'], dtype='datetime64[D]')
+    published = dates + lag
+    assert np.array_equal(panel.dates, dates)
+    assert np.array_equal(panel.published, published)
+    assert np.array_equal(prices.requested[0], published)
+    assert panel.prices[0].tolist() == published.astype(np.float64).tolist()
+
+
+def test_a_position_earns_only_the_move_after_its_report():
+    returns = np.array([[np.nan, 0.10, -0.05, 0.02]])
+    positions = np.array([[1.0, 1.0, 0.0, 0.0]])
+
+    pnl, _, held = simulate(positions, returns, fee=0.0)
+
+    # The position taken on report 0 is first held over the week to report 1
+    assert held.tolist() == [[0.0, 1.0, 1.0, 0.0]]
+    assert pnl.tolist() == [[0.0, 0.10, -0.05, 0.0]]
+
+
+def _net(**series):
+    """Return (1 market, weeks, traders) net positions with the given classes' series, zero elsewhere"""
+    weeks = len(next(iter(series.values())))
+    net = np.zeros((1, weeks, len(TRADERS)))
+    for trader, values in series.items():
+        net[0, :, TRADERS.index(trader.replace('_', '-'))] = values
+    return net
+
+
+def test_param_grid_is_the_cartesian_product():
+    grid = param_grid(window=[13, 26], band=[10, 20])
+    assert grid['window'].tolist() == [13, 13, 26, 26]
+    assert grid['band'].tolist() == [10, 20, 10, 20]
+
+
+def test_threshold_follows_the_positioning_spread():
+    # Non-commercial minus commercial net, as a percent of open interest: 10, -10, 1, undefined
+    columns = {
+        'net': _net(Commercial=[0, 10, 0, 5], Non_Commercial=[10, 0, 1, 5]),
+        'open_interest': np.array([[100.0, 100.0, 100.0, 0.0]])
+    }
+    positions = threshold_signals(columns, param_grid(threshold=[0, 5]))
+    assert positions.tolist() == [[[1, -1, 1, 0]], [[1, -1, 0, 0]]]
+
+
+def test_rolling_index_ignores_missing_weeks():
+    assert np.allclose(rolling_index(np.array([0.0, 10, 5, 20]), 2), [np.nan, 100, 0, 100], equal_nan=True)
+    assert np.allclose(rolling_index(np.array([0.0, np.nan, 10]), 3), [np.nan, np.nan, 100], equal_nan=True)
+
+
+def test_cot_index_trades_the_commercial_extremes():
+    # Commercial index: 2 weeks gives -, 100, 0, 100; 4 weeks gives -, 100, 50, 100
+    columns = {'net': _net(Commercial=[0, 10, 5, 20])}
+    positions = cot_index_signals(columns, param_grid(window=[2, 4], band=[10]))
+    assert positions.tolist() == [[[0, 1, -1, 1]], [[0, 1, 0, 1]]]
+
+
+def test_flow_reversal_holds_each_new_direction():
+    # Weekly changes 10, 10, -5, -10, 20: the trend turns down in week 3 and up in week 5
+    columns = {'net': _net(Non_Commercial=[0, 10, 20, 15, 5, 25])}
+    positions = flow_reversal_signals(columns, param_grid(lookback=[1, 3, 5]))
+    assert positions.tolist() == [
+        [[0, 0, 0, -1, -1, 1]],
+        [[0, 0, 0, -1, -1, 1]],
+        # Five prior weeks sum to +5 by week 5, so its rise is no reversal
+        [[0, 0, 0, 0, 0, 0]]
+    ]
+
+
+@pytest.fixture
+def always_long():
+    """One market whose spread is +10% every week, priced +10%, -5%, +2%"""
+    return {
+        'net': _net(Non_Commercial=[10, 10, 10, 10]),
+        'open_interest': np.full((1, 4), 100.0),
+        'returns': np.array([[np.nan, 0.10, -0.05, 0.02]])
+    }
+
+
+def test_run_grid_stats(always_long):
+    results = run_grid(always_long, 'threshold', param_grid(threshold=[0, 20]), fee=0.01)
+
+    assert set(results) == set(STATS)
+    # Entered once at the first publication, held over every priced week
+    long, flat = 0, 1
+    assert results['total_return'][long, 0] == pytest.approx((1 + 0.10 - 0.01) * 0.95 * 1.02 - 1)
+    assert results['trades'][long, 0] == 1
+    assert results['exposure'][long, 0] == 1
+    assert results['hit_rate'][long, 0] == pytest.approx(2 / 3)
+    assert results['max_drawdown'][long, 0] == pytest.approx(-0.05)
+    assert results['total_return'][flat, 0] == 0
+    assert results['trades'][flat, 0] == 0
+    assert np.isnan(results['sharpe'][flat, 0])
+
+
+def test_run_grid_blocks_match_one_pass(always_long, monkeypatch):
+    grid = param_grid(threshold=[0, 5, 10, 20, 30])
+    whole = run_grid(always_long, 'threshold', grid, curves=True)
+
+    # One parameter set per block
+    monkeypatch.setattr(utils.backtest, 'BLOCK_CELLS', 1)
+    checks = []
+    blocked = run_grid(always_long, 'threshold', grid, curves=True, check=lambda: checks.append(1))
+
+    assert len(checks) == 5
+    assert blocked['equity'].shape == (5, 1, 4)
+    for name in whole:
+        assert np.array_equal(whole[name], blocked[name], equal_nan=True)
+
+
+def test_run_grid_with_an_empty_grid(always_long):
+    results = run_grid(always_long, 'threshold', param_grid(threshold=[]))
+    assert all(results[name].shape == (0, 1) for name in STATS)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from tests.fakes import synthetic_rows
+from utils.cot_index import CotIndexEngine, cot_index_for
+from utils.history import HistoryStore
+
+WINDOW = 8
+
+
+def _history_rows(rows):
+    return [(r['market_and_exchange_names'], r) for r in rows]
+
+
+def _assert_matches_fresh(engine, history):
+    fresh = CotIndexEngine(WINDOW).seed(history)
+    assert set(engine.windows) == set(fresh.windows)
+    for market in fresh.windows:
+        assert engine.last_date[market] == fresh.last_date[market]
+        for trader, stats in fresh.stats(market).items():
+            for name, value in stats.items():
+                assert engine.stats(market)[trader][name] == pytest.approx(value, nan_ok=True)
+
+
+@pytest.fixture
+def weeks():
+    rows = synthetic_rows(4, weeks=20)
+    dates = sorted({r['report_date_as_yyyy_mm_dd'] for r in rows})
+    return [[r for r in rows if r['report_date_as_yyyy_mm_dd'] == d] for d in dates]
+
+
+def test_new_reports_are_applied_to_the_existing_engine(tmp_path, weeks):
+    history = HistoryStore(tmp_path)
+    history.append(_history_rows([r for week in weeks[:-1] for r in week]))
+    engine = cot_index_for(history, WINDOW)
+    counts = {m: w[0].count for m, w in engine.windows.items()}
+
+    history.append(_history_rows(weeks[-1]))
+    assert cot_index_for(history, WINDOW) is engine
+    # One push per market, no replay
+    assert {m: w[0].count for m, w in engine.windows.items()} == {m: c + 1 for m, c in counts.items()}
+    _assert_matches_fresh(engine, history)
+
+
+def test_revised_reports_rebuild_only_that_market(tmp_path, weeks):
+    history = HistoryStore(tmp_path)
+    history.append(_history_rows([r for week in weeks for r in week]))
+    engine = cot_index_for(history, WINDOW)
+
+    revised = dict(weeks[-1][0], comm_positions_long_all='1')
+    history.append(_history_rows([revised]))
+    assert cot_index_for(history, WINDOW) is engine
+    _assert_matches_fresh(engine, history)
+
+
+def test_a_new_window_starts_a_new_engine(tmp_path, weeks):
+    history = HistoryStore(tmp_path)
+    history.append(_history_rows([r for week in weeks for r in week]))
+    engine = cot_index_for(history, WINDOW)
+    other = cot_index_for(history, WINDOW * 2)
+
+    assert other is not engine
+    assert other.window == WINDOW * 2
+    assert np.isfinite(other.stats(next(iter(other.windows)))['Commercial']['zscore'])
@@ -0,0 +1,27 @@
+import json
+
+from tests.fakes import synthetic_markets
+from utils import tracing
+from utils.dataset import load_dataset
+
+
+def stage_counts():
+    return {row['stage']: row['count'] for row in tracing.REGISTRY.stats()}
+
+
+def test_load_span_covers_parsing(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, 'ENABLED', True)
+    tracing.REGISTRY.reset()
+    path = tmp_path / 'markets.json'
+    path.write_text(json.dumps(synthetic_markets(3)))
+
+    dataset = load_dataset(path)
+    assert len(dataset.markets) == 3
+    assert stage_counts() == {'dataset.load': 1, 'dataset.parse': 1}
+    rows = {row['stage']: row for row in tracing.REGISTRY.stats()}
+    assert rows['dataset.load']['max_ms'] >= rows['dataset.parse']['max_ms']
+
+    # A cached dataset is neither read nor parsed again
+    assert load_dataset(path) is dataset
+    assert stage_counts() == {'dataset.load': 1, 'dataset.parse': 1}
+    tracing.REGISTRY.reset()
@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from utils.executor import CANCEL_SLOTS, KEEP_PUBLISHED, TASKS, AnalyticsExecutor, Cancelled, attach, screener_orders
+
+
+@pytest.fixture
+def executor():
+    executor = AnalyticsExecutor(max_workers=1, min_rows=0)
+    yield executor
+    executor.shutdown()
+
+
+def screener_columns(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'net': rng.integers(-1000, 1000, size=(rows, 4)),
+        'net_change': rng.integers(-100, 100, size=(rows, 4)),
+        'dominant_share': rng.random(rows)
+    }
+
+
+def test_published_columns_are_mapped_not_copied(executor):
+    columns = screener_columns()
+    shared = executor.publish('v1', columns)
+    assert executor.publish('v1', {}) is shared
+
+    mapped = attach(shared.specs)
+    assert all(np.array_equal(mapped[name], columns[name]) for name in columns)
+    shared.arrays['net'][0, 0] = 12345
+    assert mapped['net'][0, 0] == 12345
+
+
+def test_worker_reads_the_shared_columns(executor):
+    columns = screener_columns()
+    executor.publish('v1', columns)
+
+    orders = executor.run('screener_orders', 'v1')
+
+    expected = screener_orders(columns, lambda: None)
+    assert orders.keys() == expected.keys()
+    assert all(np.array_equal(orders[key], expected[key]) for key in expected)
+    assert not executor._jobs
+
+
+def test_small_inputs_run_on_the_calling_thread():
+    executor = AnalyticsExecutor(max_workers=1, min_rows=1000)
+    try:
+        executor.publish('v1', screener_columns(10))
+        executor.run('screener_orders', 'v1', rows=10)
+        assert executor._pool is None
+    finally:
+        executor.shutdown()
+
+
+def test_old_column_sets_are_unlinked(executor):
+    first = executor.publish('v0', screener_columns(10))
+    names = [spec[0] for spec in first.specs.values()]
+    for i in range(1, KEEP_PUBLISHED + 1):
+        executor.publish(f'v{i}', screener_columns(10))
+
+    assert 'v0' not in executor._published
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+@pytest.fixture
+def waiting(executor, monkeypatch):
+    """Run jobs on threads with a task that spins on check() until released"""
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    def wait_for_cancel(columns, check):
+        started.release()
+        while not release.is_set():
+            check()
+            time.sleep(0.005)
+        return 'finished'
+
+    monkeypatch.setitem(TASKS, 'wait', wait_for_cancel)
+    executor._pool = ThreadPoolExecutor(1)
+    executor.publish('v1', {'x': np.zeros(1)})
+    yield started
+    release.set()
+
+
+def test_cancel_drops_pending_and_stops_running_jobs(executor, waiting, wait_until):
+    running = executor.submit('wait', 'v1', owner='a')
+    assert waiting.acquire(timeout=5)
+    pending = executor.submit('wait', 'v1', owner='a')
+    other = executor.submit('wait', 'v1', owner='b')
+
+    assert executor.cancel('a') == 2
+    assert pending.cancelled()
+    with pytest.raises(Cancelled):
+        running.result(timeout=5)
+
+    # The other session's job runs and is not affected
+    assert waiting.acquire(timeout=5)
+    assert not other.done()
+    executor.cancel('b')
+    with pytest.raises(Cancelled):
+        other.result(timeout=5)
+
+    # Every slot is back, cleared, and no job is tracked
+    assert wait_until(lambda: len(executor._free_slots) == CANCEL_SLOTS)
+    assert not executor._board.arrays['cancel'].any()
+    assert not executor._jobs
+
+
+def test_interrupted_run_cancels_its_job(executor, waiting, wait_until):
+    with pytest.raises(TimeoutError):
+        executor.run('wait', 'v1', owner='a', timeout=0.05)
+    assert wait_until(lambda: not executor._jobs)
+    assert len(executor._free_slots) == CANCEL_SLOTS
+
+
+def test_jobs_finishing_after_shutdown_are_ignored(executor):
+    executor.publish('v1', screener_columns(10))
+    executor.shutdown()
+
+    future = Future()
+    future.slot = 0
+    future.owner = 'a'
+    executor._jobs['a'].add(future)
+    future.set_result(None)
+    executor._release(future)
+    executor.cancel_job(future)
+
+    assert not executor._jobs
+    assert not executor._published
@@ -0,0 +1,138 @@
+import csv
+import io
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from tests.fakes import synthetic_markets
+from utils.dataset import Dataset
+from utils.export import (EXPORT_COLUMNS, derive_block, export_blocks, export_bytes, iter_csv, parquet_schema,
+                          write_export)
+from utils.history import HistoryStore
+from utils.positions import OPEN_INTEREST, POSITION_FIELDS, TRADERS
+from utils.records import build_records
+
+DATES = ['2024-06-04', '2024-06-11', '2024-06-18', '2024-06-25', '2024-07-02']
+
+
+def report(date, week):
+    """Longs 10/20/30 and shorts 30/20/10 plus the week number, open interest 100 plus it"""
+    values = [10 + week, 20 + week, 30 + week, 30 + week, 20 + week, 10 + week]
+    rep = {f: str(v) for f, v in zip(POSITION_FIELDS, values)}
+    rep[OPEN_INTEREST] = str(100 + week)
+    rep['report_date_as_yyyy_mm_dd'] = f'{date}T00:00:00.000'
+    return rep
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = HistoryStore(tmp_path / 'history')
+    store.append([('Bitcoin', report(date, week)) for week, date in enumerate(DATES)])
+    return store
+
+
+@pytest.fixture
+def catalog():
+    markets, positions, present = build_records(synthetic_markets(2))
+    return Dataset(markets, 'v1', positions, present)
+
+
+def _concat(blocks):
+    blocks = list(blocks)
+    return {col: np.concatenate([b[col] for b in blocks]) for col in EXPORT_COLUMNS}, len(blocks)
+
+
+def test_derive_block_changes_and_views():
+    dates = np.array(['2024-06-04', '2024-06-11'], dtype='datetime64[D]')
+    # Longs, shorts, open interest; the second report lacks open interest
+    values = np.array([[10, 20, 30, 30, 20, 10, 100], [15, 20, 25, 30, 25, 10, 0]])
+
+    block = derive_block('Bitcoin', dates, values)
+    k = len(TRADERS)
+    assert block['trader'].tolist() == TRADERS * 2
+    assert block['report_date'].tolist() == [dates[0]] * k + [dates[1]] * k
+    assert block['net'].tolist() == [-20, 0, 20, -15, -5, 15]
+    # No previous report for the first row
+    assert block['net_change'].tolist() == [0, 0, 0, 5, -5, -5]
+    assert block['open_interest'].tolist() == [100] * k + [60] * k
+    assert block['open_interest_reported'].tolist() == [True] * k + [False] * k
+    assert block['net_pct_oi'][:k].tolist() == [-20.0, 0.0, 20.0]
+    assert block['long_short_ratio'][:k].tolist() == [1 / 3, 1.0, 3.0]
+    assert block['dominant_class'].tolist() == ['Commercial'] * 2 * k
+    assert block['dominant_net'].tolist() == [-20] * k + [-15] * k
+
+    continued = derive_block('Bitcoin', dates[1:], values[1:], previous=values[0])
+    assert continued['net_change'].tolist() == [5, -5, -5]
+
+
+def test_every_market_of_the_catalog_and_history(catalog, history):
+    data, _ = _concat(export_blocks(catalog=catalog, history=history))
+
+    # Catalog markets first, from their two reports, then history-only markets
+    names, counts = np.unique(data['market'], return_counts=True)
+    assert dict(zip(names, counts)) == {'Synthetic 00000': 6, 'Synthetic 00001': 6, 'Bitcoin': 15}
+    assert data['market'][-1] == 'Bitcoin'
+    bitcoin = data['market'] == 'Bitcoin'
+    assert np.unique(data['report_date'][bitcoin]).astype(str).tolist() == DATES
+
+
+def test_date_range_keeps_changes_from_the_report_before(history):
+    data, _ = _concat(export_blocks(['Bitcoin'], start='2024-06-11', end='2024-06-25', history=history))
+
+    assert np.unique(data['report_date']).astype(str).tolist() == DATES[1:4]
+    # Each week adds one to every long and short, so net is unchanged but
+    # longs grow by one, including against the report before the range
+    assert data['long_change'].tolist() == [1] * 9
+    assert data['net_change'].tolist() == [0] * 9
+
+
+@pytest.mark.parametrize('block_rows', [1, 2, 3, 100])
+def test_blocks_split_without_changing_rows(catalog, history, block_rows):
+    whole, _ = _concat(export_blocks(catalog=catalog, history=history))
+    split, blocks = _concat(export_blocks(catalog=catalog, history=history, block_rows=block_rows))
+
+    assert blocks == -(-9 // block_rows)
+    for col in EXPORT_COLUMNS:
+        assert np.array_equal(whole[col], split[col], equal_nan=whole[col].dtype.kind == 'f')
+
+
+def test_bad_dates_are_a_value_error(history):
+    with pytest.raises(ValueError):
+        next(export_blocks(['Bitcoin'], start='not-a-date', history=history))
+
+
+def test_csv_rounds_and_leaves_nan_empty():
+    dates = np.array(['2024-06-04'], dtype='datetime64[D]')
+    # No shorts at all, so the ratio is undefined
+    block = derive_block('Bitcoin', dates, np.array([[1, 1, 1, 0, 0, 0, 3]]))
+
+    rows = list(csv.reader(io.StringIO(''.join(iter_csv([block])))))
+    assert rows[0] == EXPORT_COLUMNS
+    assert len(rows) == 1 + len(TRADERS)
+    first = dict(zip(EXPORT_COLUMNS, rows[1]))
+    assert first['report_date'] == '2024-06-04'
+    assert first['long_short_ratio'] == ''
+    assert first['long_pct_oi'] == str(round(100 / 3, 6))
+
+
+def test_parquet_has_one_row_group_per_block(catalog, history, tmp_path):
+    path = tmp_path / 'export.parquet'
+    rows = write_export(path, 'parquet', catalog=catalog, history=history, block_rows=3)
+
+    parquet = pq.ParquetFile(path)
+    assert rows == parquet.metadata.num_rows == 27
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.schema_arrow.equals(parquet_schema())
+    table = parquet.read()
+    assert table.column('market').to_pylist()[-1] == 'Bitcoin'
+
+
+def test_csv_bytes_match_the_streamed_rows(catalog, history):
+    body = export_bytes('csv', markets=['Synthetic 00001', 'Bitcoin'], catalog=catalog, history=history)
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert len(rows) == 1 + 6 + 15
+    assert {row[0] for row in rows[1:]} == {'Synthetic 00001', 'Bitcoin'}
+
+    with pytest.raises(ValueError, match='Unknown export format'):
+        export_bytes('xlsx', catalog=catalog)
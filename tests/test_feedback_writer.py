@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from tests.fakes import FakeFirestore
+from utils.feedback_writer import FeedbackWriter
+
+
+@pytest.fixture
+def firestore():
+    client = FakeFirestore()
+    client.batch_sizes = []
+    write = client._write
+
+    def recording_write(writes):
+        write(writes)
+        client.batch_sizes.append(len(writes))
+
+    client._write = recording_write
+    return client
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return tmp_path / 'spool.jsonl'
+
+
+def test_documents_are_committed_in_batches(firestore, spool_path):
+    # Hold the first commit until every document is queued
+    ready = threading.Event()
+
+    def client_factory():
+        ready.wait(5)
+        return firestore
+
+    writer = FeedbackWriter(client_factory, spool_path=spool_path, batch_size=50, flush_interval=2.0)
+    ids = [writer.submit({'feature_request': f'idea {i}'}) for i in range(120)]
+    ready.set()
+    writer.stop()
+
+    assert firestore.batch_sizes == [50, 50, 20]
+    assert writer.committed == 120
+    assert sorted(firestore.documents) == sorted(f'feedback/{i}' for i in ids)
+    assert writer.pending() == []
+
+
+def test_documents_stay_spooled_while_the_backend_is_down(firestore, spool_path, wait_until):
+    firestore.available = False
+    writer = FeedbackWriter(lambda: firestore, spool_path=spool_path, flush_interval=0.05, retry_delay=60)
+    ids = [writer.submit({'feature_request': f'idea {i}'}) for i in range(3)]
+    time.sleep(0.2)
+    writer.stop(timeout=1)
+
+    assert firestore.documents == {}
+    assert [entry['id'] for entry in writer.pending()] == ids
+
+    # A new writer, e.g. after a restart, replays the spool under the same ids
+    firestore.available = True
+    replay = FeedbackWriter(lambda: firestore, spool_path=spool_path, flush_interval=0.05).start()
+    assert wait_until(lambda: len(firestore.documents) == 3)
+    replay.stop()
+
+    assert sorted(firestore.documents) == sorted(f'feedback/{i}' for i in ids)
+    assert replay.pending() == []
+    assert spool_path.read_text() == ''
+
+
+def test_failed_commit_is_retried_without_duplicates(firestore, spool_path, wait_until):
+    firestore.available = False
+    attempts = []
+    write = firestore._write
+
+    def failing_write(writes):
+        attempts.append(len(writes))
+        write(writes)
+
+    firestore._write = failing_write
+    writer = FeedbackWriter(lambda: firestore, spool_path=spool_path, flush_interval=0.05, retry_delay=0.05)
+    doc_id = writer.submit({'feature_request': 'dark mode', 'contact_email': ''})
+    assert wait_until(lambda: len(attempts) >= 2)
+
+    firestore.available = True
+    assert wait_until(lambda: writer.committed == 1)
+    writer.stop()
+
+    assert firestore.documents == {f'feedback/{doc_id}': {'feature_request': 'dark mode', 'contact_email': ''}}
+    assert writer.pending() == []
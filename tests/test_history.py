@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pytest
+
+from utils.history import DATE_COLUMN, OPEN_INTEREST_COLUMN, HistoryStore
+from utils.positions import POSITION_FIELDS
+from utils.records import SchemaError
+
+
+def report(date, value=100, **fields):
+    rep = {f: str(value) for f in POSITION_FIELDS}
+    rep[OPEN_INTEREST_COLUMN] = str(value * 10)
+    rep['report_date_as_yyyy_mm_dd'] = f'{date}T00:00:00.000'
+    rep.update(fields)
+    return rep
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(tmp_path)
+
+
+def test_append_merges_rows_by_market_and_date(store):
+    store.append([('Bitcoin', report('2024-06-04', 1)), ('Ether', report('2024-06-04', 2))])
+    store.append([('Bitcoin', report('2024-06-11', 3)), ('Bitcoin', report('2024-06-04', 4))])
+
+    bitcoin = store.query('Bitcoin')
+    assert bitcoin[DATE_COLUMN].tolist() == [np.datetime64('2024-06-04'), np.datetime64('2024-06-11')]
+    assert bitcoin[POSITION_FIELDS[0]].tolist() == [4, 3]
+    assert store.query('Ether')[POSITION_FIELDS[0]].tolist() == [2]
+    assert len(store) == 3
+
+
+def test_a_missing_position_is_rejected(store):
+    store.append([('Bitcoin', report('2024-06-04'))])
+    version = store.version
+    broken = report('2024-06-11')
+    del broken[POSITION_FIELDS[2]]
+
+    with pytest.raises(SchemaError, match=POSITION_FIELDS[2]):
+        store.append([('Bitcoin', broken)])
+    assert store.version == version
+
+
+def test_a_missing_open_interest_is_stored_as_not_reported(store):
+    rep = report('2024-06-04')
+    del rep[OPEN_INTEREST_COLUMN]
+    store.append([('Bitcoin', rep)])
+
+    assert store.query('Bitcoin')[OPEN_INTEREST_COLUMN].tolist() == [0]
+
+
+def test_a_pinned_version_is_unaffected_by_later_appends(store):
+    store.append([('Bitcoin', report('2024-06-04'))])
+    pinned = store.pin()
+
+    store.append([('Bitcoin', report('2024-06-11')), ('Ether', report('2024-06-11'))])
+
+    assert pinned.markets == ['Bitcoin']
+    assert len(pinned.query('Bitcoin')[DATE_COLUMN]) == 1
+    assert store.pin().version != pinned.version
+    assert len(store.query('Bitcoin')[DATE_COLUMN]) == 2
+
+
+def test_first_dates_cover_every_market(store):
+    store.append([('Bitcoin', report('2024-06-11')), ('Bitcoin', report('2024-05-28')), ('Ether', report('2024-06-04'))])
+
+    assert store.first_dates() == {'Bitcoin': np.datetime64('2024-05-28'), 'Ether': np.datetime64('2024-06-04')}
+
+
+def test_concurrent_readers_see_whole_versions(store):
+    # Each version holds one more market, every one with the same row count
+    store.append([('M00', report('2024-06-04'))])
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                version = store.pin()
+                for market in version.markets:
+                    assert len(version.query(market)[DATE_COLUMN]) == 1
+                assert len(version) == len(version.markets)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(1, 20):
+        store.append([(f'M{i:02d}', report('2024-06-04'))])
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from tests.fakes import FakeSocrata, synthetic_rows
+from utils.dataset import load_dataset
+from utils.history import HistoryStore
+from utils.ingest import REPORT_DATE, REPORT_FIELDS, fetch_reports, refresh
+from utils.positions import OPEN_INTEREST
+
+MARKETS = 3
+WEEKS = 4
+
+
+def _market(i, rows):
+    """Build a dataset record from a market's rows, oldest first"""
+    reports = [{f: r[f] for f in REPORT_FIELDS} for r in rows]
+    return {
+        'display_name': f'Synthetic {i:05d}',
+        'market_and_exchange_names': rows[0]['market_and_exchange_names'],
+        'latest_report': reports[-1],
+        'previous_report': reports[-2] if len(reports) > 1 else None
+    }
+
+
+@pytest.fixture
+def rows():
+    return synthetic_rows(MARKETS, weeks=WEEKS)
+
+
+@pytest.fixture
+def dataset(tmp_path, rows):
+    """A dataset file holding only the first two weeks of every market"""
+    dates = sorted({r[REPORT_DATE] for r in rows})
+    markets = []
+    for i in range(MARKETS):
+        name = f'SYNTHETIC {i:05d} - TEST EXCHANGE'
+        own = [r for r in rows if r['market_and_exchange_names'] == name and r[REPORT_DATE] <= dates[1]]
+        markets.append(_market(i, own))
+    path = tmp_path / 'markets.json'
+    path.write_text(json.dumps(markets))
+    return path
+
+
+def test_refresh_applies_reports_newer_than_the_stored_ones(tmp_path, rows, dataset, session):
+    history = HistoryStore(tmp_path / 'history')
+    with FakeSocrata(rows) as fake:
+        applied = refresh(dataset, fake.url, history=history, session=session, snapshot_dir=None)
+
+    assert applied == MARKETS * (WEEKS - 2)
+    dates = sorted({r[REPORT_DATE] for r in rows})
+    for market in json.loads(dataset.read_text()):
+        assert market['latest_report'][REPORT_DATE] == dates[-1]
+        assert market['previous_report'][REPORT_DATE] == dates[-2]
+        expected = next(
+            r for r in rows
+            if r['market_and_exchange_names'] == market['market_and_exchange_names'] and r[REPORT_DATE] == dates[-1]
+        )
+        assert market['latest_report']['comm_positions_long_all'] == expected['comm_positions_long_all']
+    assert len(history) == MARKETS * (WEEKS - 2)
+
+
+def test_refresh_without_new_reports_leaves_the_dataset_untouched(rows, dataset, session):
+    with FakeSocrata(rows) as fake:
+        refresh(dataset, fake.url, session=session, snapshot_dir=None)
+        before = dataset.stat().st_mtime_ns
+        applied = refresh(dataset, fake.url, session=session, snapshot_dir=None)
+
+    assert applied == 0
+    assert dataset.stat().st_mtime_ns == before
+
+
+def test_refresh_retries_transient_failures(rows, dataset, session):
+    with FakeSocrata(rows, fail_first=2) as fake:
+        applied = refresh(dataset, fake.url, session=session, snapshot_dir=None)
+        requests = fake.requests
+
+    assert applied == MARKETS * (WEEKS - 2)
+    assert requests == 3
+
+
+def test_fetch_reports_follows_pages(rows, session):
+    names = sorted({r['market_and_exchange_names'] for r in rows})
+    with FakeSocrata(rows) as fake:
+        fetched = list(fetch_reports(session, names, base_url=fake.url, page_size=5))
+        requests = fake.requests
+
+    assert len(fetched) == len(rows)
+    assert requests == len(rows) // 5 + 1
+    assert [r[REPORT_DATE] for r in fetched] == sorted(r[REPORT_DATE] for r in rows)
+
+
+def test_a_lagging_market_does_not_reapply_the_others(rows, dataset, session):
+    # The last market stops reporting after the stored weeks
+    dates = sorted({r[REPORT_DATE] for r in rows})
+    lagging = 'SYNTHETIC 00002 - TEST EXCHANGE'
+    served = [r for r in rows if r['market_and_exchange_names'] != lagging or r[REPORT_DATE] <= dates[1]]
+    with FakeSocrata(served) as fake:
+        assert refresh(dataset, fake.url, session=session, snapshot_dir=None) == (MARKETS - 1) * (WEEKS - 2)
+        before = dataset.stat().st_mtime_ns
+        applied = refresh(dataset, fake.url, session=session, snapshot_dir=None)
+
+    assert applied == 0
+    assert dataset.stat().st_mtime_ns == before
+
+
+def test_rows_missing_a_position_are_skipped(rows, dataset, session):
+    dates = sorted({r[REPORT_DATE] for r in rows})
+    broken = next(r for r in rows if r[REPORT_DATE] == dates[-1])
+    del broken['noncomm_positions_long_all']
+    with FakeSocrata(rows) as fake:
+        applied = refresh(dataset, fake.url, session=session, snapshot_dir=None)
+
+    assert applied == MARKETS * (WEEKS - 2) - 1
+    market = next(
+        m for m in load_dataset(dataset).markets
+        if m['market_and_exchange_names'] == broken['market_and_exchange_names']
+    )
+    assert market['latest_report'][REPORT_DATE] == dates[-2]
+
+
+def test_missing_open_interest_is_not_stored_as_zero(rows, dataset, session):
+    dates = sorted({r[REPORT_DATE] for r in rows})
+    for r in rows:
+        if r[REPORT_DATE] == dates[-1]:
+            del r[OPEN_INTEREST]
+    with FakeSocrata(rows) as fake:
+        refresh(dataset, fake.url, session=session, snapshot_dir=None)
+
+    for market in json.loads(dataset.read_text()):
+        assert OPEN_INTEREST not in market['latest_report']
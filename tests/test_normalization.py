@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from utils.history import HistoryStore
+from utils.normalization import normalize, normalized_history_for
+from utils.positions import LONG_FIELDS, SHORT_FIELDS
+from utils.records import OPEN_INTEREST
+
+
+def report(date, long, short, oi=None):
+    rep = {'report_date_as_yyyy_mm_dd': f'{date}T00:00:00.000'}
+    rep.update({f: str(v) for f, v in zip(LONG_FIELDS, long)})
+    rep.update({f: str(v) for f, v in zip(SHORT_FIELDS, short)})
+    if oi is not None:
+        rep[OPEN_INTEREST] = str(oi)
+    return rep
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append([
+        ('Bitcoin', report('2024-06-04', [10, 20, 30], [40, 30, 20], oi=200)),
+        ('Bitcoin', report('2024-06-11', [15, 20, 30], [40, 25, 20], oi=0)),
+        ('Ether', report('2024-06-04', [1, 2, 3], [3, 2, 1], oi=20))
+    ])
+    return store
+
+
+def test_views_per_report_date(store):
+    normalized = normalized_history_for(store)
+
+    dates, pct_oi = normalized.query('Bitcoin', 'pct_oi')
+    assert dates.tolist() == [np.datetime64('2024-06-04'), np.datetime64('2024-06-11')]
+    expected = normalize([[10, 20, 30], [15, 20, 30]], [[40, 30, 20], [40, 25, 20]], [200, 65])
+    np.testing.assert_allclose(pct_oi, expected['pct_oi'])
+    # The second report lacks open interest, so total longs stand in
+    lo, hi = normalized.bounds['Bitcoin']
+    assert normalized.oi_reported[lo:hi].tolist() == [True, False]
+
+    _, ratio = normalized.query('Ether', 'ratio')
+    np.testing.assert_allclose(ratio, [[1 / 3, 1.0, 3.0]])
+    assert normalized.query('Nope')[0].size == 0
+
+
+def test_rebuilt_only_for_a_new_version(store):
+    first = normalized_history_for(store)
+    assert normalized_history_for(store) is first
+
+    store.append([('Ether', report('2024-06-11', [2, 2, 3], [3, 2, 1], oi=20))])
+    second = normalized_history_for(store)
+    assert second is not first
+    assert second.version == store.pin().version
+    assert len(second.query('Ether')[0]) == 2
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from tests.fakes import FakeSocrata, synthetic_markets, synthetic_rows
+from utils.dataset import Dataset
+from utils.ingest import REPORT_DATE, refresh
+from utils.partitions import PartitionedDataset, load_catalog, partition_name, write_partitions
+from utils.snapshot import _stem, snapshot_dir
+
+EXCHANGES = ['binance', 'coinbase', 'kraken']
+
+
+@pytest.fixture
+def markets():
+    records = synthetic_markets(6)
+    for i, market in enumerate(records):
+        market['exchange'] = EXCHANGES[i % len(EXCHANGES)]
+    return records
+
+
+def _files(path):
+    return sorted(p.relative_to(path).as_posix() for p in path.glob('*/*.json'))
+
+
+def test_markets_are_split_by_asset_type_and_exchange(tmp_path, markets):
+    manifest = write_partitions(markets, tmp_path)
+
+    assert sorted(manifest['partitions']) == [f'crypto/{e}' for e in EXCHANGES]
+    assert all(p['markets'] == 2 for p in manifest['partitions'].values())
+    listed = {m['display_name']: m['partition'] for m in manifest['markets']}
+    assert listed == {m['display_name']: partition_name(m) for m in markets}
+    assert 'latest_report' not in manifest['markets'][0]
+
+
+def test_only_changed_partitions_get_a_new_file(tmp_path, markets):
+    first = write_partitions(markets, tmp_path)
+    markets[0]['latest_report'] = dict(markets[0]['latest_report'], comm_positions_long_all='1')
+    second = write_partitions(markets, tmp_path)
+
+    changed = partition_name(markets[0])
+    for name, entry in second['partitions'].items():
+        assert (entry['file'] == first['partitions'][name]['file']) == (name != changed)
+    assert second['version'] != first['version']
+
+
+def test_files_of_older_manifests_are_removed(tmp_path, markets):
+    first = write_partitions(markets, tmp_path)
+    changed = partition_name(markets[0])
+    for value in ('1', '2'):
+        markets[0]['latest_report'] = dict(markets[0]['latest_report'], comm_positions_long_all=value)
+        latest = write_partitions(markets, tmp_path)
+
+    # The previous manifest's files stay for readers still holding it
+    assert first['partitions'][changed]['file'] not in _files(tmp_path)
+    assert len([f for f in _files(tmp_path) if f.startswith(changed + '.')]) == 2
+    assert latest['partitions'][changed]['file'] in _files(tmp_path)
+
+
+def test_catalog_loads_partitions_on_demand(tmp_path, markets):
+    data_path = tmp_path / 'markets.json'
+    data_path.write_text(json.dumps(markets))
+    assert isinstance(load_catalog(tmp_path / 'partitions', data_path), Dataset)
+
+    write_partitions(markets, tmp_path / 'partitions')
+    catalog = load_catalog(tmp_path / 'partitions', data_path)
+    assert isinstance(catalog, PartitionedDataset)
+    assert sorted(catalog.options) == [m['display_name'] for m in markets]
+
+    market = catalog.get('Synthetic 00004')
+    assert market['exchange'] == 'coinbase'
+    assert catalog.dataset_for('Synthetic 00004').partition == 'crypto/coinbase'
+    assert catalog.combined().options == catalog.options
+
+
+def test_refresh_prebuilds_partition_and_combined_snapshots(tmp_path, markets, session):
+    # Markets hold the first two of three published weeks
+    rows = synthetic_rows(len(markets), weeks=3)
+    for market in markets:
+        own = [r for r in rows if r['market_and_exchange_names'] == market['market_and_exchange_names']]
+        reports = [{k: v for k, v in r.items() if k != 'market_and_exchange_names'} for r in own]
+        market['previous_report'], market['latest_report'] = reports[:2]
+    data_path = tmp_path / 'markets.json'
+    data_path.write_text(json.dumps(markets))
+    partition_dir = tmp_path / 'partitions'
+    snapshots = tmp_path / 'snapshots'
+    write_partitions(markets, partition_dir)
+
+    with FakeSocrata(rows) as fake:
+        assert refresh(data_path, fake.url, session=session, snapshot_dir=snapshots, partition_dir=partition_dir)
+
+    catalog = load_catalog(partition_dir, data_path)
+    assert catalog.get('Synthetic 00000')['latest_report'][REPORT_DATE] == max(r[REPORT_DATE] for r in rows)
+    datasets = [catalog.partition(name) for name in catalog.partitions] + [catalog.combined()]
+    for dataset in datasets:
+        assert (snapshot_dir(dataset, snapshots) / f'{_stem(dataset.version)}.json').exists()
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from tests.fakes import FakeBinance, daily_klines
+from utils.prices import DAY_MS, KLINES_LIMIT, MAX_STALENESS_MS, PriceStore, fetch_klines, report_prices, sync_prices
+
+KEY = ('binance', 'BTCUSDT')
+START = '2018-01-01'
+DAYS = 2500
+FIRST = int(np.datetime64(START, 'ms').astype(np.int64))
+
+
+def day(n, hours=0):
+    """Open time of the n-th day of the series, plus some hours"""
+    return FIRST + n * DAY_MS + hours * 3_600_000
+
+
+def date(n):
+    return np.datetime64(START) + n
+
+
+@pytest.fixture(scope='module')
+def klines():
+    return daily_klines(START, DAYS, seed=1)
+
+
+@pytest.fixture
+def fake(klines):
+    with FakeBinance({'BTCUSDT': klines, 'ETHUSDT': daily_klines(START, DAYS, price=10.0, seed=2)}) as server:
+        yield server
+
+
+@pytest.fixture
+def store(tmp_path, fake, session):
+    return PriceStore(tmp_path, urls={'binance': fake.url}, session=session)
+
+
+def test_fetch_klines_follows_pages(fake, session, klines):
+    candles = fetch_klines(session, fake.url, 'BTCUSDT', day(0), day(DAYS - 1))
+
+    assert fake.requests == DAYS // KLINES_LIMIT + 1
+    assert len(candles) == DAYS
+    assert (np.diff(candles['open_time']) == DAY_MS).all()
+    assert candles['close'][-1] == float(klines[-1][4])
+
+
+def test_the_candle_still_open_is_not_stored(store):
+    added = store.ensure(KEY, date(0), date(DAYS - 1), now=day(100, hours=12))
+
+    # Day 100 is still trading at noon, so day 99 is the last closed one
+    assert added == 100
+    assert store.candles(KEY)['open_time'][-1] == day(99)
+    assert store.coverage(KEY) == (day(0), day(99))
+
+
+def test_ensure_fetches_only_what_is_missing(store, fake):
+    assert store.ensure(KEY, date(50), now=day(100, hours=1)) == 50
+    requests = fake.requests
+
+    # Already covered: nothing is fetched
+    assert store.ensure(KEY, date(60), now=day(100, hours=1)) == 0
+    assert fake.requests == requests
+
+    # New closed days are appended with one request
+    assert store.ensure(KEY, date(50), now=day(150, hours=1)) == 50
+    assert fake.requests == requests + 1
+
+    # An earlier start backfills only the gap before the stored range
+    assert store.ensure(KEY, date(0), now=day(150, hours=1)) == 50
+    assert fake.requests == requests + 2
+
+    candles = store.candles(KEY)
+    assert np.array_equal(candles['open_time'], [day(n) for n in range(150)])
+    assert store.coverage(KEY) == (day(0), day(149))
+
+
+def test_asof_takes_the_last_candle_at_or_before_each_date(store, klines):
+    store.ensure(KEY, date(10), date(40), now=day(100))
+    close = {n: float(klines[n][4]) for n in range(DAYS)}
+    stale_days = MAX_STALENESS_MS // DAY_MS
+    dates = [date(9), date(10), date(25), date(40), date(40 + stale_days), date(41 + stale_days)]
+
+    prices = store.asof(KEY, dates)
+
+    assert np.isnan(prices[0])
+    assert prices[1:4].tolist() == [close[10], close[25], close[40]]
+    assert prices[4] == close[40]
+    assert np.isnan(prices[5])
+
+
+def test_asof_without_candles_is_nan(store):
+    assert np.isnan(store.asof(('binance', 'SOLUSDT'), [date(0), date(1)])).all()
+
+
+def test_markets_sharing_an_instrument_sync_once(store, fake, klines):
+    def market(name, instrument, latest, previous):
+        return {
+            'display_name': name,
+            'exchange': 'Binance',
+            'instrument_name': instrument,
+            'latest_report': {'report_date_as_yyyy_mm_dd': f'{date(latest)}T00:00:00.000'},
+            'previous_report': {'report_date_as_yyyy_mm_dd': f'{date(previous)}T00:00:00.000'}
+        }
+
+    markets = [
+        market('Bitcoin', 'btcusdt', 2400, 2393),
+        market('Micro Bitcoin', 'BTCUSDT', 2400, 2393),
+        market('Ether', 'ethusdt', 2400, 2393),
+        {'display_name': 'Unpriced', 'latest_report': None, 'previous_report': None}
+    ]
+
+    added = sync_prices(markets, store)
+    assert added == {('binance', 'BTCUSDT'): DAYS - 2393, ('binance', 'ETHUSDT'): DAYS - 2393}
+    assert fake.requests == 2
+
+    prices = report_prices(markets, store)
+    assert prices[0].tolist() == [float(klines[2400][4]), float(klines[2393][4])]
+    assert prices[1].tolist() == prices[0].tolist()
+    assert np.isnan(prices[3]).all()
@@ -0,0 +1,39 @@
+import pytest
+
+from tests.fakes import synthetic_markets
+from utils.positions import OPEN_INTEREST
+from utils.records import SchemaError, build_records
+
+
+def test_valid_markets_are_parsed():
+    markets, positions, present = build_records(synthetic_markets(3))
+    assert [m['display_name'] for m in markets] == ['Synthetic 00000', 'Synthetic 00001', 'Synthetic 00002']
+    assert present.all()
+    assert markets[0]['latest_report']['comm_positions_long_all'] == positions[0, 0, 0]
+
+
+def test_missing_position_field_is_an_error():
+    raw = synthetic_markets(2)
+    del raw[1]['previous_report']['noncomm_positions_short_all']
+
+    with pytest.raises(SchemaError) as e:
+        build_records(raw)
+    assert e.value.errors == [
+        "market 1 ('Synthetic 00001'): previous_report is missing noncomm_positions_short_all"
+    ]
+
+
+def test_missing_open_interest_is_stored_as_not_reported():
+    raw = synthetic_markets(1)
+    del raw[0]['latest_report'][OPEN_INTEREST]
+
+    markets, _, _ = build_records(raw)
+    assert markets[0]['latest_report'][OPEN_INTEREST] == 0
+
+
+def test_non_integer_position_is_an_error():
+    raw = synthetic_markets(1)
+    raw[0]['latest_report']['comm_positions_long_all'] = 'n/a'
+
+    with pytest.raises(SchemaError, match=r"latest_report.comm_positions_long_all is not an integer: 'n/a'"):
+        build_records(raw)
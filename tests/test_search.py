@@ -0,0 +1,50 @@
+import pytest
+
+from tests.fakes import synthetic_markets
+from utils.search import INDEXED_PREFIX, SearchIndex
+
+MARKETS = [
+    {'display_name': 'Bitcoin', 'instrument_name': 'BTCUSDT', 'searchable_terms': ['BTC', 'Bitcoin'],
+     'market_and_exchange_names': 'BITCOIN - CHICAGO MERCANTILE EXCHANGE'},
+    {'display_name': 'Micro Bitcoin', 'instrument_name': 'BTCUSDT', 'searchable_terms': ['MBT', 'Micro'],
+     'market_and_exchange_names': 'MICRO BITCOIN - CHICAGO MERCANTILE EXCHANGE'},
+    {'display_name': 'Ethereum', 'instrument_name': 'ETHUSDT', 'searchable_terms': ['ETH', 'Ether'],
+     'market_and_exchange_names': 'ETHER CASH SETTLED - CHICAGO MERCANTILE EXCHANGE'},
+    {'display_name': 'Micro Ethereum', 'instrument_name': 'ETHUSDT', 'searchable_terms': ['MET'],
+     'market_and_exchange_names': 'MICRO ETHER - CHICAGO MERCANTILE EXCHANGE'}
+] + synthetic_markets(200)
+
+
+@pytest.fixture(scope='module')
+def index():
+    return SearchIndex(MARKETS)
+
+
+def scanned(index, query, limit=10):
+    """Rank a one-word query by scanning the vocabulary, bypassing the prefix table"""
+    scores = index._scan_word(query)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [index.names[i] for i, _ in ranked[:limit]]
+
+
+@pytest.mark.parametrize('query', ['s', 'sy', 'syn', 'e', 'et', 'eth', 'm', 'mi', 'b', '0', '00', 'btc'])
+def test_short_prefixes_rank_as_a_scan_would(index, query):
+    assert len(query) <= INDEXED_PREFIX
+    assert index.search(query, limit=50) == scanned(index, query, limit=50)
+
+
+def test_exact_terms_rank_before_prefixes(index):
+    assert index.search('eth')[:2] == ['Ethereum', 'Micro Ethereum']
+    assert index.search('b')[:2] == ['Bitcoin', 'Micro Bitcoin']
+
+
+def test_short_words_combine_with_others(index):
+    # Every market's exchange name starts with an e as well
+    assert sorted(index.search('micro e')) == ['Micro Bitcoin', 'Micro Ethereum']
+    assert index.search('micro et') == ['Micro Ethereum']
+    assert index.search('syn 0019') == [f'Synthetic {i:05d}' for i in range(190, 200)]
+
+
+def test_longer_words_still_scan(index):
+    assert index.search('etherium')[:2] == ['Ethereum', 'Micro Ethereum']
+    assert index.search('zzz') == []
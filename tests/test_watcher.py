@@ -0,0 +1,132 @@
+import logging
+
+import pytest
+
+from utils.watcher import DatasetWatcher
+
+
+class Catalog:
+    def __init__(self, version):
+        self.version = version
+
+
+class Source:
+    """Loader whose next version is set by the test, or that fails with ``error``"""
+
+    def __init__(self, version='v1'):
+        self.version = version
+        self.error = None
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        if self.error is not None:
+            raise self.error
+        return Catalog(self.version)
+
+
+@pytest.fixture
+def source():
+    return Source()
+
+
+@pytest.fixture
+def watcher(source):
+    watcher = DatasetWatcher(loader=source, interval=60)
+    watcher.retired = []
+    watcher.on_retire(watcher.retired.append)
+    return watcher
+
+
+def test_unread_version_is_retired_on_swap(watcher, source):
+    assert not watcher.check()
+    source.version = 'v2'
+    assert watcher.check()
+    assert watcher.version == 'v2'
+    assert watcher.retired == ['v1']
+
+
+def test_version_is_retired_when_its_last_reader_releases(watcher, source):
+    first = watcher.acquire()
+    second = watcher.acquire()
+    source.version = 'v2'
+    watcher.check()
+    assert watcher.retired == []
+
+    watcher.release(first)
+    assert watcher.retired == []
+    watcher.release(second)
+    assert watcher.retired == ['v1']
+
+    # The current version is never retired by its readers
+    with watcher.reading() as catalog:
+        assert catalog.version == 'v2'
+    assert watcher.retired == ['v1']
+
+
+def test_reading_releases_when_the_run_fails(watcher, source):
+    with pytest.raises(RuntimeError):
+        with watcher.reading():
+            source.version = 'v2'
+            watcher.check()
+            raise RuntimeError("script failed")
+    assert watcher.retired == ['v1']
+
+
+def test_a_version_that_comes_back_is_not_retired(watcher, source):
+    held = watcher.acquire()
+    source.version = 'v2'
+    watcher.check()
+    source.version = 'v1'
+    watcher.check()
+    # v2 had no readers; v1 is current again, so releasing it keeps it
+    assert watcher.retired == ['v2']
+    watcher.release(held)
+    assert watcher.retired == ['v2']
+    assert watcher.version == 'v1'
+
+
+def test_failing_callback_does_not_stop_the_others(source, caplog):
+    watcher = DatasetWatcher(loader=source, interval=60)
+    retired = []
+
+    def fail(version):
+        raise OSError("gone")
+
+    watcher.on_retire(fail)
+    watcher.on_retire(retired.append)
+    source.version = 'v2'
+    with caplog.at_level(logging.ERROR, logger='utils.watcher'):
+        watcher.check()
+    assert retired == ['v1']
+    assert "Releasing dataset version v1 failed" in caplog.text
+
+
+def test_failed_load_keeps_the_current_version(watcher, source, caplog):
+    source.version = 'v2'
+    source.error = ValueError("bad data")
+    with caplog.at_level(logging.WARNING, logger='utils.watcher'):
+        assert not watcher.check()
+        assert not watcher.check()
+    assert watcher.version == 'v1'
+    assert str(watcher.error) == "bad data"
+    # Logged once until the error changes
+    assert caplog.text.count("bad data") == 1
+
+    source.error = None
+    assert watcher.check()
+    assert watcher.error is None
+    assert watcher.version == 'v2'
+
+
+def test_notify_wakes_the_watcher_thread(watcher, source, wait_until):
+    watcher.start()
+    try:
+        source.version = 'v2'
+        watcher.notify()
+        assert wait_until(lambda: watcher.version == 'v2')
+    finally:
+        watcher.stop()
+    loads = source.loads
+    watcher.notify()
+    assert source.loads == loads
@@ -0,0 +1,306 @@
+import base64
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+from pathlib import Path
+
+from utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).parent.parent.absolute()
+
+# On-disk cache of fetched assets, stored under their SHA-256
+ASSET_CACHE_DIR = _ROOT / 'data' / 'assets'
+
+# Assets bundled at build time and shipped with the app
+BUNDLE_DIR = _ROOT / 'assets'
+
+# Cached copies older than this are refreshed in the background
+ASSET_TTL = 7 * 24 * 3600
+
+# Bytes kept in the on-disk cache before the least recently used assets go
+MAX_CACHE_BYTES = 32 * 2**20
+
+# Seconds before a failed fetch of an uncached asset is tried again
+RETRY_AFTER = 300
+
+# Seconds between recording use of the same cached asset in the index
+TOUCH_INTERVAL = 60
+
+FETCH_TIMEOUT = 5
+
+KOFI_IMAGE = 'https://storage.ko-fi.com/cdn/kofi2.png?v=3'
+
+# Remote assets the app renders, bundled by ``python -m utils.assets``
+APP_ASSETS = [KOFI_IMAGE]
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Asset:
+    """Bytes of one remote asset with its content type"""
+
+    __slots__ = ('url', 'digest', 'content_type', 'data', 'fetched_at')
+
+    def __init__(self, url, data, content_type, fetched_at=None):
+        self.url = url
+        self.data = data
+        self.digest = _digest(data)
+        self.content_type = content_type
+        self.fetched_at = fetched_at
+
+    def json(self):
+        return json.loads(self.data)
+
+    def data_uri(self):
+        """Return the asset inlined as a data: URI"""
+        return f"data:{self.content_type};base64,{base64.b64encode(self.data).decode()}"
+
+
+@traced('assets.fetch')
+def fetch(url, timeout=FETCH_TIMEOUT):
+    """Download one asset; returns (bytes, content type)"""
+    import requests
+
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    content_type = r.headers.get('Content-Type', '').split(';')[0].strip()
+    return r.content, content_type or 'application/octet-stream'
+
+
+class AssetCache:
+    """Remote animations and images fetched once, then served from memory
+
+    Lookups go to memory, then the build-time bundle, then the on-disk
+    cache, and never to the network: a miss returns None and one background
+    thread fetches the asset for later renders, so a render never waits on a
+    third-party CDN. Disk entries are content-addressed blobs plus an
+    ``index.json`` mapping each URL to its digest. Once an entry is older
+    than ``ttl`` it is still served while it is refetched the same way.
+    Bundled assets never expire. Hits on disk entries update their
+    ``used_at`` (at most every ``TOUCH_INTERVAL`` seconds), and after each
+    write the least recently used entries are evicted until the cache fits
+    in ``max_bytes``.
+    """
+
+    def __init__(self, path=ASSET_CACHE_DIR, bundle_path=BUNDLE_DIR, ttl=ASSET_TTL,
+                 max_bytes=MAX_CACHE_BYTES, fetcher=fetch):
+        self.path = Path(path)
+        self.bundle_path = Path(bundle_path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        self._memory = {}
+        self._failed = {}
+        self._refreshing = set()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._bundle = self._read_manifest(self.bundle_path)
+
+    @staticmethod
+    def _read_manifest(path):
+        try:
+            return json.loads((path / 'manifest.json').read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _read_index(self):
+        try:
+            return json.loads((self.path / 'index.json').read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _load_blob(self, path, digest):
+        """Read a content-addressed blob, or None if it is missing or corrupt"""
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        return data if _digest(data) == digest else None
+
+    def _from_bundle(self, url):
+        entry = self._bundle.get(url)
+        if entry is None:
+            return None
+        data = self._load_blob(self.bundle_path / entry['file'], entry['digest'])
+        return None if data is None else Asset(url, data, entry['content_type'])
+
+    def _from_disk(self, url):
+        entry = self._read_index().get(url)
+        if entry is None:
+            return None
+        data = self._load_blob(self.path / entry['digest'], entry['digest'])
+        if data is None:
+            return None
+        return Asset(url, data, entry['content_type'], entry['fetched_at'])
+
+    def _store(self, asset):
+        """Write an asset to the disk cache, then evict down to the size bound"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        blob = self.path / asset.digest
+        if not blob.exists():
+            _write_atomic(blob, asset.data)
+        with self._lock:
+            index = self._read_index()
+            now = time.time()
+            index[asset.url] = {
+                'digest': asset.digest,
+                'content_type': asset.content_type,
+                'size': len(asset.data),
+                'fetched_at': asset.fetched_at,
+                'used_at': now
+            }
+            self._touched[asset.url] = now
+            self._evict(index)
+            _write_atomic(self.path / 'index.json', json.dumps(index).encode())
+
+    def _evict(self, index):
+        # Identical content shared by several URLs is stored and counted once
+        sizes = {e['digest']: e['size'] for e in index.values()}
+        total = sum(sizes.values())
+        for url in sorted(index, key=lambda u: index[u]['used_at']):
+            if total <= self.max_bytes:
+                break
+            digest = index.pop(url)['digest']
+            if all(e['digest'] != digest for e in index.values()):
+                (self.path / digest).unlink(missing_ok=True)
+                total -= sizes[digest]
+
+    def _touch(self, url):
+        """Record a hit on a disk entry so eviction drops the least recently used"""
+        now = time.time()
+        if now - self._touched.get(url, 0) < TOUCH_INTERVAL:
+            return
+        self._touched[url] = now
+        with self._lock:
+            index = self._read_index()
+            if url not in index:
+                return
+            index[url]['used_at'] = now
+            _write_atomic(self.path / 'index.json', json.dumps(index).encode())
+
+    def _fetch(self, url):
+        data, content_type = self.fetcher(url)
+        asset = Asset(url, data, content_type, time.time())
+        self._store(asset)
+        self._memory[url] = asset
+        return asset
+
+    def _refresh(self, url):
+        try:
+            self._fetch(url)
+            self._failed.pop(url, None)
+        except Exception as e:
+            self._failed[url] = time.time()
+            logger.warning("Fetching %s failed: %s", url, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def _refresh_in_background(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+        threading.Thread(target=self._refresh, args=(url,), name='asset-refresh', daemon=True).start()
+
+    def _expired(self, asset):
+        return asset.fetched_at is not None and time.time() - asset.fetched_at > self.ttl
+
+    def get(self, url):
+        """Return the cached Asset for a URL, or None if it has not been fetched yet"""
+        asset = self._memory.get(url)
+        if asset is None:
+            asset = self._from_bundle(url) or self._from_disk(url)
+            if asset is not None:
+                self._memory[url] = asset
+
+        if asset is None:
+            # Fetch for later renders, but do not retry a failing CDN on every render
+            if time.time() - self._failed.get(url, 0) >= RETRY_AFTER:
+                self._refresh_in_background(url)
+            return None
+
+        # Bundled assets have no fetch time and are not in the disk index
+        if asset.fetched_at is not None:
+            self._touch(url)
+            if self._expired(asset):
+                self._refresh_in_background(url)
+        return asset
+
+    def clear_memory(self):
+        self._memory.clear()
+        self._failed.clear()
+        self._touched.clear()
+
+
+def bundle(urls, path=BUNDLE_DIR, fetcher=fetch):
+    """Download assets into the build-time bundle and record them in its manifest"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest = AssetCache._read_manifest(path)
+    for url in urls:
+        data, content_type = fetcher(url)
+        digest = _digest(data)
+        name = digest + (mimetypes.guess_extension(content_type) or '')
+        _write_atomic(path / name, data)
+        old = manifest.get(url)
+        manifest[url] = {'digest': digest, 'content_type': content_type, 'file': name}
+        if old and old['file'] != name and all(e['file'] != old['file'] for e in manifest.values()):
+            (path / old['file']).unlink(missing_ok=True)
+    _write_atomic(path / 'manifest.json', json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """Return the process-wide asset cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AssetCache()
+    return _cache
+
+
+def load_json(url):
+    """Return a cached JSON asset (e.g. a Lottie animation), or None until it is fetched"""
+    asset = get_asset_cache().get(url)
+    return None if asset is None else asset.json()
+
+
+def asset_src(url):
+    """Return an img src for a remote image: inlined when cached, the URL until then"""
+    asset = get_asset_cache().get(url)
+    return url if asset is None else asset.data_uri()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bundle remote assets so the app renders offline")
+    parser.add_argument('urls', nargs='*', help="Extra asset URLs, e.g. Lottie animations")
+    parser.add_argument('--path', default=str(BUNDLE_DIR))
+    args = parser.parse_args()
+
+    manifest = bundle(APP_ASSETS + args.urls, args.path)
+    print(f"Bundled {len(manifest)} assets into {args.path}")
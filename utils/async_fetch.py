@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import codecs
+import copy
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils.dataset import DATA_PATH
+from utils.history import HistoryStore
+from utils.ingest import REPORT_DATE, REPORT_FIELDS, SOCRATA_RESOURCE, SOCRATA_URL, merge_reports, publish, soql_quote
+from utils.partitions import partition_dir_in_use
+from utils.prices import PriceStore
+
+# Statuses worth retrying, matching the synchronous ingest session
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket limiting how many requests start per second"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class JSONArrayStream:
+    """Incrementally decode the elements of a JSON array fed in byte chunks"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk):
+        """Return the array elements completed by this chunk"""
+        buf = self._buffer + self._text.decode(chunk)
+        pos = 0
+        items = []
+        while not self.done:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not self._started:
+                if buf[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                self._started = True
+                pos += 1
+            elif buf[pos] == ',':
+                pos += 1
+            elif buf[pos] == ']':
+                self.done = True
+                pos += 1
+            else:
+                try:
+                    item, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Element is split across chunks, wait for the rest
+                    break
+                if isinstance(item, (int, float)) and not isinstance(item, bool) \
+                        and (end == len(buf) or buf[end] not in ',] \t\r\n'):
+                    # A number is only complete once a delimiter follows it
+                    break
+                items.append(item)
+                pos = end
+        self._buffer = buf[pos:]
+        return items
+
+
+class AsyncReportFetcher:
+    """Fetch the latest reports for many markets concurrently
+
+    ``concurrency`` bounds the requests in flight and ``rate`` (requests per
+    second, per host) paces how quickly new ones start. Responses are decoded
+    as they stream in rather than after the whole body has arrived.
+    """
+
+    def __init__(self, base_url=SOCRATA_URL, token=None, concurrency=8, rate=None,
+                 retries=3, backoff=0.5, timeout=30):
+        self.base_url = base_url
+        self.token = token
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._limiters = {}
+
+    def _limiter(self, url):
+        if not self.rate:
+            return None
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = RateLimiter(self.rate, burst=self.concurrency)
+        return self._limiters[host]
+
+    async def _get_rows(self, session, params):
+        url = self.base_url + SOCRATA_RESOURCE
+        limiter = self._limiter(url)
+        for attempt in range(self.retries + 1):
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                async with session.get(url, params=params) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status
+                        )
+                    response.raise_for_status()
+                    stream = JSONArrayStream()
+                    rows = []
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        rows.extend(stream.feed(chunk))
+                    if not stream.done:
+                        # The connection dropped mid-body; a partial page is not a page
+                        raise aiohttp.ClientPayloadError("Response ended before the end of the JSON array")
+                    return rows
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, aiohttp.ClientResponseError,
+                    asyncio.TimeoutError) as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status not in RETRY_STATUSES:
+                    raise
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def _fetch_market(self, session, semaphore, market):
+        params = {
+            '$select': ','.join(['market_and_exchange_names'] + REPORT_FIELDS),
+            '$where': f"market_and_exchange_names = {soql_quote(market['market_and_exchange_names'])}",
+            '$order': f'{REPORT_DATE} DESC',
+            '$limit': '2'
+        }
+        async with semaphore:
+            return await self._get_rows(session, params)
+
+    async def fetch_rows(self, markets):
+        """Return the latest two report rows of every market, as the source sent them"""
+        headers = {'X-App-Token': self.token} if self.token else {}
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+            pages = await asyncio.gather(*(
+                self._fetch_market(session, semaphore, m) for m in markets
+                if m.get('market_and_exchange_names')
+            ))
+        return [row for page in pages for row in page]
+
+    async def fetch(self, markets):
+        """Return copies of the market records with the fetched reports merged in
+
+        Rows are validated and merged as ``ingest.merge_reports`` does, so a
+        row missing a position is skipped rather than stored as 0.
+        """
+        records = copy.deepcopy(list(markets))
+        merge_reports(records, await self.fetch_rows(markets))
+        return records
+
+
+def fetch_markets(markets, **kwargs):
+    """Synchronous wrapper around AsyncReportFetcher.fetch"""
+    return asyncio.run(AsyncReportFetcher(**kwargs).fetch(markets))
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    parser = argparse.ArgumentParser(description="Refresh every market's latest reports concurrently")
+    parser.add_argument('--base-url', default=SOCRATA_URL, help="Socrata host to query")
+    parser.add_argument('--data', default=str(DATA_PATH), help="Dataset file to update")
+    parser.add_argument('--concurrency', type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument('--rate', type=float, default=None, help="Maximum requests started per second")
+    parser.add_argument('--no-history', action='store_true', help="Skip updating the history store")
+    parser.add_argument('--no-prices', action='store_true', help="Skip updating the price cache")
+    args = parser.parse_args()
+
+    with open(args.data, 'r') as f:
+        markets = json.load(f)
+    fetcher = AsyncReportFetcher(
+        base_url=args.base_url,
+        token=os.getenv('SODAPY_TOKEN'),
+        concurrency=args.concurrency,
+        rate=args.rate
+    )
+    applied = merge_reports(markets, asyncio.run(fetcher.fetch_rows(markets)))
+    # The same write path as utils.ingest: dataset, partitions, history, snapshots and prices
+    history = None if args.no_history else HistoryStore()
+    prices = None if args.no_prices else PriceStore()
+    publish(markets, applied, args.data, history, prices=prices, partition_dir=partition_dir_in_use())
+    print(f"Applied {len(applied)} new reports across {len(markets)} markets")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+import itertools
+import uuid
+import warnings
+
+import numpy as np
+
+from utils.history import DATE_COLUMN, OPEN_INTEREST_COLUMN
+from utils.normalization import open_interest
+from utils.positions import LONG_FIELDS, SHORT_FIELDS, TRADERS
+from utils.prices import instrument_key
+
+WEEKS_PER_YEAR = 52
+
+# Cost per unit of position change, as a fraction of notional
+DEFAULT_FEE = 0.001
+
+# Cells (parameters x markets x weeks) simulated per block, to bound memory
+BLOCK_CELLS = 2_000_000
+
+# Days from a report's as-of date (Tuesday) to its publication (Friday)
+RELEASE_LAG_DAYS = 3
+
+_COMMERCIAL = TRADERS.index('Commercial')
+_NON_COMMERCIAL = TRADERS.index('Non-Commercial')
+
+
+class Panel:
+    """Weekly positioning and prices of many markets on one report-date grid
+
+    ``net`` is (markets, weeks, traders); ``open_interest`` and ``prices``
+    are (markets, weeks). Weeks a market has no report or price for hold NaN.
+    ``dates`` are the reports' as-of dates, but a report only becomes known
+    ``release_lag`` days later, so ``prices[:, t]`` is the price on
+    ``published[t]``, not on ``dates[t]``: pricing at the as-of date would
+    trade on positioning days before anyone could see it. ``returns[:, t]``
+    is the price change from the publication of report ``t - 1`` to that of
+    report ``t``.
+    """
+
+    def __init__(self, names, dates, net, open_interest, prices, release_lag=RELEASE_LAG_DAYS):
+        self.key = uuid.uuid4().hex
+        self.names = list(names)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.release_lag = int(release_lag)
+        self.net = np.asarray(net, dtype=np.float64)
+        self.open_interest = np.asarray(open_interest, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.returns = np.full(self.prices.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.returns[:, 1:] = self.prices[:, 1:] / self.prices[:, :-1] - 1
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    @property
+    def published(self):
+        """Return the date each report became public"""
+        return self.dates + np.timedelta64(self.release_lag, 'D')
+
+    def columns(self):
+        """Return the arrays the strategies read, by name"""
+        return {'net': self.net, 'open_interest': self.open_interest, 'returns': self.returns}
+
+
+def build_panel(markets, history=None, prices=None, release_lag=RELEASE_LAG_DAYS):
+    """Lay out market records, their stored history and cached prices on one weekly grid
+
+    Each market's weeks come from the history store, with the latest and
+    previous reports of its record filling any the store lacks. Prices are
+    the instrument's close on each report's publication date, ``release_lag``
+    days after its as-of date, read once per instrument.
+    """
+    if history is None:
+        from utils.history import get_history
+        history = get_history()
+    history = history.pin()
+    if prices is None:
+        from utils.prices import get_price_store
+        prices = get_price_store()
+
+    fields = LONG_FIELDS + SHORT_FIELDS + [OPEN_INTEREST_COLUMN]
+    per_market = []
+    for market in markets:
+        stored = history.query(market['display_name'])
+        days = list(np.asarray(stored.get(DATE_COLUMN, np.empty(0, 'datetime64[D]'))))
+        values = [np.asarray(stored.get(f, np.zeros(len(days), np.int64))) for f in fields]
+        values = np.stack(values, axis=1) if days else np.zeros((0, len(fields)), np.int64)
+        extra_days, extra_values = [], []
+        for key in ('previous_report', 'latest_report'):
+            report = market.get(key)
+            if not report:
+                continue
+            day = np.datetime64(report['report_date_as_yyyy_mm_dd'][:10], 'D')
+            if day not in days:
+                extra_days.append(day)
+                extra_values.append([int(report.get(f, 0)) for f in fields])
+        if extra_days:
+            days = days + extra_days
+            values = np.concatenate([values, np.array(extra_values, dtype=np.int64)])
+        per_market.append((np.array(days, dtype='datetime64[D]'), values))
+
+    dates = np.unique(np.concatenate([d for d, _ in per_market])) if per_market else np.empty(0, 'datetime64[D]')
+    n, w, k = len(markets), len(dates), len(TRADERS)
+    grid = np.full((n, w, len(fields)), np.nan)
+    for i, (days, values) in enumerate(per_market):
+        grid[i, np.searchsorted(dates, days)] = values
+
+    long, short = grid[..., :k], grid[..., k:2 * k]
+    oi, _ = open_interest(np.nan_to_num(grid[..., 2 * k]), np.nan_to_num(long))
+    oi = np.where(np.isnan(grid[..., 2 * k]), np.nan, oi)
+
+    closes = np.full((n, w), np.nan)
+    published = dates + np.timedelta64(release_lag, 'D')
+    series = {}
+    for i, market in enumerate(markets):
+        key = instrument_key(market)
+        if key is None:
+            continue
+        if key not in series:
+            series[key] = prices.asof(key, published)
+        closes[i] = series[key]
+    return Panel([m['display_name'] for m in markets], dates, long - short, oi, closes, release_lag)
+
+
+# Strategies: each maps the panel columns and a parameter grid to positions
+# of shape (params, markets, weeks) in {-1, 0, 1}, decided at each report's publication
+
+def param_grid(**axes):
+    """Return the cartesian product of parameter axes as {name: array}"""
+    names = list(axes)
+    combos = list(itertools.product(*(np.atleast_1d(axes[name]) for name in names)))
+    return {name: np.array([c[j] for c in combos]) for j, name in enumerate(names)}
+
+
+def _grid_size(grid):
+    return len(next(iter(grid.values()))) if grid else 0
+
+
+def threshold_signals(columns, grid):
+    """Follow non-commercials when they out-position commercials by more than a threshold
+
+    The spread is non-commercial minus commercial net, as a percent of open
+    interest; long above ``threshold``, short below ``-threshold``.
+    """
+    net, oi = columns['net'], columns['open_interest']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = (net[..., _NON_COMMERCIAL] - net[..., _COMMERCIAL]) / oi * 100
+    threshold = np.asarray(grid['threshold'], dtype=np.float64)[:, None, None]
+    return np.where(spread > threshold, 1.0, 0.0) - np.where(spread < -threshold, 1.0, 0.0)
+
+
+def rolling_index(values, window):
+    """Rolling (value - min) / (max - min) * 100 along the last axis, NaN-aware
+
+    Weeks with fewer than two reports in their window give NaN.
+    """
+    pad = np.full(values.shape[:-1] + (window - 1,), np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(np.concatenate([pad, values], axis=-1), window, axis=-1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low = np.nanmin(windows, axis=-1)
+        high = np.nanmax(windows, axis=-1)
+    count = np.sum(~np.isnan(windows), axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((high > low) & (count >= 2), (values - low) / (high - low) * 100, np.nan)
+
+
+def cot_index_signals(columns, grid):
+    """Side with commercials at the extremes of their COT Index
+
+    Long when the commercial index over ``window`` weeks is at or above
+    ``100 - band``, short at or below ``band``.
+    """
+    commercial = columns['net'][..., _COMMERCIAL]
+    windows = np.asarray(grid['window'], dtype=np.int64)
+    band = np.asarray(grid['band'], dtype=np.float64)[:, None, None]
+    index = np.empty((len(windows),) + commercial.shape)
+    for window in np.unique(windows):
+        index[windows == window] = rolling_index(commercial, int(window))
+    return np.where(index >= 100 - band, 1.0, 0.0) - np.where(index <= band, 1.0, 0.0)
+
+
+def flow_reversal_signals(columns, grid):
+    """Follow non-commercials when their weekly flow turns against the prior trend
+
+    A reversal is a week whose net change has the opposite sign of the sum
+    of the previous ``lookback`` weeks' changes; the position takes the new
+    direction and is held until the next reversal.
+    """
+    net = columns['net'][..., _NON_COMMERCIAL]
+    change = np.full(net.shape, np.nan)
+    change[:, 1:] = np.diff(net, axis=-1)
+    filled = np.nan_to_num(change)
+    cumulative = np.concatenate([np.zeros(net.shape[:-1] + (1,)), np.cumsum(filled, axis=-1)], axis=-1)
+    weeks = np.arange(net.shape[-1])
+
+    positions = np.zeros((_grid_size(grid),) + net.shape)
+    for p, lookback in enumerate(np.asarray(grid['lookback'], dtype=np.int64)):
+        start = np.maximum(weeks - lookback, 0)
+        prior = cumulative[..., weeks] - cumulative[..., start]
+        turn = np.sign(filled) * (np.sign(filled) == -np.sign(prior)) * (weeks >= lookback)
+        # Hold each new direction until the next reversal
+        last = np.maximum.accumulate(np.where(turn != 0, weeks, 0), axis=-1)
+        positions[p] = np.take_along_axis(turn, last, axis=-1)
+    return positions
+
+
+STRATEGIES = {
+    'threshold': threshold_signals,
+    'cot_index': cot_index_signals,
+    'flow_reversal': flow_reversal_signals
+}
+
+DEFAULT_GRIDS = {
+    'threshold': param_grid(threshold=[0, 2, 5, 10, 15, 20, 30]),
+    'cot_index': param_grid(window=[13, 26, 52], band=[10, 20, 30]),
+    'flow_reversal': param_grid(lookback=[1, 2, 3, 4, 6, 8])
+}
+
+STATS = ('total_return', 'annual_return', 'annual_volatility', 'sharpe', 'max_drawdown',
+         'hit_rate', 'trades', 'exposure')
+
+
+def simulate(positions, returns, fee=DEFAULT_FEE):
+    """Turn (..., markets, weeks) positions into weekly P&L and equity curves
+
+    The position decided on report ``t`` is entered at its publication and
+    earns the return from the publication of ``t`` to that of ``t + 1``, so
+    ``returns`` must be measured between publication dates (see ``Panel``);
+    returns between as-of dates would let each position earn the move
+    that happened before its report was released. Every change of position
+    pays ``fee`` per unit traded. Returns (pnl, equity, held).
+    """
+    held = np.zeros(positions.shape)
+    held[..., 1:] = positions[..., :-1]
+    held[..., 1:] *= np.isfinite(returns[..., 1:])
+    turnover = np.abs(np.diff(held, axis=-1, prepend=0.0))
+    pnl = held * np.nan_to_num(returns) - fee * turnover
+    return pnl, np.cumprod(1 + pnl, axis=-1), held
+
+
+def summarize(pnl, equity, held, returns):
+    """Return {stat: (..., markets)} performance figures over each market's priced weeks"""
+    priced = np.isfinite(returns)
+    weeks = priced.sum(axis=-1)
+    active = held != 0
+    trades = np.abs(np.diff(held, axis=-1, prepend=0.0)) > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(priced, pnl, 0).sum(axis=-1) / weeks
+        variance = np.where(priced, (pnl - mean[..., None]) ** 2, 0).sum(axis=-1) / weeks
+        std = np.sqrt(variance)
+        final = equity[..., -1]
+        drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=-1) - 1
+        return {
+            'total_return': final - 1,
+            'annual_return': np.where(final > 0, final ** (WEEKS_PER_YEAR / weeks) - 1, -1.0),
+            'annual_volatility': std * np.sqrt(WEEKS_PER_YEAR),
+            'sharpe': np.where(std > 0, mean / std * np.sqrt(WEEKS_PER_YEAR), np.nan),
+            'max_drawdown': drawdown.min(axis=-1),
+            'hit_rate': (active & (pnl > 0)).sum(axis=-1) / active.sum(axis=-1),
+            'trades': trades.sum(axis=-1).astype(np.float64),
+            'exposure': active.sum(axis=-1) / weeks
+        }
+
+
+def run_grid(columns, strategy, grid, fee=DEFAULT_FEE, curves=False, check=None):
+    """Run one strategy over every parameter set in a grid and every market at once
+
+    Parameters are processed in blocks of about ``BLOCK_CELLS`` cells so a
+    large sweep does not hold every equity curve at once unless ``curves``
+    asks for them. Returns {stat: (params, markets)} plus ``equity``
+    (params, markets, weeks) when ``curves`` is set.
+    """
+    signals = STRATEGIES[strategy]
+    returns = columns['returns']
+    size = _grid_size(grid)
+    block = max(1, BLOCK_CELLS // max(returns.size, 1))
+    parts = []
+    for lo in range(0, size, block):
+        if check is not None:
+            check()
+        sub = {name: values[lo:lo + block] for name, values in grid.items()}
+        pnl, equity, held = simulate(signals(columns, sub), returns, fee)
+        stats = summarize(pnl, equity, held, returns)
+        if curves:
+            stats['equity'] = equity
+        parts.append(stats)
+    if not parts:
+        return {name: np.empty((0,) + returns.shape[:-1]) for name in STATS}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+class BacktestResult:
+    """Stats and equity curves of one strategy over a parameter grid and a panel"""
+
+    def __init__(self, strategy, grid, panel, results):
+        self.strategy = strategy
+        self.grid = grid
+        self.names = panel.names
+        self.dates = panel.dates
+        self.stats = {name: results[name] for name in STATS}
+        self.equity = results.get('equity')
+
+    def frame(self):
+        """Return one row per parameter set and market"""
+        import pandas as pd
+
+        params, markets = self.stats['sharpe'].shape
+        data = {name: np.repeat(values, markets) for name, values in self.grid.items()}
+        data['market'] = self.names * params
+        data.update({name: values.ravel() for name, values in self.stats.items()})
+        return pd.DataFrame(data)
+
+    def best(self, stat='sharpe'):
+        """Return the parameter set with the highest stat averaged across markets"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            score = np.nanmean(self.stats[stat], axis=1)
+        if np.all(np.isnan(score)):
+            return None
+        p = int(np.nanargmax(score))
+        return {name: values[p].item() for name, values in self.grid.items()}
+
+
+def backtest(panel, strategy, grid=None, fee=DEFAULT_FEE, curves=True, executor=None, owner=None):
+    """Backtest a strategy over a parameter grid on every market of a panel
+
+    With an AnalyticsExecutor and a sweep of at least its ``min_rows``
+    cells, the grid is split across the pool's workers, which map the panel
+    from shared memory; otherwise it runs on the calling thread.
+    """
+    grid = DEFAULT_GRIDS[strategy] if grid is None else {k: np.asarray(v) for k, v in grid.items()}
+    size = _grid_size(grid)
+    cells = size * panel.returns.size
+    if executor is None or cells < executor.min_rows or size < 2:
+        return BacktestResult(strategy, grid, panel, run_grid(panel.columns(), strategy, grid, fee, curves))
+
+    executor.publish(panel.key, panel.columns())
+    chunks = np.array_split(np.arange(size), min(executor.max_workers, size))
+    futures = [
+        executor.submit('backtest_sweep', panel.key, strategy,
+                        {name: values[chunk] for name, values in grid.items()}, fee, curves, owner=owner)
+        for chunk in chunks
+    ]
+    try:
+        parts = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            executor.cancel_job(future)
+        raise
+    results = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    return BacktestResult(strategy, grid, panel, results)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.dataset import load_dataset
+
+    parser = argparse.ArgumentParser(description="Backtest CoT positioning strategies on the stored history and prices")
+    parser.add_argument('--strategy', choices=list(STRATEGIES), nargs='+', default=list(STRATEGIES))
+    parser.add_argument('--fee', type=float, default=DEFAULT_FEE)
+    parser.add_argument('--release-lag', type=int, default=RELEASE_LAG_DAYS,
+                        help="Days from a report's as-of date to its publication")
+    args = parser.parse_args()
+
+    panel = build_panel(load_dataset().markets, release_lag=args.release_lag)
+    print(f"{len(panel.names)} markets, {len(panel.dates)} report dates")
+    for name in args.strategy:
+        result = backtest(panel, name, fee=args.fee, curves=False)
+        frame = result.frame()
+        print(f"\n{name}: best {result.best()}")
+        print(frame.groupby(list(result.grid))[['sharpe', 'total_return', 'max_drawdown']].mean().round(3))
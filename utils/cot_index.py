@@ -0,0 +1,202 @@
+import bisect
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from utils.history import DATE_COLUMN
+from utils.positions import LONG_FIELDS, SHORT_FIELDS, TRADERS
+
+# Default lookback, in weekly reports
+DEFAULT_WINDOW = 26
+
+
+class RollingWindow:
+    """Fixed-size window of values with incremental min/max, z-score and percentile
+
+    Min and max come from monotonic deques (O(1) amortized per push), mean and
+    standard deviation from running sums (O(1)), and the percentile rank from
+    a sorted copy of the window maintained with bisect (O(log n) search).
+    """
+
+    __slots__ = ('size', 'values', 'sorted', 'mins', 'maxs', 'total', 'total_sq', 'count')
+
+    def __init__(self, size=DEFAULT_WINDOW):
+        self.size = size
+        self.values = deque()
+        self.sorted = []
+        self.mins = deque()
+        self.maxs = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.count = 0
+
+    def push(self, value):
+        """Add the newest value, evicting the oldest once the window is full"""
+        value = float(value)
+        seq = self.count
+        self.count += 1
+
+        self.values.append(value)
+        bisect.insort(self.sorted, value)
+        self.total += value
+        self.total_sq += value * value
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((seq, value))
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((seq, value))
+
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+            self.total -= old
+            self.total_sq -= old * old
+        oldest = self.count - len(self.values)
+        if self.mins[0][0] < oldest:
+            self.mins.popleft()
+        if self.maxs[0][0] < oldest:
+            self.maxs.popleft()
+
+    def __len__(self):
+        return len(self.values)
+
+    def stats(self):
+        """Return COT index, percentile, z-score, min and max for the newest value"""
+        if not self.values:
+            return {'index': math.nan, 'percentile': math.nan, 'zscore': math.nan,
+                    'min': math.nan, 'max': math.nan}
+        current = self.values[-1]
+        low, high = self.mins[0][1], self.maxs[0][1]
+        n = len(self.values)
+        mean = self.total / n
+        variance = max(self.total_sq / n - mean * mean, 0.0)
+        std = math.sqrt(variance)
+        return {
+            'index': (current - low) / (high - low) * 100 if high > low else math.nan,
+            'percentile': bisect.bisect_right(self.sorted, current) / n * 100,
+            'zscore': (current - mean) / std if std > 0 else 0.0,
+            'min': low,
+            'max': high
+        }
+
+
+class CotIndexEngine:
+    """Rolling COT Index state per market and trader class
+
+    Each weekly report is applied with ``update`` and only touches that
+    market's windows; nothing is recomputed over the stored history.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.windows = {}
+        self.last_date = {}
+        self._lock = threading.Lock()
+
+    def update(self, market, report_date, nets):
+        """Apply one report's net positions (one per trader class); older dates are ignored"""
+        report_date = np.datetime64(str(report_date)[:10], 'D')
+        with self._lock:
+            last = self.last_date.get(market)
+            if last is not None and report_date <= last:
+                return False
+            windows = self.windows.get(market)
+            if windows is None:
+                windows = self.windows[market] = [RollingWindow(self.window) for _ in TRADERS]
+            for window, net in zip(windows, nets):
+                window.push(net)
+            self.last_date[market] = report_date
+            return True
+
+    def update_report(self, market, report):
+        """Apply a report dict in the dataset schema"""
+        nets = [int(report[l]) - int(report[s]) for l, s in zip(LONG_FIELDS, SHORT_FIELDS)]
+        return self.update(market, report['report_date_as_yyyy_mm_dd'], nets)
+
+    def refresh(self, history):
+        """Bring the engine up to date with a HistoryStore, applying only reports it has not seen
+
+        A market whose already-applied reports no longer match the store (a
+        revised week or a backfilled older one) is rebuilt from its stored
+        history; every other market only gets the reports dated after its
+        last one. Markets gone from the store are dropped.
+        """
+        history = history.pin()
+        markets = history.markets
+        for market in markets:
+            data = history.query(market)
+            dates = data[DATE_COLUMN]
+            nets = np.stack([
+                np.asarray(data[l]) - np.asarray(data[s]) for l, s in zip(LONG_FIELDS, SHORT_FIELDS)
+            ], axis=1)
+            start = 0
+            last = self.last_date.get(market)
+            if last is not None:
+                seen = int(np.searchsorted(dates, last, side='right'))
+                windows = self.windows[market]
+                applied = np.array([list(window.values) for window in windows]).T
+                if windows[0].count == seen and np.array_equal(applied, nets[seen - len(applied):seen]):
+                    start = seen
+                else:
+                    self._drop(market)
+            for day, row in zip(dates[start:], nets[start:]):
+                self.update(market, day, row)
+        for market in set(self.windows) - set(markets):
+            self._drop(market)
+        return self
+
+    def seed(self, history):
+        """Replay every stored report of a HistoryStore, oldest first"""
+        return self.refresh(history)
+
+    def _drop(self, market):
+        with self._lock:
+            self.windows.pop(market, None)
+            self.last_date.pop(market, None)
+
+    def stats(self, market):
+        """Return {trader: stats} for one market, or None if it has no history"""
+        with self._lock:
+            windows = self.windows.get(market)
+            if windows is None:
+                return None
+            return {trader: window.stats() for trader, window in zip(TRADERS, windows)}
+
+    def frame(self):
+        """Return the current stats for every market and trader class as a DataFrame"""
+        import pandas as pd
+
+        rows = []
+        for market in self.windows:
+            for trader, stats in self.stats(market).items():
+                rows.append({'market': market, 'trader': trader, 'weeks': len(self.windows[market][0]), **stats})
+        return pd.DataFrame(rows)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def cot_index_for(history, window=DEFAULT_WINDOW):
+    """Return the COT index engine of a history store, up to date with its current version
+
+    One engine is kept per store and refreshed in place when a new version
+    lands, so a new weekly report costs one push per market rather than a
+    replay of the history. A different window starts a new engine.
+    """
+    pinned = history.pin()
+    version = pinned.version
+    cached = _engines.get(id(history))
+    if cached is not None and cached[:2] == (window, version):
+        return cached[2]
+    with _engines_lock:
+        cached = _engines.get(id(history))
+        if cached is not None and cached[:2] == (window, version):
+            return cached[2]
+        engine = cached[2] if cached is not None and cached[0] == window else CotIndexEngine(window)
+        engine.refresh(pinned)
+        _engines[id(history)] = (window, version, engine)
+    return engine
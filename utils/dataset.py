@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from utils.records import build_records
+from utils.tracing import span
+
+# Default location of the uploaded market data, overridable with COT_DATA_PATH
+DATA_PATH = Path(
+    os.getenv('COT_DATA_PATH') or Path(__file__).parent.parent.absolute() / 'data' / 'mock_algo_upload.json'
+)
+
+_lock = threading.Lock()
+_cache = {}
+
+
+class Dataset:
+    """Validated market records with a prebuilt display_name index
+
+    ``positions`` and ``present`` are the int64 (market, report, field)
+    matrix and report flags from ``build_records``; every record's reports
+    are views into it. ``partition`` names the partition the records came
+    from, if any.
+    """
+
+    def __init__(self, markets, version, positions=None, present=None, partition=None):
+        self.markets = markets
+        self.version = version
+        self.positions = positions
+        self.present = present
+        self.partition = partition
+        self.options = [m['display_name'] for m in markets]
+        self.index = {name: i for i, name in enumerate(self.options)}
+
+    def get(self, display_name):
+        """Return the market record for a display name, falling back to the first market"""
+        return self.markets[self.index.get(display_name, 0)]
+
+    def dataset_for(self, display_name):
+        """Return the Dataset holding a market; a single-file dataset holds them all"""
+        return self
+
+    def combined(self):
+        return self
+
+
+def parse_markets(raw):
+    """Parse raw JSON bytes into validated records: (markets, positions, present)
+
+    Entries that are not objects with a display_name are skipped; malformed
+    reports raise SchemaError (a ValueError) naming every offending market.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, list):
+        raise ValueError("Invalid data format. Expected a list of market data.")
+    return build_records([m for m in data if isinstance(m, dict) and 'display_name' in m])
+
+
+def load_dataset(path=DATA_PATH):
+    """Load the market dataset, re-parsing only when the file changes
+
+    The cache is shared by every session in the process. A rerun costs one
+    stat() call; the file is only read again when its mtime or size moves,
+    and only re-parsed when the content hash actually differs.
+    """
+    path = Path(path)
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+
+    with _lock:
+        # Another session may have reloaded while we waited
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+
+        # Timed from the read through parsing and record building
+        with span('dataset.load'):
+            raw = path.read_bytes()
+            version = hashlib.sha256(raw).hexdigest()[:16]
+            if cached is not None and cached[1].version == version:
+                # Touched but unchanged, keep the parsed copy
+                dataset = cached[1]
+            else:
+                with span('dataset.parse'):
+                    markets, positions, present = parse_markets(raw)
+                    dataset = Dataset(markets, version, positions, present)
+        _cache[path] = (stat_key, dataset)
+        return dataset
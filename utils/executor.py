@@ -0,0 +1,247 @@
+import atexit
+import multiprocessing as mp
+import os
+import threading
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Below this many rows a task runs on the calling thread; pickling the
+# result back from a worker would cost more than the work itself
+PARALLEL_MIN_ROWS = 20_000
+
+# Published column sets kept in shared memory at once
+KEEP_PUBLISHED = 4
+
+# Concurrent jobs that can be cancelled while running
+CANCEL_SLOTS = 256
+
+
+class Cancelled(Exception):
+    """Raised inside a task, and to its caller, once its job has been cancelled"""
+
+
+class SharedColumns:
+    """Numpy columns copied once into named shared-memory blocks
+
+    ``specs`` is all a worker needs to map the same memory without copying:
+    ``{column: (block name, shape, dtype)}``.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            self._blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+            self.arrays[name] = view
+
+    def close(self):
+        """Release and unlink every block; workers still mapping one keep their view"""
+        self.arrays = {}
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+_attached = OrderedDict()
+
+
+def attach(specs):
+    """Map published columns in a worker, reusing blocks this process already holds"""
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = _attached.get(block_name)
+        if block is None:
+            # Spawned workers share the parent's resource tracker, so the
+            # registration this makes is the parent's own and it still unlinks
+            block = shared_memory.SharedMemory(name=block_name)
+            _attached[block_name] = block
+            while len(_attached) > 64:
+                _attached.popitem(last=False)[1].close()
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays
+
+
+# Tasks
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as an executor task
+
+    Tasks are called as ``fn(columns, check, *args, **kwargs)`` where
+    ``columns`` maps names to arrays and ``check()`` raises Cancelled once the
+    job has been cancelled; long loops should call it now and then.
+    """
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+@task('screener_orders')
+def screener_orders(columns, check, metrics=('net', 'net_change'), descending=(True, False)):
+    """Argsort every per-trader metric column and the dominant share, both directions"""
+    orders = {}
+    for metric in metrics:
+        values = columns[metric]
+        for t in range(values.shape[1]):
+            check()
+            for desc in descending:
+                orders[(metric, t, desc)] = np.argsort(-values[:, t] if desc else values[:, t], kind='stable')
+    share = columns['dominant_share']
+    for desc in descending:
+        orders[('dominant_share', None, desc)] = np.argsort(-share if desc else share, kind='stable')
+    return orders
+
+
+@task('backtest_sweep')
+def backtest_sweep(columns, check, strategy, grid, fee, curves=False):
+    """Run one backtest strategy over a slice of its parameter grid (see utils.backtest)"""
+    from utils.backtest import run_grid
+
+    return run_grid(columns, strategy, grid, fee=fee, curves=curves, check=check)
+
+
+def _run(name, specs, board_spec, slot, args, kwargs):
+    """Worker entry point: map the columns and run one task"""
+    columns = attach(specs)
+    board = attach(board_spec)['cancel'] if slot is not None else None
+
+    def check():
+        if board is not None and board[slot]:
+            raise Cancelled(name)
+
+    check()
+    return TASKS[name](columns, check, *args, **kwargs)
+
+
+class AnalyticsExecutor:
+    """Process pool for CPU-heavy analytics, fed through shared memory
+
+    Column sets are published once per key (e.g. dataset version) and
+    mapped by workers without copying. Jobs are tracked per owner, usually
+    a Streamlit session, so everything a session left running can be
+    cancelled: pending jobs are dropped and running ones stop at their next
+    ``check()``.
+    """
+
+    def __init__(self, max_workers=None, min_rows=PARALLEL_MIN_ROWS):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.min_rows = min_rows
+        self._pool = None
+        self._lock = threading.Lock()
+        self._published = OrderedDict()
+        self._board = SharedColumns({'cancel': np.zeros(CANCEL_SLOTS, dtype=np.uint8)})
+        self._free_slots = deque(range(CANCEL_SLOTS))
+        self._jobs = defaultdict(set)
+        # Unlink the shared blocks even if nobody calls shutdown()
+        atexit.register(self.shutdown)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # Spawned workers never inherit the server's threads or locks
+                    self._pool = ProcessPoolExecutor(self.max_workers, mp_context=mp.get_context('spawn'))
+        return self._pool
+
+    def publish(self, key, arrays):
+        """Copy columns into shared memory under key, once; returns the SharedColumns"""
+        with self._lock:
+            shared = self._published.get(key)
+            if shared is None:
+                shared = self._published[key] = SharedColumns(arrays)
+                while len(self._published) > KEEP_PUBLISHED:
+                    self._published.popitem(last=False)[1].close()
+            else:
+                self._published.move_to_end(key)
+            return shared
+
+    def unpublish(self, key):
+        """Release a published column set now rather than when it ages out"""
+        with self._lock:
+            shared = self._published.pop(key, None)
+        if shared is not None:
+            shared.close()
+
+    def submit(self, name, key, *args, owner=None, **kwargs):
+        """Run a task in the pool over the columns published under key"""
+        shared = self._published[key]
+        with self._lock:
+            slot = self._free_slots.popleft() if self._free_slots else None
+        future = self._get_pool().submit(_run, name, shared.specs, self._board.specs, slot, args, kwargs)
+        future.slot = slot
+        future.owner = owner
+        with self._lock:
+            self._jobs[owner].add(future)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            jobs = self._jobs.get(future.owner)
+            if jobs is not None:
+                jobs.discard(future)
+                if not jobs:
+                    del self._jobs[future.owner]
+            # After shutdown the board is unlinked and its slots are gone
+            if future.slot is not None and self._board.arrays:
+                self._board.arrays['cancel'][future.slot] = 0
+                self._free_slots.append(future.slot)
+
+    def cancel(self, owner):
+        """Cancel every job of an owner; returns how many were still pending or running"""
+        with self._lock:
+            jobs = list(self._jobs.get(owner, ()))
+        for future in jobs:
+            self.cancel_job(future)
+        return len(jobs)
+
+    def run(self, name, key, *args, owner=None, rows=None, timeout=None, **kwargs):
+        """Run a task and wait for its result
+
+        Small inputs (fewer than ``min_rows`` rows) run on the calling thread.
+        If the caller is interrupted while waiting, e.g. by a Streamlit rerun,
+        the job is cancelled instead of left running.
+        """
+        shared = self._published[key]
+        if rows is not None and rows < self.min_rows:
+            return TASKS[name](shared.arrays, lambda: None, *args, **kwargs)
+        future = self.submit(name, key, *args, owner=owner, **kwargs)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            self.cancel_job(future)
+            raise
+
+    def cancel_job(self, future):
+        """Drop a pending job, or flag a running one to stop at its next check"""
+        if future.cancel() or future.slot is None:
+            return
+        with self._lock:
+            # A finished job may already have handed its slot to another
+            if not future.done() and self._board.arrays:
+                self._board.arrays['cancel'][future.slot] = 1
+
+    def shutdown(self):
+        """Stop the workers and unlink every shared block"""
+        atexit.unregister(self.shutdown)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            for shared in self._published.values():
+                shared.close()
+            self._published.clear()
+            self._board.close()
@@ -0,0 +1,265 @@
+import csv
+import io
+from pathlib import Path
+
+import numpy as np
+
+from utils.history import DATE_COLUMN, VALUE_COLUMNS, parse_report_date
+from utils.normalization import normalize, open_interest
+from utils.positions import COLUMNS, TRADERS
+from utils.records import REPORT_DATE, REPORTS
+
+# Report rows derived at once; each becomes one output row per trader class,
+# so this bounds the memory of an export and sizes its Parquet row groups
+BLOCK_ROWS = 8192
+
+FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# One row per (market, report date, trader class): the positions of
+# format_positions_data, the metrics of calculate_key_metrics, and the
+# changes and normalized views the dashboard shows next to them
+EXPORT_COLUMNS = (
+    ['market', 'report_date', 'trader']
+    + [c.lower() for c in COLUMNS]
+    + [f'{c.lower()}_change' for c in COLUMNS]
+    + [f'{c.lower()}_pct' for c in COLUMNS]
+    + [f'{c.lower()}_pct_oi' for c in COLUMNS]
+    + [f'{c.lower()}_pct_class' for c in COLUMNS]
+    + ['long_short_ratio', 'open_interest', 'open_interest_reported', 'dominant_class', 'dominant_net']
+)
+
+
+def _dataset_rows(dataset, name):
+    """Return (dates, values) of the reports a dataset carries for one market, oldest first"""
+    i = dataset.index[name]
+    market = dataset.markets[i]
+    dates, values = [], []
+    for r in reversed(range(len(REPORTS))):
+        report = market.get(REPORTS[r])
+        if report and dataset.present[i, r]:
+            dates.append(parse_report_date(report[REPORT_DATE]))
+            values.append(dataset.positions[i, r])
+    return (np.array(dates, dtype='datetime64[D]'),
+            np.array(values, dtype=np.int64).reshape(len(values), len(VALUE_COLUMNS)))
+
+
+def _market_rows(name, catalog, history):
+    """Return (dates, values) of every stored report of one market, oldest first
+
+    The history store is read in place (memory-mapped views); markets it
+    does not hold fall back to the reports in the dataset.
+    """
+    if history is not None:
+        data = history.query(name)
+        if len(data.get(DATE_COLUMN, ())):
+            return data[DATE_COLUMN], np.stack([data[col] for col in VALUE_COLUMNS], axis=-1)
+    if catalog is not None and name in catalog.index:
+        return _dataset_rows(catalog.dataset_for(name), name)
+    return np.empty(0, 'datetime64[D]'), np.zeros((0, len(VALUE_COLUMNS)), dtype=np.int64)
+
+
+def derive_block(name, dates, values, previous=None):
+    """Derive every export column for consecutive reports of one market
+
+    ``previous`` is the report before the first row, if any; changes are
+    zero where there is none, as in the dashboard.
+    """
+    k = len(TRADERS)
+    n = len(dates)
+    values = np.asarray(values, dtype=np.int64)
+    long, short = values[:, :k], values[:, k:2 * k]
+    net = long - short
+    oi, reported = open_interest(values[:, 2 * k], long)
+
+    prior = np.empty_like(values)
+    prior[1:] = values[:-1]
+    has_previous = np.ones(n, dtype=bool)
+    if previous is None:
+        prior[:1] = values[:1]
+        has_previous[:1] = False
+    else:
+        prior[:1] = previous
+    mask = has_previous[:, None]
+    prior_long, prior_short = prior[:, :k], prior[:, k:2 * k]
+    changes = [
+        np.where(mask, long - prior_long, 0),
+        np.where(mask, short - prior_short, 0),
+        np.where(mask, net - (prior_long - prior_short), 0)
+    ]
+
+    views = normalize(long, short, oi)
+    dominant = np.abs(net).argmax(axis=1)
+    dominant_net = np.take_along_axis(net, dominant[:, None], axis=1)[:, 0]
+
+    block = {
+        'market': np.full(n * k, name, dtype=object),
+        'report_date': np.repeat(np.asarray(dates, dtype='datetime64[D]'), k),
+        'trader': np.tile(np.array(TRADERS, dtype=object), n)
+    }
+    for c, col in enumerate(COLUMNS):
+        col = col.lower()
+        block[col] = (long, short, net)[c].ravel()
+        block[f'{col}_change'] = changes[c].ravel()
+        for view, suffix in (('shares', 'pct'), ('pct_oi', 'pct_oi'), ('pct_class', 'pct_class')):
+            block[f'{col}_{suffix}'] = views[view][:, :, c].ravel()
+    block['long_short_ratio'] = views['ratio'].ravel()
+    block['open_interest'] = np.repeat(oi, k)
+    block['open_interest_reported'] = np.repeat(reported, k)
+    block['dominant_class'] = np.repeat(np.array(TRADERS, dtype=object)[dominant], k)
+    block['dominant_net'] = np.repeat(dominant_net, k)
+    return block
+
+
+def _concat(blocks):
+    if len(blocks) == 1:
+        return blocks[0]
+    return {col: np.concatenate([b[col] for b in blocks]) for col in EXPORT_COLUMNS}
+
+
+def export_blocks(markets=None, start=None, end=None, catalog=None, history=None, block_rows=BLOCK_ROWS):
+    """Yield the export in column blocks of at most about ``block_rows`` reports
+
+    ``markets`` limits the export to those display names (all when None) and
+    ``start``/``end`` to report dates in that range, inclusive. Only one
+    block is held at a time, whatever the size of the export; a partitioned
+    catalog is read one partition at a time.
+    """
+    if history is not None:
+        # Every block comes from the same history version
+        history = history.pin()
+    if markets is None:
+        markets = list(catalog.options) if catalog is not None else []
+        if history is not None:
+            known = set(markets)
+            markets += [m for m in history.markets if m not in known]
+    start = None if start is None else np.datetime64(start, 'D')
+    end = None if end is None else np.datetime64(end, 'D')
+
+    pending, rows = [], 0
+    for name in markets:
+        dates, values = _market_rows(name, catalog, history)
+        lo = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+        for first in range(lo, hi, block_rows):
+            last = min(first + block_rows, hi)
+            previous = values[first - 1] if first > 0 else None
+            pending.append(derive_block(name, dates[first:last], values[first:last], previous))
+            rows += last - first
+            if rows >= block_rows:
+                yield _concat(pending)
+                pending, rows = [], 0
+    if pending:
+        yield _concat(pending)
+
+
+def iter_csv(blocks):
+    """Yield CSV text one block at a time, header first
+
+    Floats are rounded to six decimals and NaN is written as an empty field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    for block in blocks:
+        columns = []
+        for col in EXPORT_COLUMNS:
+            values = block[col]
+            if values.dtype.kind == 'M':
+                out = values.astype(str)
+            elif values.dtype.kind == 'f':
+                out = np.round(values, 6).astype(object)
+                out[np.isnan(values)] = ''
+            else:
+                out = values.astype(object)
+            columns.append(out)
+        writer.writerows(zip(*columns))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {'market': pa.string(), 'report_date': pa.date32(), 'trader': pa.string(),
+             'open_interest_reported': pa.bool_(), 'dominant_class': pa.string()}
+    return pa.schema([
+        (col, types.get(col, pa.float64() if 'pct' in col or col == 'long_short_ratio' else pa.int64()))
+        for col in EXPORT_COLUMNS
+    ])
+
+
+def write_parquet(blocks, sink):
+    """Write blocks to a Parquet file or stream, one row group per block; returns the rows written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    rows = 0
+    with pq.ParquetWriter(sink, schema) as writer:
+        for block in blocks:
+            table = pa.table({col: block[col] for col in EXPORT_COLUMNS}, schema=schema)
+            writer.write_table(table, row_group_size=len(table))
+            rows += len(table)
+    return rows
+
+
+def write_export(out, fmt='csv', **filters):
+    """Stream the export to a path or binary file; returns the rows written
+
+    ``filters`` are passed to ``export_blocks``.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if isinstance(out, (str, Path)):
+        with open(out, 'wb') as f:
+            return write_export(f, fmt, **filters)
+
+    rows = 0
+
+    def counted(blocks):
+        nonlocal rows
+        for block in blocks:
+            rows += len(block['market'])
+            yield block
+
+    blocks = counted(export_blocks(**filters))
+    if fmt == 'parquet':
+        return write_parquet(blocks, out)
+    for chunk in iter_csv(blocks):
+        out.write(chunk.encode())
+    return rows
+
+
+def export_bytes(fmt='csv', **filters):
+    """Return the whole export as bytes, for a download button"""
+    out = io.BytesIO()
+    write_export(out, fmt, **filters)
+    return out.getvalue()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from utils.history import get_history
+    from utils.partitions import load_catalog
+
+    parser = argparse.ArgumentParser(description="Export positions and metrics for every market and report date")
+    parser.add_argument('out', help="Output file (.csv or .parquet), or - for CSV on stdout")
+    parser.add_argument('--format', choices=sorted(FORMATS), help="Defaults to the output file's suffix")
+    parser.add_argument('--market', action='append', help="Only this market; repeat for several")
+    parser.add_argument('--start', help="First report date, YYYY-MM-DD")
+    parser.add_argument('--end', help="Last report date, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.out.endswith('.parquet') else 'csv')
+    filters = {'markets': args.market, 'start': args.start, 'end': args.end,
+               'catalog': load_catalog(), 'history': get_history()}
+    if args.out == '-':
+        rows = write_export(sys.stdout.buffer, fmt, **filters)
+    else:
+        rows = write_export(args.out, fmt, **filters)
+    print(f"Exported {rows} rows", file=sys.stderr)
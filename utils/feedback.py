@@ -1,28 +1,49 @@
 import streamlit as st
+import threading
 from datetime import datetime
-import streamlit.components.v1 as components
-import time
-import requests
-from streamlit_lottie import st_lottie
-import firebase_admin
-from firebase_admin import credentials, firestore
-from pathlib import Path
+from utils.assets import load_json
+from utils.feedback_writer import FeedbackWriter
+from utils.tracing import traced
+
+_writer = None
+_writer_lock = threading.Lock()
 
 # Initialize Firebase (will only initialize once)
 def init_firebase():
     """Initialize Firebase if not already initialized"""
+    # Imported here so the Firebase SDK only loads once feedback is first written
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     if not firebase_admin._apps:
         # Use service account from secrets
         cred = credentials.Certificate(st.secrets["firebase_service_account"])
         firebase_admin.initialize_app(cred)
     return firestore.client()
 
+def _prepare_feedback(doc):
+    """Convert a spooled feedback document into its Firestore form"""
+    from firebase_admin import firestore
+
+    return {
+        **doc,
+        'timestamp': datetime.fromisoformat(doc['timestamp']),
+        'created_at': firestore.SERVER_TIMESTAMP
+    }
+
+def get_feedback_writer():
+    """Return the process-wide background feedback writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = FeedbackWriter(init_firebase, collection='feedback', prepare=_prepare_feedback)
+    return _writer
+
+@traced('feedback.save')
 def save_feedback(email, feedback):
-    """Save feedback to Firestore"""
+    """Queue feedback for Firestore without waiting on the network"""
     try:
-        # Get Firestore client
-        db = init_firebase()
-        
         # Add timestamp
         timestamp = datetime.now()
         
@@ -30,12 +51,11 @@ def save_feedback(email, feedback):
         feedback_data = {
             'feedback': feedback.strip(),
             'email': email.strip() if email else '',
-            'timestamp': timestamp,
-            'created_at': firestore.SERVER_TIMESTAMP
+            'timestamp': timestamp.isoformat()
         }
         
-        # Add to 'feedback' collection
-        db.collection('feedback').add(feedback_data)
+        # Spool locally and hand off to the background writer
+        get_feedback_writer().submit(feedback_data)
         return True
         
     except Exception as e:
@@ -43,11 +63,8 @@ def save_feedback(email, feedback):
         return False
 
 def load_lottie_url(url: str):
-    """Load Lottie animation from URL"""
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+    """Load Lottie animation from URL, fetched once through the asset cache"""
+    return load_json(url)
 
 def show_feedback_form():
     """Show feedback form"""
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from utils.tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+# Local spool of feedback documents not yet confirmed by the backend
+SPOOL_PATH = Path(__file__).parent.parent.absolute() / 'data' / 'feedback_spool.jsonl'
+
+
+class FeedbackWriter:
+    """Write feedback documents to Firestore from a background thread
+
+    ``submit`` appends the document to an on-disk JSONL spool and queues it,
+    returning immediately. A worker thread drains the queue into batched
+    commits and appends an ack line to the spool for each committed document.
+    Anything left unacknowledged (backend down, process restarted) is replayed
+    from the spool on the next start. Spool ids double as Firestore document
+    ids, so a replay after a lost ack overwrites instead of duplicating.
+    """
+
+    def __init__(self, client_factory, collection='feedback', spool_path=SPOOL_PATH,
+                 max_queue=1000, batch_size=50, flush_interval=1.0, retry_delay=5.0,
+                 prepare=None):
+        self.client_factory = client_factory
+        self.collection = collection
+        self.spool_path = Path(spool_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.prepare = prepare or (lambda doc: doc)
+        self.committed = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._overflow = threading.Event()
+        self._queued_lock = threading.Lock()
+        self._queued = set()
+        self._client = None
+        self._thread = None
+
+    # Spool
+
+    def _append_spool(self, lines):
+        with self._spool_lock:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spool_path, 'a') as f:
+                for line in lines:
+                    f.write(json.dumps(line) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read_pending(self):
+        docs = {}
+        if not self.spool_path.exists():
+            return []
+        with open(self.spool_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-write
+                    continue
+                if 'ack' in entry:
+                    docs.pop(entry['ack'], None)
+                else:
+                    docs[entry['id']] = entry
+        return list(docs.values())
+
+    def pending(self):
+        """Return the spooled documents that have not been acknowledged, oldest first"""
+        with self._spool_lock:
+            return self._read_pending()
+
+    def _compact(self):
+        """Rewrite the spool with only unacknowledged entries and return them"""
+        with self._spool_lock:
+            entries = self._read_pending()
+            if not self.spool_path.exists():
+                return entries
+            tmp_path = self.spool_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(tmp_path, self.spool_path)
+        return entries
+
+    # Producer side
+
+    @traced('feedback.spool')
+    def submit(self, doc):
+        """Durably accept a feedback document and return its id without waiting on the backend"""
+        entry = {'id': uuid.uuid4().hex, 'doc': doc}
+        self._append_spool([entry])
+        self._enqueue(entry)
+        self.start()
+        return entry['id']
+
+    # Worker side
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        with self._spool_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Ask the worker to flush what it has and exit"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _enqueue(self, entry):
+        """Queue an entry unless it is already queued; False if the queue is full"""
+        with self._queued_lock:
+            if entry['id'] in self._queued:
+                return True
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                # Still safe in the spool, the worker replays it once it catches up
+                self._overflow.set()
+                return False
+            self._queued.add(entry['id'])
+            return True
+
+    def _replay(self):
+        """Queue every unacknowledged spool entry, compacting the spool first"""
+        for entry in self._compact():
+            if not self._enqueue(entry):
+                break
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or (self._stop.is_set() and self._queue.empty()):
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    @traced('feedback.commit')
+    def _commit(self, batch):
+        if self._client is None:
+            with span('feedback.client'):
+                self._client = self.client_factory()
+        collection = self._client.collection(self.collection)
+        write = self._client.batch()
+        for entry in batch:
+            write.set(collection.document(entry['id']), self.prepare(entry['doc']))
+        write.commit()
+
+    def _run(self):
+        self._replay()
+        batch = []
+        while True:
+            if not batch:
+                batch = self._next_batch()
+            if not batch:
+                if self._stop.is_set():
+                    return
+                if self._overflow.is_set() and self._queue.empty():
+                    self._overflow.clear()
+                    self._replay()
+                continue
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # Keep the batch and retry it, the spool still holds every document
+                logger.warning("Feedback commit failed, keeping %d documents spooled: %s", len(batch), e)
+                self._client = None
+                if self._stop.wait(self.retry_delay):
+                    return
+                continue
+
+            self.committed += len(batch)
+            self._append_spool([{'ack': entry['id']} for entry in batch])
+            with self._queued_lock:
+                self._queued.difference_update(entry['id'] for entry in batch)
+            batch = []
+            if self._queue.empty() and not self._overflow.is_set():
+                self._compact()
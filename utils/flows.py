@@ -0,0 +1,100 @@
+from functools import lru_cache
+
+import numpy as np
+
+from utils.positions import COLUMNS, TRADERS
+
+
+class FlowAnalytics:
+    """Week-over-week changes and flow attribution for every market
+
+    Built from the columnar arrays of a positions engine or snapshot in one
+    vectorized pass. Open interest is the reported ``open_interest_all``,
+    or the total long contracts across the three trader classes for reports
+    that lack it.
+
+    ``flows[i, a, b]`` is the net exposure trader class ``b`` absorbed from
+    class ``a`` in market ``i``: every class whose net position fell is a
+    seller, every class whose net position rose is a buyer, and each
+    seller's contracts are split across the buyers in proportion to how much
+    each one bought.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.has_previous = np.asarray(engine.has_previous)
+        net_change = np.asarray(engine.net_change)
+
+        # Open interest and its change
+        self.open_interest = np.asarray(engine.open_interest)
+        self.open_interest_change = np.asarray(engine.open_interest_change)
+        previous = self.open_interest - self.open_interest_change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.open_interest_pct = np.where(
+                self.has_previous & (previous != 0),
+                self.open_interest_change / previous * 100,
+                np.nan
+            )
+
+        # Sellers lost net exposure, buyers gained it
+        sold = np.maximum(-net_change, 0)
+        bought = np.maximum(net_change, 0)
+        volume = np.maximum(sold.sum(axis=1), bought.sum(axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = np.where(volume[:, None] > 0, bought / volume[:, None], 0.0)
+        self.flows = sold[:, :, None] * weights[:, None, :]
+        self.flow_volume = volume
+
+    def __len__(self):
+        return len(self.engine)
+
+    def changes(self, display_name):
+        """Return {trader: {'Long', 'Short', 'Net'}} contract changes for one market"""
+        i = self.engine.index[display_name]
+        engine = self.engine
+        return {
+            trader: {
+                'Long': int(engine.long_change[i, t]),
+                'Short': int(engine.short_change[i, t]),
+                'Net': int(engine.net_change[i, t])
+            }
+            for t, trader in enumerate(TRADERS)
+        }
+
+    def table(self, display_name):
+        """Return the per-trader change table for one market"""
+        import pandas as pd
+
+        i = self.engine.index[display_name]
+        engine = self.engine
+        values = np.stack([engine.long_change[i], engine.short_change[i], engine.net_change[i]], axis=1)
+        return pd.DataFrame(values, index=TRADERS, columns=COLUMNS)
+
+    def attribution(self, display_name, limit=None):
+        """Return (seller, buyer, contracts) transfers for one market, largest first"""
+        i = self.engine.index[display_name]
+        matrix = self.flows[i]
+        sellers, buyers = np.nonzero(matrix > 0)
+        order = np.argsort(-matrix[sellers, buyers], kind='stable')[:limit]
+        return [
+            (TRADERS[sellers[j]], TRADERS[buyers[j]], float(matrix[sellers[j], buyers[j]]))
+            for j in order
+        ]
+
+    def summary(self, display_name):
+        """Return open interest, its change and the transfers for one market"""
+        i = self.engine.index[display_name]
+        return {
+            'has_previous': bool(self.has_previous[i]),
+            'open_interest': int(self.open_interest[i]),
+            'open_interest_change': int(self.open_interest_change[i]),
+            'open_interest_pct': float(self.open_interest_pct[i]),
+            'flow_volume': int(self.flow_volume[i]),
+            'transfers': self.attribution(display_name)
+        }
+
+
+@lru_cache(maxsize=4)
+def flows_for(engine):
+    """Return the flow analytics for a positions engine, built once per engine"""
+    return FlowAnalytics(engine)
@@ -0,0 +1,333 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from utils.positions import OPEN_INTEREST, POSITION_FIELDS
+from utils.records import OPTIONAL_FIELDS, SchemaError, missing_fields
+
+# Default location of the weekly report history
+HISTORY_DIR = Path(__file__).parent.parent.absolute() / 'data' / 'history'
+
+DATE_COLUMN = 'report_date'
+OPEN_INTEREST_COLUMN = OPEN_INTEREST
+VALUE_COLUMNS = POSITION_FIELDS + [OPEN_INTEREST_COLUMN]
+COLUMNS = [DATE_COLUMN] + VALUE_COLUMNS
+
+# Number of superseded versions kept around for readers still mapping them
+KEEP_VERSIONS = 2
+
+
+def parse_report_date(value):
+    """Parse a Socrata report_date_as_yyyy_mm_dd value into a numpy day"""
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def _value(report, column):
+    value = report.get(column)
+    return OPTIONAL_FIELDS[column] if value is None else value
+
+
+def report_rows(markets, reports=('previous_report', 'latest_report')):
+    """Yield (display_name, report) pairs for the reports carried by market records"""
+    for m in markets:
+        for report in reports:
+            rep = m.get(report)
+            if rep and rep.get('report_date_as_yyyy_mm_dd'):
+                yield m['display_name'], rep
+
+
+class HistoryVersion:
+    """One published version of the history, mapped read-only
+
+    Every read on the same HistoryVersion sees the same rows, however many
+    versions are published meanwhile.
+    """
+
+    def __init__(self, version=None, manifest=None, columns=None):
+        self.version = version
+        self.manifest = manifest or {'markets': {}, 'rows': 0}
+        self.arrays = columns or {}
+
+    @property
+    def markets(self):
+        """Names of every market with stored history"""
+        return list(self.manifest['markets'])
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def pin(self):
+        return self
+
+    def _bounds(self, market, start=None, end=None):
+        """Return the [lo, hi) row range of a market, narrowed to a date range"""
+        span = self.manifest['markets'].get(market)
+        if span is None:
+            return 0, 0
+        lo, hi = span
+        dates = self.arrays[DATE_COLUMN][lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(dates, np.datetime64(start, 'D'), side='left'))
+        if end is not None:
+            hi = span[0] + int(np.searchsorted(dates, np.datetime64(end, 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def query(self, market, start=None, end=None, columns=None):
+        """Return read-only column views for one market between two dates (inclusive)
+
+        The arrays are slices of the memory-mapped files, so nothing is
+        copied until the caller does arithmetic on them.
+        """
+        lo, hi = self._bounds(market, start, end)
+        columns = columns or COLUMNS
+        return {col: self.arrays[col][lo:hi] for col in columns if col in self.arrays}
+
+    def columns(self):
+        """Return read-only views of every stored column, all markets"""
+        return dict(self.arrays)
+
+    def bounds(self):
+        """Return each market's [lo, hi) row range in the stored columns"""
+        return {market: tuple(span) for market, span in self.manifest['markets'].items()}
+
+    def dates(self, market):
+        """Return the sorted report dates stored for one market"""
+        return self.query(market, columns=[DATE_COLUMN]).get(DATE_COLUMN, np.empty(0, 'datetime64[D]'))
+
+    def first_dates(self):
+        """Return {market: earliest stored report date} for every market"""
+        dates = self.arrays.get(DATE_COLUMN)
+        return {market: dates[lo] for market, (lo, hi) in self.manifest['markets'].items() if hi > lo}
+
+    def latest_date(self, market=None):
+        """Return the newest stored report date, for one market or across all"""
+        names = [market] if market is not None else self.manifest['markets']
+        latest = None
+        for name in names:
+            dates = self.dates(name)
+            if len(dates) and (latest is None or dates[-1] > latest):
+                latest = dates[-1]
+        return latest
+
+    def frame(self, markets=None, start=None, end=None, columns=None):
+        """Return a long-format DataFrame slice across markets"""
+        import pandas as pd
+
+        markets = self.markets if markets is None else markets
+        columns = [c for c in (columns or COLUMNS) if c != DATE_COLUMN]
+        parts = []
+        for market in markets:
+            data = self.query(market, start, end, [DATE_COLUMN] + columns)
+            if not len(data.get(DATE_COLUMN, ())):
+                continue
+            part = pd.DataFrame({col: np.asarray(data[col]) for col in data})
+            part.insert(0, 'market', market)
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=['market', DATE_COLUMN] + columns)
+        return pd.concat(parts, ignore_index=True)
+
+
+class HistoryStore:
+    """Columnar, memory-mapped history of weekly reports for every market
+
+    Each version lives in its own directory with one ``.npy`` file per column
+    and a ``manifest.json``; a ``CURRENT`` file names the live version, so
+    writes never disturb readers that still map an older one. Rows are sorted
+    by market and then report date, and the manifest records each market's
+    row range, so a date range query is two binary searches on a mapped slice.
+
+    Each read goes to the live version. A caller making several reads that
+    must agree, e.g. listing markets and then querying each, takes one
+    version with ``pin`` and reads from that.
+    """
+
+    def __init__(self, path=HISTORY_DIR):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._current = HistoryVersion()
+
+    # Reading
+
+    def _current_version(self):
+        try:
+            return (self.path / 'CURRENT').read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        """Return the live version, mapping it only when CURRENT has moved
+
+        The mapped version is swapped in as one object, so a concurrent
+        reader sees either the old version or the new one, never a mix.
+        """
+        version = self._current_version()
+        current = self._current
+        if version == current.version:
+            return current
+        with self._lock:
+            while True:
+                current = self._current
+                if version == current.version:
+                    return current
+                try:
+                    self._current = self._map(version)
+                    return self._current
+                except FileNotFoundError:
+                    # Superseded and removed by a writer since CURRENT was read
+                    latest = self._current_version()
+                    if latest == version:
+                        raise
+                    version = latest
+
+    def _map(self, version):
+        vdir = self.path / version
+        manifest = json.loads((vdir / 'manifest.json').read_text())
+        columns = {
+            col: np.load(vdir / f'{col}.npy', mmap_mode='r')
+            for col in manifest['columns']
+        }
+        return HistoryVersion(version, manifest, columns)
+
+    def pin(self):
+        """Return the live version; reads on it are unaffected by later appends"""
+        return self._open()
+
+    @property
+    def version(self):
+        return self._open().version
+
+    @property
+    def markets(self):
+        """Names of every market with stored history"""
+        return self._open().markets
+
+    def __len__(self):
+        return len(self._open())
+
+    def query(self, market, start=None, end=None, columns=None):
+        """Return read-only column views for one market between two dates (see HistoryVersion.query)"""
+        return self._open().query(market, start, end, columns)
+
+    def columns(self):
+        return self._open().columns()
+
+    def bounds(self):
+        return self._open().bounds()
+
+    def dates(self, market):
+        return self._open().dates(market)
+
+    def first_dates(self):
+        return self._open().first_dates()
+
+    def latest_date(self, market=None):
+        return self._open().latest_date(market)
+
+    def frame(self, markets=None, start=None, end=None, columns=None):
+        return self._open().frame(markets, start, end, columns)
+
+    # Writing
+
+    def append(self, rows):
+        """Merge (display_name, report) rows into a new version and publish it
+
+        Rows for a (market, report date) pair that already exists replace the
+        stored values. Returns the number of rows in the new version. Raises
+        SchemaError, writing nothing, if a report lacks a position field.
+        """
+        current = self._open()
+        rows = list(rows)
+        errors = []
+        for market, rep in rows:
+            missing = missing_fields(rep)
+            if missing:
+                errors.append(f"{market} {rep.get('report_date_as_yyyy_mm_dd')}: missing {', '.join(missing)}")
+        if errors:
+            raise SchemaError(errors)
+        names = sorted(set(current.manifest['markets']) | {market for market, _ in rows})
+        codes = {name: i for i, name in enumerate(names)}
+
+        # Stored rows first, new rows after, so new values win on duplicates
+        old_codes = np.zeros(len(current), dtype=np.int64)
+        for market, (lo, hi) in current.manifest['markets'].items():
+            old_codes[lo:hi] = codes[market]
+        new_codes = np.array([codes[market] for market, _ in rows], dtype=np.int64)
+        new_dates = np.array(
+            [parse_report_date(rep['report_date_as_yyyy_mm_dd']) for _, rep in rows],
+            dtype='datetime64[D]'
+        )
+        new_values = np.array(
+            [[_value(rep, col) for col in VALUE_COLUMNS] for _, rep in rows], dtype=np.int64
+        ).reshape(len(rows), len(VALUE_COLUMNS))
+
+        all_codes = np.concatenate([old_codes, new_codes])
+        all_dates = np.concatenate([
+            np.asarray(current.arrays.get(DATE_COLUMN, np.empty(0, 'datetime64[D]'))), new_dates
+        ])
+        sequence = np.arange(len(all_codes))
+        order = np.lexsort((sequence, all_dates, all_codes))
+        all_codes, all_dates = all_codes[order], all_dates[order]
+
+        # Keep the last row of every (market, date) run
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = (all_codes[1:] != all_codes[:-1]) | (all_dates[1:] != all_dates[:-1])
+        all_codes, all_dates = all_codes[keep], all_dates[keep]
+
+        columns = {DATE_COLUMN: all_dates}
+        for j, col in enumerate(VALUE_COLUMNS):
+            # Versions written before a column existed read as zeros
+            old = np.asarray(current.arrays.get(col, np.zeros(len(current), dtype=np.int64)))
+            columns[col] = np.concatenate([old, new_values[:, j]])[order][keep]
+
+        bounds = np.searchsorted(all_codes, np.arange(len(names) + 1))
+        spans = {
+            name: [int(bounds[i]), int(bounds[i + 1])]
+            for i, name in enumerate(names) if bounds[i + 1] > bounds[i]
+        }
+
+        self._publish(columns, {'columns': COLUMNS, 'markets': spans, 'rows': int(keep.sum())})
+        return int(keep.sum())
+
+    def _publish(self, columns, manifest):
+        """Write a complete version directory, then switch CURRENT to it atomically"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        version = uuid.uuid4().hex[:12]
+        tmp_dir = self.path / f'.{version}.tmp'
+        tmp_dir.mkdir()
+        for col, values in columns.items():
+            np.save(tmp_dir / f'{col}.npy', values)
+        (tmp_dir / 'manifest.json').write_text(json.dumps(manifest))
+        os.replace(tmp_dir, self.path / version)
+
+        pointer = self.path / f'.CURRENT.{version}.tmp'
+        pointer.write_text(version)
+        os.replace(pointer, self.path / 'CURRENT')
+
+        history = self.path / 'VERSIONS'
+        versions = history.read_text().split() if history.exists() else []
+        versions.append(version)
+        for old in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(self.path / old, ignore_errors=True)
+        history.write_text('\n'.join(versions[-KEEP_VERSIONS:]))
+
+
+@lru_cache(maxsize=1)
+def get_history():
+    """Return the process-wide history store at the default location"""
+    return HistoryStore()
+
+
+if __name__ == '__main__':
+    # Seed the history store from the reports in the current dataset
+    from utils.dataset import load_dataset
+
+    store = HistoryStore()
+    rows = store.append(report_rows(load_dataset().markets))
+    print(f"History now holds {rows} rows across {len(store.markets)} markets")
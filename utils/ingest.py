@@ -0,0 +1,229 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.dataset import DATA_PATH, load_dataset
+from utils.history import HistoryStore
+from utils.partitions import load_partitioned, partition_dir_in_use, write_partitions
+from utils.positions import VALUE_FIELDS
+from utils.prices import PriceStore, sync_prices
+from utils.records import missing_fields
+from utils.snapshot import SNAPSHOT_DIR, build_snapshots
+
+logger = logging.getLogger(__name__)
+
+# CFTC public reporting Socrata host
+SOCRATA_URL = 'https://publicreporting.cftc.gov'
+
+# Socrata resource path of the CFTC legacy futures-only report
+SOCRATA_RESOURCE = '/resource/6dca-aqww.json'
+PAGE_SIZE = 1000
+
+REPORT_DATE = 'report_date_as_yyyy_mm_dd'
+REPORT_FIELDS = [REPORT_DATE] + VALUE_FIELDS
+
+
+def make_session(token=None, pool_size=8, retries=5, backoff=0.5):
+    """Create a pooled, keep-alive session that retries transient failures with backoff"""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if token:
+        session.headers['X-App-Token'] = token
+    return session
+
+
+def soql_quote(value):
+    """Quote a value as a SoQL string literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def report_query(market_names, since=None, page_size=PAGE_SIZE):
+    """Build the SoQL parameters selecting reports for markets newer than since"""
+    clauses = [f"market_and_exchange_names in ({', '.join(soql_quote(n) for n in market_names)})"]
+    if since:
+        clauses.append(f"{REPORT_DATE} > {soql_quote(since)}")
+    return {
+        '$select': ','.join(['market_and_exchange_names'] + REPORT_FIELDS),
+        '$where': ' AND '.join(clauses),
+        '$order': f'{REPORT_DATE} ASC, market_and_exchange_names ASC',
+        '$limit': page_size
+    }
+
+
+def fetch_reports(session, market_names, since=None, base_url=SOCRATA_URL, page_size=PAGE_SIZE, timeout=30):
+    """Yield report rows for the given markets newer than since, one page at a time"""
+    params = report_query(market_names, since, page_size)
+    offset = 0
+    while True:
+        response = session.get(
+            base_url + SOCRATA_RESOURCE,
+            params={**params, '$offset': offset},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        page = response.json()
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+def last_report_date(markets):
+    """Return the oldest latest_report date across markets, or None if any market has none
+
+    Using the oldest date means a market that missed a refresh is caught up
+    on the next one instead of leaving a gap.
+    """
+    dates = [(m.get('latest_report') or {}).get(REPORT_DATE) for m in markets]
+    if not dates or not all(dates):
+        return None
+    return min(dates)
+
+
+def parse_row(row):
+    """Return a fetched row as a report dict, or None if it lacks a date or a position
+
+    Follows the dataset schema: every position is required, open interest
+    may be left out.
+    """
+    missing = ([] if row.get(REPORT_DATE) else [REPORT_DATE]) + missing_fields(row)
+    if missing:
+        logger.warning("Skipping a %s report missing %s",
+                       row.get('market_and_exchange_names'), ', '.join(missing))
+        return None
+    return {field: str(row[field]) for field in REPORT_FIELDS if row.get(field) is not None}
+
+
+def merge_reports(markets, rows):
+    """Fold fetched rows into market records, shifting latest_report into previous_report
+
+    Returns the (display_name, report) pairs that were applied. A row
+    identical to the stored latest report is not applied again, and rows
+    missing a position are skipped.
+    """
+    by_name = {m['market_and_exchange_names']: m for m in markets}
+    applied = []
+    reports = []
+    for row in rows:
+        market = by_name.get(row.get('market_and_exchange_names'))
+        report = parse_row(row) if market is not None else None
+        if report is not None:
+            reports.append((market, report))
+    for market, report in sorted(reports, key=lambda pair: pair[1][REPORT_DATE]):
+        latest = market.get('latest_report')
+        if latest and latest.get(REPORT_DATE, '') > report[REPORT_DATE]:
+            continue
+        if latest and latest.get(REPORT_DATE) == report[REPORT_DATE]:
+            if latest == report:
+                continue
+            # Revised figures for the same week
+            market['latest_report'] = report
+        else:
+            market['previous_report'] = latest
+            market['latest_report'] = report
+        applied.append((market['display_name'], report))
+    return applied
+
+
+def write_dataset(markets, path=DATA_PATH):
+    """Write market records atomically so readers never see a partial file"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(markets, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def publish(markets, applied, path=DATA_PATH, history=None, snapshot_dir=SNAPSHOT_DIR,
+            prices=None, partition_dir=None):
+    """Write merged market records and everything derived from them
+
+    When reports were applied, the dataset file, the partitioned copy (with
+    a partition directory), the history store and the snapshots the app
+    and API read are all updated; otherwise none of them is touched. With a
+    price store, every instrument's candles are then fetched up to the last
+    closed day.
+    """
+    if applied:
+        write_dataset(markets, path)
+        if partition_dir is not None:
+            write_partitions(markets, partition_dir)
+        if history is not None:
+            history.append(applied)
+        if snapshot_dir is not None:
+            build_snapshots(load_dataset(path), snapshot_dir)
+            if partition_dir is not None:
+                build_snapshots(load_partitioned(partition_dir), snapshot_dir)
+
+    # Prices move daily, so they are brought up to date even without new reports
+    if prices is not None:
+        sync_prices(markets, prices, history)
+
+
+def refresh(path=DATA_PATH, base_url=SOCRATA_URL, token=None, history=None, session=None,
+            snapshot_dir=SNAPSHOT_DIR, prices=None, partition_dir=None):
+    """Pull reports newer than the stored ones and update the dataset file, history and snapshot
+
+    Returns the number of reports applied. Everything is written by
+    ``publish``: the dataset file is left untouched when nothing new was
+    published. With a partition directory, the partitioned copy is
+    rewritten too, and the snapshots of its partitions and of all of them
+    combined are built, so the first request after a refresh does not build
+    them.
+    """
+    path = Path(path)
+    markets = json.loads(path.read_text())
+    session = session or make_session(token)
+    names = [m['market_and_exchange_names'] for m in markets if m.get('market_and_exchange_names')]
+    if not names:
+        return 0
+
+    rows = fetch_reports(session, names, since=last_report_date(markets), base_url=base_url)
+    applied = merge_reports(markets, rows)
+    publish(markets, applied, path, history, snapshot_dir, prices, partition_dir)
+    return len(applied)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    parser = argparse.ArgumentParser(description="Fetch new CFTC Commitments of Traders reports")
+    parser.add_argument('--base-url', default=SOCRATA_URL, help="Socrata host to query")
+    parser.add_argument('--data', default=str(DATA_PATH), help="Dataset file to update")
+    parser.add_argument('--no-history', action='store_true', help="Skip updating the history store")
+    parser.add_argument('--no-prices', action='store_true', help="Skip updating the price cache")
+    args = parser.parse_args()
+
+    history = None if args.no_history else HistoryStore()
+    prices = None if args.no_prices else PriceStore()
+    count = refresh(args.data, args.base_url, os.getenv('SODAPY_TOKEN'), history,
+                    prices=prices, partition_dir=partition_dir_in_use())
+    print(f"Applied {count} new reports")
+
+
+if __name__ == '__main__':
+    main()
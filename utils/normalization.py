@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+
+# Normalized table views and their labels
+VIEWS = {
+    'shares': '% of all classes',
+    'pct_oi': '% of open interest',
+    'pct_class': '% of class',
+    'ratio': 'Long/short ratio'
+}
+
+
+def open_interest(reported, long):
+    """Return open interest as reported, or total long contracts where a report lacks it
+
+    Returns (open_interest, reported mask). ``long`` is (..., traders).
+    """
+    reported = np.asarray(reported)
+    mask = reported > 0
+    return np.where(mask, reported, np.asarray(long).sum(axis=-1)), mask
+
+
+def normalize(long, short, oi):
+    """Compute every normalized view of (..., traders) long and short positions
+
+    - ``pct_oi``: long, short and net of each class as a percent of open interest
+    - ``pct_class``: long, short and net as a percent of the class's own
+      gross position (long + short)
+    - ``ratio``: long / short of each class
+    - ``shares``: each column as a percent of the summed absolute values of
+      all classes, the dashboard's original normalization
+
+    The percent views are (..., traders, Long/Short/Net); ratio is
+    (..., traders). Divisions by zero give NaN.
+    """
+    long = np.asarray(long, dtype=np.float64)
+    short = np.asarray(short, dtype=np.float64)
+    stacked = np.stack([long, short, long - short], axis=-1)
+    oi = np.asarray(oi, dtype=np.float64)[..., None, None]
+    gross = (long + short)[..., None]
+    totals = np.abs(stacked).sum(axis=-2, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'pct_oi': np.where(oi > 0, stacked / oi * 100, np.nan),
+            'pct_class': np.where(gross > 0, stacked / gross * 100, np.nan),
+            'ratio': np.where(short > 0, long / short, np.nan),
+            'shares': stacked / totals * 100
+        }
+
+
+class NormalizedHistory:
+    """Normalized views of every stored report, computed in one pass over a history version"""
+
+    def __init__(self, history):
+        from utils.history import DATE_COLUMN, OPEN_INTEREST_COLUMN
+        from utils.positions import LONG_FIELDS, SHORT_FIELDS
+
+        # Columns and row bounds must come from the same version
+        history = history.pin()
+        self.version = history.version
+        columns = history.columns()
+        rows = len(history)
+        long = np.stack([np.asarray(columns.get(f, np.zeros(rows, np.int64))) for f in LONG_FIELDS], axis=-1)
+        short = np.stack([np.asarray(columns.get(f, np.zeros(rows, np.int64))) for f in SHORT_FIELDS], axis=-1)
+        reported = columns.get(OPEN_INTEREST_COLUMN, np.zeros(rows, np.int64))
+        self.dates = columns.get(DATE_COLUMN, np.empty(0, 'datetime64[D]'))
+        self.open_interest, self.oi_reported = open_interest(reported, long)
+        self.views = normalize(long, short, self.open_interest)
+        self.bounds = history.bounds()
+
+    def query(self, market, view='pct_oi'):
+        """Return (report dates, view values) for one market, oldest first"""
+        lo, hi = self.bounds.get(market, (0, 0))
+        return self.dates[lo:hi], self.views[view][lo:hi]
+
+
+_normalized = {}
+_normalized_lock = threading.Lock()
+
+
+def normalized_history_for(history):
+    """Return the normalized views of a history store, rebuilt only when its version changes"""
+    pinned = history.pin()
+    cached = _normalized.get(id(history))
+    if cached is None or cached.version != pinned.version:
+        with _normalized_lock:
+            cached = _normalized.get(id(history))
+            if cached is None or cached.version != pinned.version:
+                cached = _normalized[id(history)] = NormalizedHistory(pinned)
+    return cached
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from utils.dataset import DATA_PATH, Dataset, load_dataset, parse_markets
+from utils.tracing import span
+
+# Default location of the partitioned dataset, overridable with COT_PARTITION_PATH
+PARTITION_DIR = Path(
+    os.getenv('COT_PARTITION_PATH') or Path(__file__).parent.parent.absolute() / 'data' / 'partitions'
+)
+
+# Parsed partitions kept in memory at once, shared by every session
+MAX_PARTITIONS = 8
+
+# Market fields copied into the manifest, enough to list and search markets
+CATALOG_FIELDS = ('display_name', 'instrument_name', 'market_and_exchange_names',
+                  'asset_type', 'exchange', 'searchable_terms')
+
+
+def _slug(value):
+    return re.sub(r'[^a-z0-9]+', '-', str(value or 'other').lower()).strip('-') or 'other'
+
+
+def partition_name(market):
+    """Return the ``<asset_type>/<exchange>`` partition a market belongs to"""
+    return f"{_slug(market.get('asset_type'))}/{_slug(market.get('exchange'))}"
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_partitions(markets, path=PARTITION_DIR):
+    """Split market records into one JSON file per partition plus a manifest
+
+    Partition files are named by their content hash and never rewritten,
+    so a partition whose markets did not change keeps its file, its parsed
+    copy and its snapshot across refreshes. The manifest is replaced last;
+    files referenced by neither it nor the previous manifest are removed.
+    Returns the new manifest.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    groups = OrderedDict()
+    for market in markets:
+        record = market.to_dict() if hasattr(market, 'to_dict') else market
+        groups.setdefault(partition_name(record), []).append(record)
+
+    partitions = {}
+    catalog = []
+    for name, records in sorted(groups.items()):
+        raw = json.dumps(records, indent=2).encode()
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        file = f'{name}.{version}.json'
+        target = path / file
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(target, raw)
+        partitions[name] = {'file': file, 'version': version, 'markets': len(records)}
+        catalog.extend(
+            {**{f: r[f] for f in CATALOG_FIELDS if r.get(f) is not None}, 'partition': name}
+            for r in records
+        )
+
+    manifest_path = path / 'manifest.json'
+    try:
+        previous = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        previous = {'partitions': {}}
+    version = hashlib.sha256(
+        json.dumps([(n, p['version']) for n, p in sorted(partitions.items())]).encode()
+    ).hexdigest()[:16]
+    manifest = {'version': version, 'partitions': partitions, 'markets': catalog}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+
+    keep = {p['file'] for p in partitions.values()} | {p['file'] for p in previous['partitions'].values()}
+    for old in path.glob('*/*.json'):
+        if old.relative_to(path).as_posix() not in keep:
+            old.unlink(missing_ok=True)
+    return manifest
+
+
+_partitions = OrderedDict()
+_partitions_lock = threading.Lock()
+
+
+class PartitionedDataset:
+    """Markets listed from a manifest, their records loaded one partition at a time
+
+    Exposes ``version``, ``options``, ``index`` and catalog-level ``markets``
+    (names, tickers, asset type, exchange: enough to list and search) without
+    opening a partition. ``dataset_for`` returns the Dataset of the partition
+    holding a market, parsed on first access and kept in a process-wide LRU
+    of ``MAX_PARTITIONS`` partitions.
+    """
+
+    def __init__(self, manifest, path=PARTITION_DIR):
+        self.path = Path(path)
+        self.version = manifest['version']
+        self.partitions = manifest['partitions']
+        self.markets = manifest['markets']
+        self.options = [m['display_name'] for m in self.markets]
+        self.index = {name: i for i, name in enumerate(self.options)}
+        self._combined = None
+
+    def partition_of(self, display_name):
+        return self.markets[self.index[display_name]]['partition']
+
+    def partition(self, name):
+        """Return the Dataset of one partition, parsing it only on first access"""
+        entry = self.partitions[name]
+        key = (self.path, name, entry['version'])
+        with _partitions_lock:
+            dataset = _partitions.get(key)
+            if dataset is not None:
+                _partitions.move_to_end(key)
+                return dataset
+        with span('dataset.partition'):
+            markets, positions, present = parse_markets((self.path / entry['file']).read_bytes())
+            dataset = Dataset(markets, entry['version'], positions, present, partition=name)
+        with _partitions_lock:
+            dataset = _partitions.setdefault(key, dataset)
+            while len(_partitions) > MAX_PARTITIONS:
+                _partitions.popitem(last=False)
+        return dataset
+
+    def dataset_for(self, display_name):
+        """Return the partition Dataset holding a market"""
+        return self.partition(self.partition_of(display_name))
+
+    def get(self, display_name):
+        """Return the full market record for a display name, falling back to the first market"""
+        if display_name not in self.index:
+            display_name = self.options[0]
+        return self.dataset_for(display_name).get(display_name)
+
+    def combined(self):
+        """Return every partition merged into one Dataset, for cross-market views
+
+        Built once per manifest version; this loads every partition.
+        """
+        if self._combined is None:
+            parts = [self.partition(name) for name in self.partitions]
+            if not parts:
+                self._combined = Dataset([], self.version)
+            else:
+                self._combined = Dataset(
+                    [m for part in parts for m in part.markets], self.version,
+                    np.concatenate([part.positions for part in parts]),
+                    np.concatenate([part.present for part in parts])
+                )
+        return self._combined
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def load_partitioned(path=PARTITION_DIR):
+    """Load the manifest of a partitioned dataset, re-reading only when it changes"""
+    path = Path(path)
+    stat = os.stat(path / 'manifest.json')
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    cached = _manifests.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+    with _manifests_lock:
+        cached = _manifests.get(path)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+        manifest = json.loads((path / 'manifest.json').read_text())
+        if cached is not None and cached[1].version == manifest['version']:
+            dataset = cached[1]
+        else:
+            dataset = PartitionedDataset(manifest, path)
+        _manifests[path] = (stat_key, dataset)
+        return dataset
+
+
+def partition_dir_in_use(path=PARTITION_DIR):
+    """Return the partition directory if a partitioned copy has been written there, else None
+
+    Ingest keeps the partitioned copy in step only once one exists.
+    """
+    return Path(path) if (Path(path) / 'manifest.json').exists() else None
+
+
+def load_catalog(partition_path=PARTITION_DIR, data_path=DATA_PATH):
+    """Return the partitioned dataset when one has been written, else the single-file dataset
+
+    Both answer ``options``, ``index``, ``version``, ``dataset_for`` and
+    ``combined``, so callers need not know which one they have.
+    """
+    if (Path(partition_path) / 'manifest.json').exists():
+        return load_partitioned(partition_path)
+    return load_dataset(data_path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Split the dataset file into asset_type/exchange partitions")
+    parser.add_argument('--data', default=str(DATA_PATH), help="Dataset file to split")
+    parser.add_argument('--path', default=str(PARTITION_DIR), help="Directory to write the partitions to")
+    args = parser.parse_args()
+
+    manifest = write_partitions(json.loads(Path(args.data).read_text()), args.path)
+    for name, entry in manifest['partitions'].items():
+        print(f"{name}: {entry['markets']} markets")
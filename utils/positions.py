@@ -0,0 +1,157 @@
+from functools import lru_cache
+
+import numpy as np
+
+from utils.normalization import VIEWS, normalize, open_interest
+
+# Trader classes in display order, with their CFTC legacy field prefix
+TRADERS = ['Commercial', 'Non-Commercial', 'Retail']
+TRADER_PREFIXES = ['comm', 'noncomm', 'nonrept']
+COLUMNS = ['Long', 'Short', 'Net']
+
+LONG_FIELDS = [f'{p}_positions_long_all' for p in TRADER_PREFIXES]
+SHORT_FIELDS = [f'{p}_positions_short_all' for p in TRADER_PREFIXES]
+POSITION_FIELDS = LONG_FIELDS + SHORT_FIELDS
+OPEN_INTEREST = 'open_interest_all'
+
+# Every numeric field of a report, as stored in the parsed matrices
+VALUE_FIELDS = POSITION_FIELDS + [OPEN_INTEREST]
+
+
+def _report_matrix(markets, report):
+    """Parse one report of every market into an int64 (market, field) matrix"""
+    rows = []
+    present = []
+    for m in markets:
+        rep = m.get(report) or {}
+        present.append(bool(rep))
+        rows.append([rep.get(f, 0) for f in VALUE_FIELDS])
+    matrix = np.array(rows, dtype=np.int64).reshape(len(markets), len(VALUE_FIELDS))
+    return matrix, np.array(present, dtype=bool)
+
+
+class PositionsView:
+    """Per-market accessors over columnar position arrays
+
+    Subclasses provide ``names``, ``index``, the (market, trader) arrays
+    ``long``, ``short``, ``net``, ``long_change``, ``short_change``,
+    ``net_change`` and ``ratio``, the (market, trader, column) views
+    ``shares``, ``pct_oi`` and ``pct_class``, and the per-market
+    ``dominant``, ``dominant_net``, ``open_interest``,
+    ``open_interest_change`` and ``oi_reported``.
+    """
+
+    def __len__(self):
+        return len(self.names)
+
+    def positions(self, display_name):
+        """Return the long/short/net dict for one market"""
+        i = self.index[display_name]
+        return {
+            trader: {
+                'Long': int(self.long[i, t]),
+                'Short': int(self.short[i, t]),
+                'Net': int(self.net[i, t])
+            }
+            for t, trader in enumerate(TRADERS)
+        }
+
+    def metrics(self, display_name):
+        """Return the key metrics for one market"""
+        i = self.index[display_name]
+        net_position = float(self.dominant_net[i])
+        formatted_net = f"+{net_position:,.2f}" if net_position > 0 else f"{net_position:,.2f}"
+        return {
+            'dominant_trader': f"{TRADERS[self.dominant[i]]} ({formatted_net})"
+        }
+
+    def table(self, display_name, absolute=True, view='shares'):
+        """Return the positions table for one market, raw or in one of the normalized VIEWS"""
+        import pandas as pd
+
+        i = self.index[display_name]
+        if absolute:
+            values = np.stack([self.long[i], self.short[i], self.net[i]], axis=1)
+        elif view == 'ratio':
+            return pd.DataFrame({'Long/Short': self.ratio[i]}, index=TRADERS)
+        elif view in VIEWS:
+            values = getattr(self, view)[i]
+        else:
+            raise ValueError(f"Unknown normalized view: {view}")
+        return pd.DataFrame(values, index=TRADERS, columns=COLUMNS)
+
+
+class PositionsEngine(PositionsView):
+    """Columnar positions for every market, derived in one vectorized pass
+
+    Arrays are indexed (market, trader) in the order of ``names`` and
+    ``TRADERS``. Both ``latest_report`` and ``previous_report`` are parsed
+    once; nothing here touches the per-market dicts after construction.
+    ``reports`` takes the (positions, present) matrices of a validated
+    dataset instead, so nothing is parsed at all.
+    """
+
+    def __init__(self, markets, reports=None):
+        self.names = [m['display_name'] for m in markets]
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        if reports is None:
+            latest, _ = _report_matrix(markets, 'latest_report')
+            previous, self.has_previous = _report_matrix(markets, 'previous_report')
+        else:
+            positions, present = reports
+            latest, previous, self.has_previous = positions[:, 0], positions[:, 1], present[:, 1]
+        k = len(TRADERS)
+
+        self.long = latest[:, :k]
+        self.short = latest[:, k:2 * k]
+        self.net = self.long - self.short
+
+        self.prev_long = previous[:, :k]
+        self.prev_short = previous[:, k:2 * k]
+        self.prev_net = self.prev_long - self.prev_short
+
+        # Week-over-week changes, zero where no previous report exists
+        mask = self.has_previous[:, None]
+        self.long_change = np.where(mask, self.long - self.prev_long, 0)
+        self.short_change = np.where(mask, self.short - self.prev_short, 0)
+        self.net_change = np.where(mask, self.net - self.prev_net, 0)
+
+        # Dominant trader is the class with the largest absolute net position
+        self.dominant = np.abs(self.net).argmax(axis=1)
+        self.dominant_net = np.take_along_axis(self.net, self.dominant[:, None], axis=1)[:, 0]
+
+        # Open interest as reported, estimated from total longs where missing
+        self.open_interest, self.oi_reported = open_interest(latest[:, 2 * k], self.long)
+        prev_open_interest, _ = open_interest(previous[:, 2 * k], self.prev_long)
+        self.open_interest_change = np.where(self.has_previous, self.open_interest - prev_open_interest, 0)
+
+        # Every normalized view, so switching views is a lookup
+        views = normalize(self.long, self.short, self.open_interest)
+        self.shares = views['shares']
+        self.pct_oi = views['pct_oi']
+        self.pct_class = views['pct_class']
+        self.ratio = views['ratio']
+
+
+@lru_cache(maxsize=1024)
+def _report_engine(values):
+    positions = np.zeros((1, 2, len(VALUE_FIELDS)), dtype=np.int64)
+    positions[0, 0, :len(values)] = values
+    return PositionsEngine([{'display_name': None}], (positions, np.array([[True, False]])))
+
+
+def record_engine(market_data):
+    """Return a one-market engine computed from a record's own latest report
+
+    Engines are cached by the report's position values, so calling this
+    again for the same figures costs only reading them.
+    """
+    latest = market_data['latest_report']
+    return _report_engine(tuple(int(latest[f]) for f in POSITION_FIELDS))
+
+
+@lru_cache(maxsize=4)
+def positions_for(dataset):
+    """Return the positions engine for a dataset, built once per dataset version"""
+    return PositionsEngine(dataset.markets, (dataset.positions, dataset.present))
@@ -0,0 +1,268 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+# Default location of the cached candles, one directory per instrument
+PRICE_DIR = Path(__file__).parent.parent.absolute() / 'data' / 'prices'
+
+# Candle sources by the exchange named in the market records
+EXCHANGE_URLS = {'binance': 'https://api.binance.com'}
+
+# Binance spot candlestick endpoint
+KLINES_RESOURCE = '/api/v3/klines'
+DAY_MS = 86_400_000
+
+INTERVAL = '1d'
+KLINES_LIMIT = 1000
+
+# Report dates further than this past the last candle get no price
+MAX_STALENESS_MS = 7 * DAY_MS
+
+CANDLE_DTYPE = np.dtype([
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+])
+
+
+def instrument_key(market):
+    """Return the (exchange, instrument) a market's price comes from, or None"""
+    exchange, instrument = market.get('exchange'), market.get('instrument_name')
+    if not exchange or not instrument:
+        return None
+    return exchange.lower(), instrument.upper()
+
+
+def _to_ms(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype('datetime64[ms]').astype(np.int64)
+
+
+def fetch_klines(session, base_url, symbol, start, end, timeout=30):
+    """Fetch the daily candles opening between start and end (ms, inclusive), page by page"""
+    pages = []
+    while start <= end:
+        r = session.get(
+            base_url + KLINES_RESOURCE,
+            params={'symbol': symbol, 'interval': INTERVAL, 'startTime': start,
+                    'endTime': end, 'limit': KLINES_LIMIT},
+            timeout=timeout
+        )
+        r.raise_for_status()
+        rows = r.json()
+        if not rows:
+            break
+        page = np.zeros(len(rows), dtype=CANDLE_DTYPE)
+        page['open_time'] = [row[0] for row in rows]
+        for j, field in enumerate(CANDLE_DTYPE.names[1:], start=1):
+            page[field] = np.array([row[j] for row in rows], dtype=str).astype(np.float64)
+        pages.append(page)
+        if len(rows) < KLINES_LIMIT:
+            break
+        start = int(page['open_time'][-1]) + DAY_MS
+    return np.concatenate(pages) if pages else np.zeros(0, dtype=CANDLE_DTYPE)
+
+
+class PriceStore:
+    """Append-only, memory-mapped daily candles keyed by (exchange, instrument)
+
+    Each instrument keeps a ``candles.bin`` of ``CANDLE_DTYPE`` records sorted
+    by open time and a ``coverage.json`` with the [start, end] range already
+    fetched, so asking for a range again only fetches what is missing. New
+    days are appended in place; backfilling before the first stored day
+    rewrites the file and swaps it in, leaving readers on their old mapping.
+    Only closed candles are stored. Markets that trade the same instrument
+    share one series.
+    """
+
+    def __init__(self, path=PRICE_DIR, urls=None, session=None):
+        self.path = Path(path)
+        self.urls = EXCHANGE_URLS if urls is None else urls
+        self.session = session
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, key):
+        return self.path / f'{key[0]}-{key[1]}'
+
+    def candles(self, key):
+        """Return the stored candles of an instrument as a read-only mapped array"""
+        path = self._dir(key) / 'candles.bin'
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return np.zeros(0, dtype=CANDLE_DTYPE)
+        # Appends grow the file in place; a backfill swaps in a new inode
+        state = (stat.st_size, stat.st_ino)
+        cached = self._series.get(key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        # A torn final record from an interrupted append is ignored
+        rows = stat.st_size // CANDLE_DTYPE.itemsize
+        series = np.memmap(path, dtype=CANDLE_DTYPE, mode='r', shape=(rows,)) if rows else np.zeros(0, CANDLE_DTYPE)
+        self._series[key] = (state, series)
+        return series
+
+    def coverage(self, key):
+        """Return the fetched [start, end] open-time range of an instrument, or None"""
+        try:
+            data = json.loads((self._dir(key) / 'coverage.json').read_text())
+        except (OSError, ValueError):
+            return None
+        return data['start'], data['end']
+
+    def _write_coverage(self, key, start, end):
+        path = self._dir(key) / 'coverage.json'
+        tmp_path = path.with_name('.coverage.json.tmp')
+        tmp_path.write_text(json.dumps({'start': start, 'end': end}))
+        os.replace(tmp_path, path)
+
+    def _append(self, key, candles):
+        stored = self.candles(key)
+        if len(stored):
+            candles = candles[candles['open_time'] > stored['open_time'][-1]]
+        if len(candles):
+            with open(self._dir(key) / 'candles.bin', 'ab') as f:
+                f.write(candles.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _rewrite(self, key, candles):
+        merged = np.concatenate([candles, np.asarray(self.candles(key))])
+        _, first = np.unique(merged['open_time'], return_index=True)
+        path = self._dir(key) / 'candles.bin'
+        tmp_path = path.with_name('.candles.bin.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(merged[first].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def ensure(self, key, start, end=None, now=None):
+        """Fetch whatever part of [start, end] (dates) is not stored yet; returns the candles added"""
+        if self.session is None:
+            from utils.ingest import make_session
+
+            self.session = make_session()
+        exchange, symbol = key
+        base_url = self.urls[exchange]
+        now = int(time.time() * 1000) if now is None else now
+        # The newest candle still open at ``now`` is left for a later run
+        last_closed = (now // DAY_MS - 1) * DAY_MS
+        start = int(_to_ms(start))
+        end = last_closed if end is None else min(int(_to_ms(end)), last_closed)
+        if start > end:
+            return 0
+
+        with self._lock:
+            self._dir(key).mkdir(parents=True, exist_ok=True)
+            before = len(self.candles(key))
+            covered = self.coverage(key)
+            if covered is None:
+                self._append(key, fetch_klines(self.session, base_url, symbol, start, end))
+                covered = (start, end)
+            if start < covered[0]:
+                self._rewrite(key, fetch_klines(self.session, base_url, symbol, start, covered[0] - DAY_MS))
+            if end > covered[1]:
+                self._append(key, fetch_klines(self.session, base_url, symbol, covered[1] + DAY_MS, end))
+            self._write_coverage(key, min(start, covered[0]), max(end, covered[1]))
+            return len(self.candles(key)) - before
+
+    def asof(self, key, dates, field='close'):
+        """Return the last candle's field at or before each date, NaN where none is close enough
+
+        One binary search over the mapped open times covers every date.
+        """
+        targets = _to_ms(dates)
+        candles = self.candles(key)
+        if not len(candles) or not targets.size:
+            return np.full(targets.shape, np.nan)
+        times = candles['open_time']
+        idx = np.searchsorted(times, targets, side='right') - 1
+        found = idx >= 0
+        idx = np.maximum(idx, 0)
+        fresh = found & (targets - times[idx] <= MAX_STALENESS_MS)
+        return np.where(fresh, np.asarray(candles[field])[idx], np.nan)
+
+
+def _report_dates(market):
+    dates = []
+    for key in ('latest_report', 'previous_report'):
+        report = market.get(key)
+        dates.append(report['report_date_as_yyyy_mm_dd'][:10] if report else 'NaT')
+    return dates
+
+
+def report_prices(markets, store, field='close'):
+    """Join each market's latest and previous report dates to its instrument's price
+
+    Returns an (n, 2) float array in ``(latest, previous)`` order, NaN where a
+    market has no instrument, report or cached candle. Each instrument is
+    read once for all the markets that share it.
+    """
+    dates = np.array([_report_dates(m) for m in markets], dtype='datetime64[D]').reshape(len(markets), 2)
+    prices = np.full(dates.shape, np.nan)
+    groups = {}
+    for i, market in enumerate(markets):
+        key = instrument_key(market)
+        if key is not None:
+            groups.setdefault(key, []).append(i)
+    for key, rows in groups.items():
+        block = dates[rows]
+        valid = ~np.isnat(block)
+        values = np.full(block.shape, np.nan)
+        values[valid] = store.asof(key, block[valid], field)
+        prices[rows] = values
+    return prices
+
+
+def sync_prices(markets, store, history=None):
+    """Fetch missing candles for every instrument the markets trade, once per instrument
+
+    Each series is extended back to the earliest report date of its
+    markets, in the dataset or the history store, and forward to the last
+    closed day. Returns {key: candles added}; exchanges without a source are
+    skipped.
+    """
+    # One read of the history for every market
+    first = history.first_dates() if history is not None else {}
+    earliest = {}
+    for market in markets:
+        key = instrument_key(market)
+        if key is None or key[0] not in store.urls:
+            continue
+        dates = [d for d in _report_dates(market) if d != 'NaT']
+        if market['display_name'] in first:
+            dates.append(str(first[market['display_name']]))
+        if dates:
+            earliest[key] = min([earliest.get(key, dates[0])] + dates)
+    return {key: store.ensure(key, start) for key, start in sorted(earliest.items())}
+
+
+@lru_cache(maxsize=1)
+def get_price_store():
+    """Return the process-wide price store at the default location"""
+    return PriceStore()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.dataset import load_dataset
+    from utils.history import get_history
+
+    parser = argparse.ArgumentParser(description="Fill the local price cache for every tracked instrument")
+    parser.add_argument('--base-url', help="Candle source to use instead of the exchange's own API")
+    args = parser.parse_args()
+
+    urls = {exchange: args.base_url for exchange in EXCHANGE_URLS} if args.base_url else None
+    added = sync_prices(load_dataset().markets, PriceStore(urls=urls), get_history())
+    for (exchange, symbol), count in added.items():
+        print(f"{exchange} {symbol}: {count} new candles")
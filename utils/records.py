@@ -0,0 +1,221 @@
+import numpy as np
+
+from utils.positions import OPEN_INTEREST, POSITION_FIELDS, VALUE_FIELDS
+
+REPORT_DATE = 'report_date_as_yyyy_mm_dd'
+REPORTS = ('latest_report', 'previous_report')
+
+_FIELD_INDEX = {field: j for j, field in enumerate(VALUE_FIELDS)}
+
+# Report fields that may be left out, with the value stored instead. Open
+# interest is missing from older records; 0 means "not reported" and is
+# estimated from total longs. Every position field is required.
+OPTIONAL_FIELDS = {OPEN_INTEREST: 0}
+
+# Errors listed in one SchemaError before the rest are summarized
+MAX_ERRORS = 10
+
+
+class SchemaError(ValueError):
+    """Raised at load time when market records do not match the dataset schema"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        shown = '\n'.join(f"  {e}" for e in errors[:MAX_ERRORS])
+        more = f"\n  ... and {len(errors) - MAX_ERRORS} more" if len(errors) > MAX_ERRORS else ''
+        super().__init__(f"Invalid market data ({len(errors)} problems):\n{shown}{more}")
+
+
+def missing_fields(report):
+    """Return the required position fields a raw report leaves out or sets to null
+
+    Socrata drops null fields from its rows, so a missing field must not be
+    read as 0.
+    """
+    return [field for field in POSITION_FIELDS if report.get(field) is None]
+
+
+class Report:
+    """One weekly report with integer positions
+
+    ``values`` is a row view of the dataset's position matrix, in
+    ``VALUE_FIELDS`` order; an open interest of 0 means it was not
+    reported. Item access mirrors the JSON dict, so code written against raw
+    records keeps working.
+    """
+
+    __slots__ = ('report_date', 'values')
+
+    def __init__(self, report_date, values):
+        self.report_date = report_date
+        self.values = values
+
+    def __getitem__(self, field):
+        if field == REPORT_DATE:
+            return self.report_date
+        return int(self.values[_FIELD_INDEX[field]])
+
+    def get(self, field, default=None):
+        if field == REPORT_DATE:
+            return self.report_date
+        j = _FIELD_INDEX.get(field)
+        return default if j is None else int(self.values[j])
+
+    def __bool__(self):
+        return True
+
+    def to_dict(self):
+        """Return the report in the JSON schema, positions as strings"""
+        data = {REPORT_DATE: self.report_date}
+        for field, value in zip(VALUE_FIELDS, self.values):
+            if field != OPEN_INTEREST or value:
+                data[field] = str(int(value))
+        return data
+
+
+class Market:
+    """A validated market record; attribute or dict-style reads"""
+
+    __slots__ = (
+        'display_name', 'instrument_name', 'market_and_exchange_names', 'asset_type',
+        'exchange', 'searchable_terms', 'latest_report', 'previous_report'
+    )
+
+    def __init__(self, display_name, instrument_name=None, market_and_exchange_names=None,
+                 asset_type=None, exchange=None, searchable_terms=None,
+                 latest_report=None, previous_report=None):
+        self.display_name = display_name
+        self.instrument_name = instrument_name
+        self.market_and_exchange_names = market_and_exchange_names
+        self.asset_type = asset_type
+        self.exchange = exchange
+        self.searchable_terms = searchable_terms or []
+        self.latest_report = latest_report
+        self.previous_report = previous_report
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __contains__(self, field):
+        return getattr(self, field, None) is not None
+
+    def __repr__(self):
+        return f"Market({self.display_name!r})"
+
+    def to_dict(self):
+        """Return the record in the JSON schema"""
+        data = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if field in REPORTS:
+                value = value.to_dict() if value is not None else None
+            if value is not None:
+                data[field] = value
+        return data
+
+
+def _parse_int(value):
+    """Parse a position count given as an int or a string of digits"""
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(str(value).strip())
+
+
+def build_records(raw_markets):
+    """Validate raw market dicts once and return (markets, positions, present)
+
+    ``positions`` is an int64 (market, report, field) matrix with the
+    latest and previous reports in ``REPORTS`` order, and ``present`` marks
+    which reports exist. Every Report holds a view into ``positions``.
+    Raises SchemaError listing every malformed market.
+    """
+    n = len(raw_markets)
+    positions = np.zeros((n, len(REPORTS), len(VALUE_FIELDS)), dtype=np.int64)
+    present = np.zeros((n, len(REPORTS)), dtype=bool)
+    markets = []
+    errors = []
+    seen = set()
+    values = []
+    slots = []
+
+    def where(i):
+        return f"market {i} ({raw_markets[i]['display_name']!r})"
+
+    for i, raw in enumerate(raw_markets):
+        name = raw['display_name']
+        if not isinstance(name, str) or not name.strip():
+            errors.append(f"market {i}: display_name must be a non-empty string")
+            continue
+        if name in seen:
+            errors.append(f"{where(i)}: duplicate display_name")
+        seen.add(name)
+
+        terms = raw.get('searchable_terms') or []
+        if not isinstance(terms, list) or not all(isinstance(t, str) for t in terms):
+            errors.append(f"{where(i)}: searchable_terms must be a list of strings")
+            terms = []
+
+        reports = {}
+        for r, key in enumerate(REPORTS):
+            rep = raw.get(key)
+            if not rep:
+                continue
+            if not isinstance(rep, dict):
+                errors.append(f"{where(i)}: {key} must be an object")
+                continue
+            date = rep.get(REPORT_DATE)
+            if not isinstance(date, str) or len(date) < 10:
+                errors.append(f"{where(i)}: {key}.{REPORT_DATE} is missing or not a date: {date!r}")
+                continue
+            missing = missing_fields(rep)
+            if missing:
+                errors.append(f"{where(i)}: {key} is missing {', '.join(missing)}")
+                continue
+            values.append([rep.get(field, OPTIONAL_FIELDS.get(field)) for field in VALUE_FIELDS])
+            slots.append((i, r, key))
+            present[i, r] = True
+            reports[key] = Report(date, positions[i, r])
+
+        markets.append(Market(
+            name,
+            instrument_name=raw.get('instrument_name'),
+            market_and_exchange_names=raw.get('market_and_exchange_names'),
+            asset_type=raw.get('asset_type'),
+            exchange=raw.get('exchange'),
+            searchable_terms=terms,
+            **reports
+        ))
+
+    # Convert every position at once; only a failure is looked at field by field
+    if slots:
+        rows, reps = np.array([s[0] for s in slots]), np.array([s[1] for s in slots])
+        try:
+            if not all(type(v) is str or type(v) is int for row in values for v in row):
+                raise TypeError
+            positions[rows, reps] = np.array(values, dtype=str).astype(np.int64)
+        except (TypeError, ValueError, OverflowError):
+            for (i, r, key), row in zip(slots, values):
+                for j, (field, value) in enumerate(zip(VALUE_FIELDS, row)):
+                    try:
+                        positions[i, r, j] = _parse_int(value)
+                    except (TypeError, ValueError, OverflowError):
+                        errors.append(f"{where(i)}: {key}.{field} is not an integer: {value!r}")
+        for k in np.flatnonzero((positions[rows, reps] < 0).any(axis=1)):
+            i, r, key = slots[k]
+            fields = [f for f, v in zip(VALUE_FIELDS, positions[i, r]) if v < 0]
+            errors.append(f"{where(i)}: {key} has negative positions: {', '.join(fields)}")
+
+    if errors:
+        raise SchemaError(errors)
+    return markets, positions, present
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.tracing import traced
+
+# Text colour switches to light below this background luminance, as in pandas
+TEXT_COLOR_THRESHOLD = 0.408
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache shared by every session in the process"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for key, building it with factory() on a miss"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # Build outside the lock so one slow view does not block every session
+        value = factory()
+        with self._lock:
+            value = self._data.setdefault(key, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, keep=None):
+        """Drop every entry, or every entry whose key does not start with keep"""
+        with self._lock:
+            if keep is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k[0] != keep]:
+                del self._data[key]
+
+    def discard(self, first):
+        """Drop every entry whose key starts with first"""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == first]:
+                del self._data[key]
+
+
+@traced('styling.gradient')
+def gradient_css(values, cmap='gist_yarg', vmin=None, vmax=None):
+    """Return background-gradient CSS per value, matching Styler.background_gradient"""
+    from matplotlib import colormaps, colors
+
+    values = np.asarray(values, dtype=np.float64)
+    vmin = np.nanmin(values) if vmin is None else vmin
+    vmax = np.nanmax(values) if vmax is None else vmax
+    rgbas = colormaps[cmap](colors.Normalize(vmin, vmax)(values))
+
+    # Relative luminance per WCAG, used to pick a readable text colour
+    rgb = rgbas[:, :3]
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+
+    return [
+        f"background-color: {colors.rgb2hex(rgba)};color: {'#f1f1f1' if lum < TEXT_COLOR_THRESHOLD else '#000000'};"
+        for rgba, lum in zip(rgbas, luminance)
+    ]
+
+
+class TableView:
+    """A positions table with its number formats and Net column gradient precomputed"""
+
+    def __init__(self, frame, formats, gradient_column='Net', cmap='gist_yarg'):
+        self.frame = frame
+        self.formats = formats
+        css = gradient_css(frame[gradient_column].to_numpy(), cmap)
+        styles = frame.astype(object).map(lambda _: '')
+        styles[gradient_column] = css
+        self.styles = styles
+
+    def styler(self):
+        """Return a fresh Styler over the cached frame; no colour mapping is recomputed"""
+        styles = self.styles
+        return self.frame.style.format(self.formats).apply(lambda _: styles, axis=None)
+
+
+class ChartView:
+    """Vega-Lite chart data and spec for one market and view mode"""
+
+    def __init__(self, data, spec):
+        self.data = data
+        self.spec = spec
+
+
+# Views keyed by (dataset version, market, view mode)
+VIEW_CACHE = LRUCache(maxsize=512)
+
+
+def cached_view(version, market, view, factory):
+    """Return the cached views built by factory for a market and view mode
+
+    Several versions can be cached at once while sessions still finish runs
+    on an older one; ``release_version`` drops a version once it is retired.
+    """
+    return VIEW_CACHE.get_or_create((version, market, view), factory)
+
+
+def release_version(version):
+    """Drop every cached view of a dataset version"""
+    VIEW_CACHE.discard(version)
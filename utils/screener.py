@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import numpy as np
+
+from utils.positions import TRADERS
+
+# Ranking metrics offered by the screener
+METRICS = ['Net Position', 'Net Change', 'Dominant Share']
+
+
+class Screener:
+    """Rank every market by positioning, with orderings computed once and paginated
+
+    All figures come straight from the positions engine arrays, so building
+    or re-sorting the screener is a handful of vectorized operations no
+    matter how many contracts the dataset holds.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        abs_net = np.abs(engine.net)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.dominant_share = np.nan_to_num(abs_net.max(axis=1) / abs_net.sum(axis=1) * 100)
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.engine)
+
+    def values(self, metric, trader):
+        """Return the per-market values ranked by a metric for one trader class"""
+        t = TRADERS.index(trader)
+        if metric == 'Net Position':
+            return self.engine.net[:, t]
+        if metric == 'Net Change':
+            return self.engine.net_change[:, t]
+        if metric == 'Dominant Share':
+            return self.dominant_share
+        raise ValueError(f"Unknown screener metric: {metric}")
+
+    def order(self, metric, trader, descending=True):
+        """Return market indices sorted by a metric, cached per ranking"""
+        key = (metric, trader, descending)
+        if key not in self._orders:
+            values = self.values(metric, trader)
+            self._orders[key] = np.argsort(-values if descending else values, kind='stable')
+        return self._orders[key]
+
+    def columns(self):
+        """Return the arrays the screener ranks on, for publishing to worker processes"""
+        return {
+            'net': self.engine.net,
+            'net_change': self.engine.net_change,
+            'dominant_share': self.dominant_share
+        }
+
+    def prime(self, orders):
+        """Adopt orderings computed elsewhere, e.g. by the screener_orders executor task"""
+        metrics = {'net': 'Net Position', 'net_change': 'Net Change'}
+        for (column, t, descending), order in orders.items():
+            if column == 'dominant_share':
+                for trader in TRADERS:
+                    self._orders.setdefault(('Dominant Share', trader, descending), order)
+            else:
+                self._orders.setdefault((metrics[column], TRADERS[t], descending), order)
+
+    @property
+    def primed(self):
+        return len(self._orders) >= len(METRICS) * len(TRADERS) * 2
+
+    def page_count(self, page_size):
+        return max(1, -(-len(self) // page_size))
+
+    def page(self, metric, trader, page=1, page_size=25, descending=True):
+        """Return one page of the ranking as a DataFrame"""
+        import pandas as pd
+
+        engine = self.engine
+        start = (page - 1) * page_size
+        rows = self.order(metric, trader, descending)[start:start + page_size]
+        t = TRADERS.index(trader)
+        return pd.DataFrame({
+            'Rank': np.arange(start + 1, start + len(rows) + 1),
+            'Market': [engine.names[i] for i in rows],
+            f'{trader} Net': engine.net[rows, t],
+            f'{trader} Net Change': engine.net_change[rows, t],
+            'Dominant Trader': [TRADERS[d] for d in engine.dominant[rows]],
+            'Dominant Share': self.dominant_share[rows]
+        }).set_index('Rank')
+
+
+@lru_cache(maxsize=4)
+def screener_for(engine):
+    """Return the screener for a positions engine, built once per engine"""
+    return Screener(engine)
@@ -0,0 +1,147 @@
+import bisect
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+# Scores per kind of match; the best match of each query word counts
+EXACT_TERM = 4.0
+EXACT_WORD = 3.0
+PREFIX = 2.0
+FUZZY = 1.0
+
+# Minimum trigram similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.4
+
+# Query words up to this long are looked up in a table of every vocabulary
+# prefix built with the index; a scan for them would touch most markets
+INDEXED_PREFIX = 3
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _words(text):
+    return _WORD.findall(str(text).lower())
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """In-process market search over tickers, searchable terms and names
+
+    Whole terms (``BTC``, ``BTCUSDT``) and every word of the display,
+    instrument and exchange names are indexed. A query word matches a term
+    exactly, as a prefix of a sorted vocabulary (binary search), or, when
+    neither hits, by trigram similarity. Every query word has to match for a
+    market to be returned.
+    """
+
+    def __init__(self, markets):
+        self.names = [m['display_name'] for m in markets]
+        self._terms = defaultdict(set)
+        self._postings = defaultdict(set)
+        self._trigrams = defaultdict(set)
+
+        for i, m in enumerate(markets):
+            terms = list(m.get('searchable_terms') or []) + [m.get('instrument_name') or '']
+            for term in terms:
+                key = ''.join(_words(term))
+                if key:
+                    self._terms[key].add(i)
+            for field in ('display_name', 'instrument_name', 'market_and_exchange_names', 'searchable_terms'):
+                value = m.get(field) or ''
+                for text in (value if isinstance(value, list) else [value]):
+                    for word in _words(text):
+                        self._postings[word].add(i)
+
+        self._vocabulary = sorted(set(self._postings) | set(self._terms))
+        for word in self._vocabulary:
+            for gram in _trigrams(word):
+                self._trigrams[gram].add(word)
+
+        # Scores of every short prefix, filled in the order a scan would:
+        # exact matches first, then each longer word in vocabulary order
+        tables = {}
+        for word in self._vocabulary:
+            markets = self._markets_for(word)
+            for n in range(1, min(len(word), INDEXED_PREFIX) + 1):
+                prefix = word[:n]
+                scores = tables.get(prefix)
+                if scores is None:
+                    scores = tables[prefix] = dict.fromkeys(self._terms.get(prefix, ()), EXACT_TERM)
+                    for i in self._postings.get(prefix, ()):
+                        scores.setdefault(i, EXACT_WORD)
+                scores.update(dict.fromkeys(markets.difference(scores), PREFIX + n / len(word)))
+        self._prefixes = {
+            prefix: (scores, sorted(scores, key=lambda i: (-scores[i], i)))
+            for prefix, scores in tables.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def _markets_for(self, word):
+        return self._postings.get(word, set()) | self._terms.get(word, set())
+
+    def _match_word(self, word):
+        """Return {market: score} for one query word"""
+        indexed = self._prefixes.get(word)
+        if indexed is not None:
+            return indexed[0]
+        return self._scan_word(word)
+
+    def _scan_word(self, word):
+        scores = {}
+        for i in self._terms.get(word, ()):
+            scores[i] = EXACT_TERM
+        for i in self._postings.get(word, ()):
+            scores.setdefault(i, EXACT_WORD)
+
+        # Prefix matches are a contiguous run of the sorted vocabulary
+        lo = bisect.bisect_left(self._vocabulary, word)
+        hi = bisect.bisect_left(self._vocabulary, word + '\uffff')
+        for candidate in self._vocabulary[lo:hi]:
+            for i in self._markets_for(candidate):
+                scores.setdefault(i, PREFIX + len(word) / len(candidate))
+        if scores or len(word) < 3:
+            return scores
+
+        # Fall back to trigram similarity for typos
+        grams = _trigrams(word)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] += 1
+        for candidate, shared in overlap.items():
+            similarity = shared / (len(grams) + len(_trigrams(candidate)) - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                for i in self._markets_for(candidate):
+                    scores[i] = max(scores.get(i, 0.0), FUZZY * similarity)
+        return scores
+
+    def search(self, query, limit=10):
+        """Return display names matching every word of the query, best first"""
+        words = _words(query)
+        if not words:
+            return []
+        if len(words) == 1 and words[0] in self._prefixes:
+            return [self.names[i] for i in self._prefixes[words[0]][1][:limit]]
+        combined = None
+        for word in words:
+            scores = self._match_word(word)
+            if combined is None:
+                combined = scores
+            else:
+                combined = {i: combined[i] + s for i, s in scores.items() if i in combined}
+            if not combined:
+                return []
+        ranked = sorted(combined.items(), key=lambda item: (-item[1], item[0]))
+        return [self.names[i] for i, _ in ranked[:limit]]
+
+
+@lru_cache(maxsize=4)
+def search_index_for(dataset):
+    """Return the search index for a dataset, built once per dataset version"""
+    return SearchIndex(dataset.markets)
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.positions import COLUMNS, TRADERS, PositionsEngine, PositionsView, positions_for
+
+# Default location of the materialized snapshots
+SNAPSHOT_DIR = Path(__file__).parent.parent.absolute() / 'data' / 'snapshots'
+
+# Snapshots kept on disk besides the newest, for processes still mapping them
+KEEP_SNAPSHOTS = 2
+
+# Bumped whenever SNAPSHOT_DTYPE changes, so older files are rebuilt not misread
+SNAPSHOT_SCHEMA = 2
+
+_K = len(TRADERS)
+SNAPSHOT_DTYPE = np.dtype([
+    ('long', np.int64, (_K,)),
+    ('short', np.int64, (_K,)),
+    ('net', np.int64, (_K,)),
+    ('long_change', np.int64, (_K,)),
+    ('short_change', np.int64, (_K,)),
+    ('net_change', np.int64, (_K,)),
+    ('shares', np.float64, (_K, len(COLUMNS))),
+    ('pct_oi', np.float64, (_K, len(COLUMNS))),
+    ('pct_class', np.float64, (_K, len(COLUMNS))),
+    ('ratio', np.float64, (_K,)),
+    ('has_previous', np.bool_),
+    ('dominant', np.int64),
+    ('dominant_net', np.int64),
+    ('open_interest', np.int64),
+    ('open_interest_change', np.int64),
+    ('oi_reported', np.bool_),
+])
+
+
+def _stem(version):
+    return f'{version}.s{SNAPSHOT_SCHEMA}'
+
+
+def _write_atomic(path, write):
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(dataset, path=SNAPSHOT_DIR):
+    """Materialize every derived figure of a dataset version into a snapshot on disk
+
+    Writes ``<version>.s<schema>.npy`` (one structured record per market)
+    and then the matching ``.json`` (market names), so a snapshot only counts
+    as present once both files are complete.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    engine = PositionsEngine(dataset.markets, (dataset.positions, dataset.present))
+
+    records = np.zeros(len(engine), dtype=SNAPSHOT_DTYPE)
+    for field in SNAPSHOT_DTYPE.names:
+        records[field] = getattr(engine, field)
+
+    stem = _stem(dataset.version)
+    _write_atomic(path / f'{stem}.npy', lambda f: np.save(f, records))
+    meta = {'version': dataset.version, 'schema': SNAPSHOT_SCHEMA, 'names': engine.names}
+    _write_atomic(path / f'{stem}.json', lambda f: f.write(json.dumps(meta).encode()))
+
+    # Drop snapshots of older versions beyond the ones still likely mapped
+    metas = sorted(path.glob('*.json'), key=lambda p: p.stat().st_mtime)
+    for old in metas[:-(KEEP_SNAPSHOTS + 1)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.npy').unlink(missing_ok=True)
+    return path / f'{stem}.npy'
+
+
+class Snapshot(PositionsView):
+    """Read-only, memory-mapped snapshot of one dataset version
+
+    Exposes the same arrays and accessors as PositionsEngine, so the UI and
+    API can use either interchangeably; looking a market up only indexes
+    into the mapped file.
+    """
+
+    def __init__(self, version, path=SNAPSHOT_DIR):
+        path = Path(path)
+        meta = json.loads((path / f'{_stem(version)}.json').read_text())
+        self.version = version
+        self.names = meta['names']
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.records = np.load(path / f'{_stem(version)}.npy', mmap_mode='r')
+        for field in SNAPSHOT_DTYPE.names:
+            setattr(self, field, self.records[field])
+
+
+def snapshot_dir(dataset, path=SNAPSHOT_DIR):
+    """Return the directory holding a dataset's snapshots
+
+    Each partition of a partitioned dataset keeps its snapshots in its own
+    subdirectory, so they are pruned independently.
+    """
+    path = Path(path)
+    if dataset.partition is not None:
+        path = path / 'partitions' / dataset.partition
+    return path
+
+
+def build_snapshots(catalog, path=SNAPSHOT_DIR):
+    """Materialize every snapshot a catalog version is served from, skipping those already built
+
+    A partitioned catalog is served from one snapshot per partition plus
+    one of all partitions combined; a single-file dataset from one.
+    Returns the snapshots written.
+    """
+    datasets = [catalog.partition(name) for name in getattr(catalog, 'partitions', ())]
+    datasets.append(catalog.combined())
+    built = []
+    for dataset in datasets:
+        target = snapshot_dir(dataset, path)
+        if not (target / f'{_stem(dataset.version)}.json').exists():
+            built.append(build_snapshot(dataset, target))
+    return built
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def snapshot_for(dataset, path=SNAPSHOT_DIR):
+    """Return the mapped snapshot for a dataset version, building it if ingest has not"""
+    path = snapshot_dir(dataset, path)
+    key = (path, dataset.version)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            try:
+                if not (path / f'{_stem(dataset.version)}.json').exists():
+                    build_snapshot(dataset, path)
+                snapshot = Snapshot(dataset.version, path)
+            except OSError:
+                # Read-only deployment without a prebuilt snapshot
+                return positions_for(dataset)
+            for old in [k for k in _snapshots if k[0] == path]:
+                del _snapshots[old]
+            _snapshots[key] = snapshot
+    return snapshot
+
+
+if __name__ == '__main__':
+    from utils.partitions import load_catalog
+
+    for written in build_snapshots(load_catalog()):
+        print(f"Wrote {written}")
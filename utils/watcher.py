@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.partitions import load_catalog
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the data source, overridable with COT_WATCH_INTERVAL
+POLL_INTERVAL = float(os.getenv('COT_WATCH_INTERVAL') or 2.0)
+
+
+class DatasetWatcher:
+    """One shared, current dataset version for every session of the process
+
+    A background thread polls the data source (one stat() of the dataset
+    file or partition manifest per interval, or immediately after
+    ``notify``). When it changes, the new version is parsed once, on that
+    thread, and swapped in atomically; sessions only ever read ``current``.
+    Readers take a reference for the duration of a run with ``reading``.
+    A superseded version is retired once its last reader lets go, and the
+    ``on_retire`` callbacks then release whatever was cached for it. A new
+    version that fails to load is logged and the current one kept.
+    """
+
+    def __init__(self, loader=load_catalog, interval=POLL_INTERVAL):
+        self.loader = loader
+        self.interval = interval
+        self.error = None
+        self._current = loader()
+        self._refs = Counter()
+        self._superseded = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    def on_retire(self, callback):
+        """Call ``callback(version)`` whenever an old version has no readers left"""
+        self._callbacks.append(callback)
+
+    def acquire(self):
+        """Return the current version and hold a reference to it"""
+        with self._lock:
+            catalog = self._current
+            self._refs[catalog.version] += 1
+            return catalog
+
+    def release(self, catalog):
+        with self._lock:
+            self._refs[catalog.version] -= 1
+            retire = (
+                self._refs[catalog.version] <= 0
+                and catalog.version in self._superseded
+                and catalog.version != self._current.version
+            )
+            if retire:
+                del self._refs[catalog.version]
+                self._superseded.discard(catalog.version)
+        if retire:
+            self._retire(catalog.version)
+
+    @contextmanager
+    def reading(self):
+        """Hold the current version for the length of a block, e.g. one script run"""
+        catalog = self.acquire()
+        try:
+            yield catalog
+        finally:
+            self.release(catalog)
+
+    def _retire(self, version):
+        for callback in self._callbacks:
+            try:
+                callback(version)
+            except Exception:
+                logger.exception("Releasing dataset version %s failed", version)
+
+    def check(self):
+        """Load the data source and swap in a new version if it changed; returns True on a swap"""
+        try:
+            catalog = self.loader()
+        except Exception as e:
+            if str(e) != str(self.error):
+                logger.warning("Keeping dataset version %s; the new data failed to load: %s", self.version, e)
+            self.error = e
+            return False
+        self.error = None
+        with self._lock:
+            old = self._current
+            if catalog.version == old.version:
+                return False
+            self._current = catalog
+            self._superseded.discard(catalog.version)
+            retire = self._refs[old.version] <= 0
+            if retire:
+                self._refs.pop(old.version, None)
+            else:
+                self._superseded.add(old.version)
+        logger.info("Dataset version %s replaced %s", catalog.version, old.version)
+        if retire:
+            self._retire(old.version)
+        return True
+
+    def notify(self):
+        """Check the data source now, e.g. right after an in-process ingest"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stopped.is_set():
+                self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None